@@ -1,15 +1,28 @@
-import sqlite3
-import hashlib
 import os
-import json
+import re
+import sys
+import threading
+import time
+import argparse
 import pwinput
-import secrets
-import string
-import socket
-import firebase_admin
-from firebase_admin import credentials, firestore
-from cryptography.fernet import Fernet
-import csv
+try:
+    import readline
+except ImportError:  # Windows: prompts work as before, without Tab completion
+    readline = None
+
+# vault_core lives at the repository root: next to this script or one level up.
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _HERE if os.path.isdir(os.path.join(_HERE, "vault_core")) else os.path.dirname(_HERE))
+from vault_core import csv_io, health, importers, merge, replication, sync, totp, tui
+from vault_core.crypto import STORAGE_FORMATS
+from vault_core.generator import PasswordGenerator
+from vault_core.health import check_password_strength
+from vault_core.instrumentation import stats
+from vault_core.platforms import PlatformIndex
+from vault_core.shards import ShardedUserStore, ShardedVault
+from vault_core.storage import (DB_FILE, HISTORY_KEEP, PAGE_SIZE, DatabaseManager, PasswordStore, StagingError,
+                                UserStore, hash_password, prune_history)
+from vault_core.tags import TagStore
 
 # -----------------------------
 # Color codes for terminal output
@@ -21,70 +34,36 @@ YELLOW = "\033[1;33m"
 CYAN = "\033[1;36m"
 MAGENTA = "\033[1;35m"
 RESET = "\033[0m"
+CLEAR = "\033[H\033[2J"
 
-DB_FILE = "database.db"
+def clear_screen():
+    # An escape sequence instead of running cls/clear: no shell or subprocess per redraw.
+    print(CLEAR, end="", flush=True)
 
 # -----------------------------
 # Firebase Initialization
 # -----------------------------
-db_online = None  # This will hold our Firestore client
-
 def init_firebase():
     """
     Initialize Firebase using your private serviceAccountKey.json file.
-    If initialization fails, db_online remains None.
+    If initialization fails, online backup and restore stay unavailable.
     """
-    global db_online
     try:
-        cred = credentials.Certificate("serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-        db_online = firestore.client()
+        sync.init_firebase()
         print(GREEN + "Firebase initialized successfully." + RESET)
     except Exception as e:
         print(RED + "Error initializing Firebase: " + str(e) + RESET)
-        db_online = None
-
-def internet_available(host="8.8.8.8", port=53, timeout=3):
-    """
-    Check if there is an internet connection by trying to connect to a known host.
-    Default is Google's public DNS.
-    """
-    try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return True
-    except socket.error:
-        return False
 
 def backup_online_data(db_manager):
     """
     Extracts the entire local database (both users and passwords) and uploads it to Firestore.
     The backup is stored under collection 'db_backup' in document 'backup'.
     """
-    if db_online is None:
-        print(RED + "Firebase not initialized. Cannot backup online." + RESET)
-        return
-
-    if not internet_available():
-        print(RED + "No internet connection. Online backup skipped." + RESET)
-        return
-
     try:
-        cur = db_manager.conn.cursor()
-        # Fetch users as dictionaries
-        cur.execute("SELECT username, password, security_question, security_answer FROM users")
-        users_columns = [desc[0] for desc in cur.description]
-        users_data = [dict(zip(users_columns, row)) for row in cur.fetchall()]
-
-        # Fetch passwords as dictionaries
-        cur.execute("SELECT id, username, platform, platform_username, email, password FROM passwords")
-        pass_columns = [desc[0] for desc in cur.description]
-        passwords_data = [dict(zip(pass_columns, row)) for row in cur.fetchall()]
-
-        backup_dict = {"users": users_data, "passwords": passwords_data}
-
-        db_online.collection("db_backup").document("backup").set(backup_dict)
+        sync.backup_online(db_manager)
         print(GREEN + "Online backup successful!" + RESET)
+    except sync.SyncError as e:
+        print(RED + str(e) + " Online backup skipped." + RESET)
     except Exception as e:
         print(RED + "Error during online backup: " + str(e) + RESET)
 
@@ -93,310 +72,258 @@ def restore_online_data(db_manager):
     Restores the entire database (users and passwords) from the online backup.
     WARNING: This will delete your current local data and replace it with the backup.
     """
-    if db_online is None:
-        print(RED + "Firebase not initialized. Cannot restore online backup." + RESET)
-        return
+    try:
+        sync.restore_online(db_manager)
+        print(GREEN + "Online restore successful!" + RESET)
+    except sync.SyncError as e:
+        print(RED + str(e) + " Cannot restore online backup." + RESET)
+    except Exception as e:
+        print(RED + "Error during online restore: " + str(e) + RESET)
 
-    if not internet_available():
-        print(RED + "No internet connection. Cannot restore online backup." + RESET)
-        return
+def merge_online_data(db_manager, policy):
+    """Merges the online backup into the local data, writing only new and changed entries."""
+    try:
+        print_merge_counts(sync.merge_online(db_manager, policy))
+    except sync.SyncError as e:
+        print(RED + str(e) + " Cannot merge online backup." + RESET)
+    except Exception as e:
+        print(RED + "Error during online merge: " + str(e) + RESET)
 
+def sync_online_data(db_manager):
+    """Exchanges only changed entries with the other devices syncing through Firestore."""
     try:
-        doc = db_online.collection("db_backup").document("backup").get()
-        if doc.exists:
-            data = doc.to_dict()
-            cur = db_manager.conn.cursor()
-            # Delete current data
-            cur.execute("DELETE FROM users")
-            cur.execute("DELETE FROM passwords")
-            # Restore users
-            for user in data.get("users", []):
-                cur.execute("INSERT INTO users (username, password, security_question, security_answer) VALUES (?, ?, ?, ?)",
-                            (user["username"], user["password"], user["security_question"], user["security_answer"]))
-            # Restore passwords
-            for entry in data.get("passwords", []):
-                cur.execute("INSERT INTO passwords (id, username, platform, platform_username, email, password) VALUES (?, ?, ?, ?, ?, ?)",
-                            (entry["id"], entry["username"], entry["platform"], entry["platform_username"], entry["email"], entry["password"]))
-            db_manager.conn.commit()
-            print(GREEN + "Online restore successful!" + RESET)
-        else:
-            print(RED + "No online backup found." + RESET)
+        report = replication.sync_vault(db_manager, replication.FirestoreTransport())
+        print(GREEN + f"✅ Sync complete: sent {report['pushed']} changes, received {report['pulled']} "
+              f"({report['applied']} applied)." + RESET)
+        print(CYAN + f"{report['round_trips']} requests, {report['bytes_sent']} bytes sent, "
+              f"{report['bytes_received']} bytes received." + RESET)
+    except sync.SyncError as e:
+        print(RED + str(e) + " Cannot sync." + RESET)
     except Exception as e:
-        print(RED + "Error during online restore: " + str(e) + RESET)
+        print(RED + "Error during sync: " + str(e) + RESET)
 
-# -----------------------------
-# Encryption Utilities
-# -----------------------------
-def load_key():
+def browse_pages(heading, fetch, show, key):
     """
-    Loads the secret key from 'secret.key'.
-    If the file does not exist, it generates a new key and saves it.
+    Shows rows a page at a time: fetch(after, limit) returns the rows following the
+    key ``after`` (None for the first page), show(number, row) prints one, and
+    key(row) is what the next page starts after. Every page is one keyset query,
+    however deep the user goes. Returns False if there was nothing to show.
     """
-    if os.path.exists("secret.key"):
-        with open("secret.key", "rb") as key_file:
-            key = key_file.read()
-    else:
-        key = Fernet.generate_key()
-        with open("secret.key", "wb") as key_file:
-            key_file.write(key)
-    return key
-
-KEY = load_key()
-cipher_suite = Fernet(KEY)
-
-def encrypt_data(data):
-    """Encrypts a string and returns a decoded ciphertext."""
-    return cipher_suite.encrypt(data.encode()).decode()
-
-def decrypt_data(data):
-    """Decrypts the ciphertext and returns the original string."""
-    return cipher_suite.decrypt(data.encode()).decode()
+    starts = [None]  # where each page seen so far starts, to step back
+    while True:
+        clear_screen()
+        UI.print_heading(heading)
+        rows = fetch(starts[-1], PAGE_SIZE + 1)
+        page, more = rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+        if not page:
+            return False
+        for number, row in enumerate(page, (len(starts) - 1) * PAGE_SIZE + 1):
+            show(number, row)
+        if not more and len(starts) == 1:
+            input("\nPress Enter to continue...")
+            return True
+        choice = input(MAGENTA + f"\nPage {len(starts)}: n = next, p = previous, Enter = return: " + RESET).lower()
+        if choice == "n" and more:
+            starts.append(key(page[-1]))
+        elif choice == "p" and len(starts) > 1:
+            starts.pop()
+        elif choice not in ("n", "p"):
+            return True
+
+def input_with_completion(prompt, complete):
+    """input() where Tab completes the whole line with complete(prefix), a sorted list of candidates."""
+    if readline is None:
+        return input(prompt)
+    matches = []
+    def completer(text, state):
+        if state == 0:
+            matches[:] = complete(text.lower())
+        return matches[state] if state < len(matches) else None
+    readline.set_completer(completer)
+    readline.set_completer_delims("")  # platform names may contain spaces and dots
+    readline.parse_and_bind("bind ^I rl_complete" if "libedit" in (readline.__doc__ or "") else "tab: complete")
+    try:
+        # \001/\002 tell readline the color codes take no room, so it redraws the line in the right place.
+        return input(re.sub("(\033\\[[0-9;]*m)", "\001\\1\002", prompt))
+    finally:
+        readline.set_completer(None)
+
+def prune_history_in_background(db_file):
+    db_manager = DatabaseManager(db_file)
+    try:
+        prune_history(db_manager)
+    finally:
+        db_manager.close()
+
+def set_history_keep(db_manager, keep):
+    """Records how many earlier passwords the vault keeps per entry and prunes it. Returns the versions removed."""
+    db_manager.set_meta("history_keep", max(keep, 0))
+    db_manager.commit()
+    return prune_history(db_manager)
+
+def start_history_pruning(db_file):
+    # Old history versions are trimmed in the background, on a connection of its own.
+    threading.Thread(target=prune_history_in_background, args=(db_file,), daemon=True).start()
+
+def ask_merge_policy():
+    """Asks which side wins when an entry differs between the local data and the import."""
+    print(YELLOW + "When an entry differs, keep: newest (default) | ours (local) | theirs (imported)" + RESET)
+    policy = input("Merge policy: ").strip().lower()
+    return policy if policy in merge.POLICIES else "newest"
+
+def print_merge_counts(counts):
+    print(GREEN + f"✅ Merged: {counts['users']} new users, {counts['inserted']} new and "
+          f"{counts['updated']} updated passwords." + RESET)
+    print(CYAN + f"{counts['unchanged']} passwords were already up to date; "
+          f"{counts['kept']} conflicting local passwords were kept." + RESET)
 
 # -----------------------------
-# Password Strength & Generation
+# Password Generation
 # -----------------------------
-def check_password_strength(password: str) -> str:
-    """
-    Checks the strength of the password.
-    Criteria:
-      - Length at least 8
-      - Contains lowercase letters
-      - Contains uppercase letters
-      - Contains digits
-      - Contains special characters
-    Returns: A string rating: Weak, Medium, Strong, or Very Strong.
-    """
-    score = 0
-    if len(password) >= 8:
-        score += 1
-    if any(c.islower() for c in password):
-        score += 1
-    if any(c.isupper() for c in password):
-        score += 1
-    if any(c.isdigit() for c in password):
-        score += 1
-    if any(c in "!@#$%^&*()-_=+[{]}\\|;:'\",<.>/?`~" for c in password):
-        score += 1
-
-    if score <= 2:
-        return "Weak"
-    elif score == 3:
-        return "Medium"
-    elif score == 4:
-        return "Strong"
-    else:
-        return "Very Strong"
-
-def auto_generate_password(length=12) -> str:
+password_generator = PasswordGenerator.from_file()
+
+def auto_generate_password(platform=None) -> str:
     """
-    Generates a random password of specified length ensuring at least one lowercase, one uppercase,
-    one digit, and one special character.
+    Generates a password with the policy configured for the platform in generator_policies.json,
+    or the default policy (12 characters with lowercase, uppercase, digits and special characters).
     """
-    if length < 8:
-        length = 8
-    lower = secrets.choice(string.ascii_lowercase)
-    upper = secrets.choice(string.ascii_uppercase)
-    digit = secrets.choice(string.digits)
-    special = secrets.choice("!@#$%^&*()-_=+[{]}\\|;:'\",<.>/?`~")
-    if length > 4:
-        rest = ''.join(secrets.choice(string.ascii_letters + string.digits + "!@#$%^&*()-_=+[{]}\\|;:'\",<.>/?`~") for _ in range(length - 4))
-    else:
-        rest = ''
-    password_list = list(lower + upper + digit + special + rest)
-    secrets.SystemRandom().shuffle(password_list)
-    return ''.join(password_list)
+    return password_generator.generate(platform)
+
+def generated_entropy(platform=None) -> float:
+    """Returns the exact entropy in bits of passwords generated for the platform."""
+    return password_generator.policy_for(platform).entropy_bits()
 
 # -----------------------------
-# Database & User Management
+# User Management
 # -----------------------------
-class DatabaseManager:
-    def __init__(self, db_file):
-        self.conn = sqlite3.connect(db_file)
-        self.conn.execute("PRAGMA foreign_keys = 1")
-        self.create_tables()
-
-    def create_tables(self):
-        c = self.conn.cursor()
-        # Create users table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password TEXT NOT NULL,
-                security_question TEXT NOT NULL,
-                security_answer TEXT NOT NULL
-            )
-        ''')
-        # Create passwords table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS passwords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                platform TEXT NOT NULL,
-                platform_username TEXT NOT NULL,
-                email TEXT NOT NULL,
-                password TEXT NOT NULL,
-                FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
-            )
-        ''')
-        self.conn.commit()
-
-    def close(self):
-        self.conn.close()
-
 class UserManager:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, store=None):
         self.db = db_manager
+        # A sharded vault passes a ShardedUserStore that routes each account to its shard.
+        self.store = store or UserStore(db_manager)
 
     def encrypt_password(self, password):
         # For login passwords, we use a one-way SHA256 hash.
-        return hashlib.sha256(password.encode()).hexdigest()
+        return hash_password(password)
 
     def signup(self):
-        os.system("cls" if os.name == "nt" else "clear")
-        UI.print_heading("signup")
-        username = input(GREEN + "📝  Enter username (or type 'back' to go back to main menu): " + RESET)
-        if username.lower() == "back":
-            return
-        elif not username.isalnum():
-            input(RED + "❌ Please enter a valid username." + RESET)
-            self.signup()
-            return
-        # Check if the username already exists
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT username FROM users WHERE username = ?", (username,))
-        if cur.fetchone():
-            input(RED + "❌ Username already exists! Try another." + RESET)
-            self.signup()
-            return
-        password = UserManager.get_password(GREEN + "🔒  Enter password (or type 'auto' to generate one, 'back' to return): " + RESET)
-        if password.lower() == "back":
-            return
-        if password.lower() == "auto":
-            password = auto_generate_password()
-            print(YELLOW + f"Auto-generated Password: {password}" + RESET)
-        rating = check_password_strength(password)
-        print(YELLOW + f"Password Strength: {rating}" + RESET)
-        if rating == "Weak":
-            choice = input(RED + "Your password is weak. Do you want to re-enter? (yes/no): " + RESET)
-            if choice.lower() in ["yes", "y"]:
-                self.signup()
+        # Every "try again" starts the form over; a loop rather than a recursive call.
+        while True:
+            clear_screen()
+            UI.print_heading("signup")
+            username = input(GREEN + "📝  Enter username (or type 'back' to go back to main menu): " + RESET)
+            if username.lower() == "back":
                 return
-        if not password:
-            input(RED + "❌ Please enter a valid password." + RESET)
-            self.signup()
-            return
-        confirm = input(YELLOW + f"\nYour password is: {GREEN}{password}{YELLOW}. Do you confirm this password? (yes/no): " + RESET)
-        if confirm.lower() in ["yes", "y"]:
-            security_question = input(YELLOW + "🔐 Set a security question (e.g., Your pet's name, or type 'back' to return): " + RESET)
-            if security_question.lower() == "back":
+            elif not username.isalnum():
+                input(RED + "❌ Please enter a valid username." + RESET)
+                continue
+            # Check if the username already exists
+            if self.store.exists(username):
+                input(RED + "❌ Username already exists! Try another." + RESET)
+                continue
+            password = UserManager.get_password(GREEN + "🔒  Enter password (or type 'auto' to generate one, 'back' to return): " + RESET)
+            if password.lower() == "back":
                 return
-            security_answer = input(YELLOW + "🔑 Answer (or type 'back' to return): " + RESET).lower()
-            if security_answer.lower() == "back":
+            if password.lower() == "auto":
+                password = auto_generate_password()
+                print(YELLOW + f"Auto-generated Password: {password}" + RESET)
+            rating = check_password_strength(password)
+            print(YELLOW + f"Password Strength: {rating}" + RESET)
+            if rating == "Weak":
+                choice = input(RED + "Your password is weak. Do you want to re-enter? (yes/no): " + RESET)
+                if choice.lower() in ["yes", "y"]:
+                    continue
+            if not password:
+                input(RED + "❌ Please enter a valid password." + RESET)
+                continue
+            confirm = input(YELLOW + f"\nYour password is: {GREEN}{password}{YELLOW}. Do you confirm this password? (yes/no): " + RESET)
+            if confirm.lower() in ["yes", "y"]:
+                security_question = input(YELLOW + "🔐 Set a security question (e.g., Your pet's name, or type 'back' to return): " + RESET)
+                if security_question.lower() == "back":
+                    return
+                security_answer = input(YELLOW + "🔑 Answer (or type 'back' to return): " + RESET).lower()
+                if security_answer.lower() == "back":
+                    return
+                # The security question and answer are stored encrypted
+                self.store.signup(username, password, security_question, security_answer)
+                print("\n" + GREEN + "✅ Signup successful!" + RESET)
                 return
-            hashed_password = self.encrypt_password(password)
-            # Encrypt security question and answer
-            encrypted_question = encrypt_data(security_question)
-            encrypted_answer = encrypt_data(security_answer)
-            cur.execute("INSERT INTO users (username, password, security_question, security_answer) VALUES (?, ?, ?, ?)",
-                        (username, hashed_password, encrypted_question, encrypted_answer))
-            self.db.conn.commit()
-            print("\n" + GREEN + "✅ Signup successful!" + RESET)
-        elif confirm.lower() in ["no", "n"]:
-            input(RED + "❌ Please enter password again! Press enter to continue." + RESET)
-            self.signup()
-        else:
-            input(RED + "❌ Invalid Input!" + RESET)
-            self.signup()
+            elif confirm.lower() in ["no", "n"]:
+                input(RED + "❌ Please enter password again! Press enter to continue." + RESET)
+            else:
+                input(RED + "❌ Invalid Input!" + RESET)
 
     @staticmethod
     def get_password(txt):
         return pwinput.pwinput(prompt=txt)
 
     def list_users(self):
-        os.system("cls" if os.name == "nt" else "clear")
-        UI.print_heading("listusers")
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT username FROM users")
-        users = cur.fetchall()
-        if users:
-            print(CYAN, end="")
-            for i, user in enumerate(users, 1):
-                print(f"{i}. {user[0]}")
-            print(RESET)
-        else:
+        shown = browse_pages("listusers", self.store.users_page,
+                             lambda i, user: print(CYAN + f"{i}. {user}" + RESET), lambda user: user)
+        if not shown:
             print(RED + "❌ No users found!" + RESET)
-        input()
+            input()
 
     def login(self):
-        os.system("cls" if os.name == "nt" else "clear")
-        UI.print_heading("login")
-        print("[NOTE]: Press F for forgotten password or type 'back' to go back to main menu.")
-        username = input(BLUE + "👤 Enter username (or 'back' to return): " + RESET)
-        if username.lower() == "f":
-            self.forget_password()
-            return None
-        if username.lower() == "back":
-            return None
-        password = self.get_password(BLUE + "🔑 Enter password (or type 'back' to return): " + RESET)
-        if password.lower() == "back":
-            return None
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT password FROM users WHERE username = ?", (username,))
-        row = cur.fetchone()
-        if row is None:
-            input(RED + "\n❌ Invalid username or password!" + RESET)
-            return None
-        stored_hash = row[0]
-        if stored_hash == self.encrypt_password(password):
-            print("\n" + GREEN + "✅ Login successful! Welcome back!" + RESET)
-            return username
-        else:
-            input("\n" + RED + "❌ Invalid username or password!" + RESET)
-            return None
+        while True:
+            clear_screen()
+            UI.print_heading("login")
+            print("[NOTE]: Press F for forgotten password or type 'back' to go back to main menu.")
+            username = input(BLUE + "👤 Enter username (or 'back' to return): " + RESET)
+            if username.lower() == "f":
+                if self.forget_password():
+                    continue  # back to the login prompt
+                return None
+            if username.lower() == "back":
+                return None
+            password = self.get_password(BLUE + "🔑 Enter password (or type 'back' to return): " + RESET)
+            if password.lower() == "back":
+                return None
+            if self.store.login(username, password):
+                print("\n" + GREEN + "✅ Login successful! Welcome back!" + RESET)
+                return username
+            else:
+                input("\n" + RED + "❌ Invalid username or password!" + RESET)
+                return None
 
     def forget_password(self):
-        os.system("cls" if os.name == "nt" else "clear")
-        UI.print_heading("forgetpass")
-        username = input(YELLOW + "👤 Enter your username (or type 'back' to return): " + RESET)
-        if username.lower() == "back":
-            return
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT security_question, security_answer FROM users WHERE username = ?", (username,))
-        row = cur.fetchone()
-        if row:
-            # Decrypt the stored security question for display
-            decrypted_question = decrypt_data(row[0])
-            print(YELLOW + "Q: " + decrypted_question + RESET)
-            answer = input(YELLOW + "🔑 Answer (or type 'back' to return): " + RESET).lower()
-            if answer.lower() == "back":
-                return
-            decrypted_answer = decrypt_data(row[1])
-            if answer == decrypted_answer:
-                new_password = UserManager.get_password(GREEN + "🔒 Enter new password (or type 'auto' to generate, 'back' to return): " + RESET)
-                if new_password.lower() == "back":
-                    return
-                if new_password.lower() == "auto":
-                    new_password = auto_generate_password()
-                    print(YELLOW + f"Auto-generated Password: {new_password}" + RESET)
-                rating = check_password_strength(new_password)
-                print(YELLOW + f"New Password Strength: {rating}" + RESET)
-                if rating == "Weak":
-                    choice = input(RED + "Your new password is weak. Do you want to re-enter? (yes/no): " + RESET)
-                    if choice.lower() in ["yes", "y"]:
-                        self.forget_password()
-                        return
-                hashed_password = self.encrypt_password(new_password)
-                cur.execute("UPDATE users SET password = ? WHERE username = ?", (hashed_password, username))
-                self.db.conn.commit()
-                input(GREEN + "✅ Password reset successful!" + RESET)
+        """Resets a password through the security question. Returns True when the login prompt should follow."""
+        while True:
+            clear_screen()
+            UI.print_heading("forgetpass")
+            username = input(YELLOW + "👤 Enter your username (or type 'back' to return): " + RESET)
+            if username.lower() == "back":
+                return False
+            security = self.store.get_security(username)
+            if security:
+                decrypted_question, decrypted_answer = security
+                print(YELLOW + "Q: " + decrypted_question + RESET)
+                answer = input(YELLOW + "🔑 Answer (or type 'back' to return): " + RESET).lower()
+                if answer.lower() == "back":
+                    return False
+                if answer == decrypted_answer:
+                    new_password = UserManager.get_password(GREEN + "🔒 Enter new password (or type 'auto' to generate, 'back' to return): " + RESET)
+                    if new_password.lower() == "back":
+                        return False
+                    if new_password.lower() == "auto":
+                        new_password = auto_generate_password()
+                        print(YELLOW + f"Auto-generated Password: {new_password}" + RESET)
+                    rating = check_password_strength(new_password)
+                    print(YELLOW + f"New Password Strength: {rating}" + RESET)
+                    if rating == "Weak":
+                        choice = input(RED + "Your new password is weak. Do you want to re-enter? (yes/no): " + RESET)
+                        if choice.lower() in ["yes", "y"]:
+                            continue
+                    self.store.reset_password(username, new_password)
+                    input(GREEN + "✅ Password reset successful!" + RESET)
+                else:
+                    input(RED + "❌ Incorrect answer!" + RESET)
             else:
-                input(RED + "❌ Incorrect answer!" + RESET)
-        else:
-            input(RED + "❌ Username not found!" + RESET)
-        self.login()
+                input(RED + "❌ Username not found!" + RESET)
+            return True
 
     def delete_account(self):
-        os.system("cls" if os.name == "nt" else "clear")
+        clear_screen()
         UI.print_heading("delacc")
         username = input(YELLOW + "🗑️  Enter username (or type 'back' to return): " + RESET)
         if username.lower() == "back":
@@ -404,163 +331,318 @@ class UserManager:
         password = self.get_password(YELLOW + "🔑  Enter password (or type 'back' to return): " + RESET)
         if password.lower() == "back":
             return
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT password FROM users WHERE username = ?", (username,))
-        row = cur.fetchone()
-        if row and row[0] == self.encrypt_password(password):
+        if self.store.login(username, password):
             confirm = input(YELLOW + "\nAll your saved passwords will be removed. Are you sure you want to continue? (yes/no): " + RESET)
             if confirm.lower() in ["yes", "y"]:
-                cur.execute("DELETE FROM users WHERE username = ?", (username,))
-                self.db.conn.commit()
+                self.store.delete_account(username)
                 print(GREEN + "✅ Account deleted!" + RESET)
             elif confirm.lower() in ["no", "n"]:
                 input(RED + "❌ Deletion of Account canceled." + RESET)
-                self.signup()
             else:
                 input(RED + "❌ Invalid Input!" + RESET)
-                self.signup()
         else:
             print(RED + "❌ Invalid username or password!" + RESET)
 
 class PasswordManager:
     def __init__(self, db_manager):
         self.db = db_manager
+        self.store = PasswordStore(db_manager)
+        self.tags = TagStore(db_manager)
+        self.platforms = PlatformIndex(db_manager)
+        # Kept for the session: each 2FA seed is decrypted once, not on every refresh.
+        self.codes = totp.CodeBoard(self.store)
+
+    def ask_platform(self, username, prompt):
+        """Asks for a platform name; Tab completes it from the user's saved platforms."""
+        return input_with_completion(prompt, lambda prefix: self.platforms.complete(username, prefix)).lower()
 
     def add_password(self, username):
-        os.system("cls" if os.name == "nt" else "clear")
-        UI.print_heading("addpass")
-        platform = input(GREEN + "🌐 Enter platform name (or type 'back' to return): " + RESET).lower()
-        if platform.lower() == "back":
-            return
-        platform_username = input(GREEN + "👤 Enter username (or type 'back' to return): " + RESET)
-        if platform_username.lower() == "back":
-            return
-        email = input(GREEN + "📧 Enter email (or type 'back' to return): " + RESET)
-        if email.lower() == "back":
-            return
-        password = UserManager.get_password(GREEN + "🔒 Enter password (or type 'auto' to generate, 'back' to return): " + RESET)
-        if password.lower() == "back":
-            return
-        if password.lower() == "auto":
-            password = auto_generate_password()
-            print(YELLOW + f"Auto-generated Password: {password}" + RESET)
-        rating = check_password_strength(password)
-        print(YELLOW + f"Password Strength: {rating}" + RESET)
-        if rating == "Weak":
-            choice = input(RED + "Your password is weak. Do you want to re-enter? (yes/no): " + RESET)
-            if choice.lower() in ["yes", "y"]:
-                self.add_password(username)
+        # Re-entering starts the form over; a loop rather than a recursive call.
+        while True:
+            clear_screen()
+            UI.print_heading("addpass")
+            platform = self.ask_platform(username, GREEN + "🌐 Enter platform name (or type 'back' to return): " + RESET)
+            if platform.lower() == "back":
                 return
-        confirm = input(YELLOW + f"\nYour password is: {GREEN}{password}{YELLOW}. Do you confirm this password? (yes/no): " + RESET)
-        if confirm.lower() in ["yes", "y"]:
-            # Encrypt the platform password before storing it
-            encrypted_pass = encrypt_data(password)
-            cur = self.db.conn.cursor()
-            cur.execute("INSERT INTO passwords (username, platform, platform_username, email, password) VALUES (?, ?, ?, ?, ?)",
-                        (username, platform, platform_username, email, encrypted_pass))
-            self.db.conn.commit()
-            print(GREEN + "✅ Password saved!" + RESET)
-        elif confirm.lower() in ["no", "n"]:
-            input(RED + "❌ Please enter password again! Press enter to continue." + RESET)
-            self.add_password(username)
-        else:
-            input(RED + "❌ Invalid Input!" + RESET)
-            self.add_password(username)
+            platform_username = input(GREEN + "👤 Enter username (or type 'back' to return): " + RESET)
+            if platform_username.lower() == "back":
+                return
+            email = input(GREEN + "📧 Enter email (or type 'back' to return): " + RESET)
+            if email.lower() == "back":
+                return
+            password = UserManager.get_password(GREEN + "🔒 Enter password (or type 'auto' to generate, 'back' to return): " + RESET)
+            if password.lower() == "back":
+                return
+            if password.lower() == "auto":
+                password = auto_generate_password(platform)
+                print(YELLOW + f"Auto-generated Password: {password} ({generated_entropy(platform):.0f} bits)" + RESET)
+            rating = check_password_strength(password)
+            print(YELLOW + f"Password Strength: {rating}" + RESET)
+            if rating == "Weak":
+                choice = input(RED + "Your password is weak. Do you want to re-enter? (yes/no): " + RESET)
+                if choice.lower() in ["yes", "y"]:
+                    continue
+            confirm = input(YELLOW + f"\nYour password is: {GREEN}{password}{YELLOW}. Do you confirm this password? (yes/no): " + RESET)
+            if confirm.lower() in ["yes", "y"]:
+                # The platform password is encrypted before it is stored
+                self.store.add_password(username, platform, platform_username, email, password)
+                print(GREEN + "✅ Password saved!" + RESET)
+                return
+            elif confirm.lower() in ["no", "n"]:
+                input(RED + "❌ Please enter password again! Press enter to continue." + RESET)
+            else:
+                input(RED + "❌ Invalid Input!" + RESET)
 
     def access_passwords(self, username):
-        os.system("cls" if os.name == "nt" else "clear")
+        clear_screen()
         UI.print_heading("accesspass")
-        platform = input(CYAN + "🔎 Enter platform name (or type 'back' to return): " + RESET).lower()
+        platform = self.ask_platform(username, CYAN + "🔎 Enter platform name (or type 'back' to return): " + RESET)
         if platform.lower() == "back":
             return
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT platform_username, email, password FROM passwords WHERE username = ? AND platform = ?", (username, platform))
-        row = cur.fetchone()
-        if row:
-            decrypted_pass = decrypt_data(row[2])
-            print(CYAN + f"Platform: {platform}\nUsername: {row[0]}\nEmail: {row[1]}\nPassword: {decrypted_pass}" + RESET)
-        else:
+        def show(number, entry):
+            _, platform_username, email, decrypted_pass = entry
+            print(CYAN + f"{number}. Platform: {platform}\n   Username: {platform_username}\n"
+                  f"   Email: {email}\n   Password: {decrypted_pass}" + RESET)
+        # Every entry saved for the platform, a page at a time: only the page shown is decrypted.
+        shown = browse_pages("accesspass",
+                             lambda after, limit: self.store.passwords_page(username, platform, after or ("", 0), limit),
+                             show, lambda entry: (entry[1], entry[0]))
+        if not shown:
             print(RED + "❌ No saved credentials for this platform!" + RESET)
-        input("\nPress Enter to continue...")
+            input("\nPress Enter to continue...")
 
     def delete_password(self, username):
-        os.system("cls" if os.name == "nt" else "clear")
+        clear_screen()
         UI.print_heading("delpass")
-        platform = input(YELLOW + "🗑️ Enter platform name to delete (or type 'back' to return): " + RESET).lower()
+        platform = self.ask_platform(username, YELLOW + "🗑️ Enter platform name to delete (or type 'back' to return): " + RESET)
         if platform.lower() == "back":
             return
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT id FROM passwords WHERE username = ? AND platform = ?", (username, platform))
-        row = cur.fetchone()
-        if row:
-            cur.execute("DELETE FROM passwords WHERE id = ?", (row[0],))
-            self.db.conn.commit()
+        entry_id = self.store.find_entry(username, platform)
+        if entry_id is not None:
+            self.store.delete_password(entry_id)
             print(GREEN + "✅ Password deleted!" + RESET)
         else:
             print(RED + "❌ No such password found!" + RESET)
         input()
 
     def edit_password(self, username):
-        os.system("cls" if os.name == "nt" else "clear")
-        UI.print_heading("editpass")
-        platform = input(YELLOW + "✏️ Enter platform name to edit (or type 'back' to return): " + RESET).lower()
-        if platform.lower() == "back":
-            return
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT id FROM passwords WHERE username = ? AND platform = ?", (username, platform))
-        row = cur.fetchone()
-        if row:
-            platform_username = input(YELLOW + "👤 Enter new username (or type 'back' to return): " + RESET)
-            if platform_username.lower() == "back":
-                return
-            new_password = input(YELLOW + "🔒 Enter new password (or type 'auto' to generate, 'back' to return): " + RESET)
-            if new_password.lower() == "back":
+        while True:
+            clear_screen()
+            UI.print_heading("editpass")
+            platform = self.ask_platform(username, YELLOW + "✏️ Enter platform name to edit (or type 'back' to return): " + RESET)
+            if platform.lower() == "back":
                 return
-            if new_password.lower() == "auto":
-                new_password = auto_generate_password()
-                print(YELLOW + f"Auto-generated Password: {new_password}" + RESET)
-            rating = check_password_strength(new_password)
-            print(YELLOW + f"New Password Strength: {rating}" + RESET)
-            if rating == "Weak":
-                choice = input(RED + "Your new password is weak. Do you want to re-enter? (yes/no): " + RESET)
-                if choice.lower() in ["yes", "y"]:
-                    self.edit_password(username)
+            entry_id = self.store.find_entry(username, platform)
+            if entry_id is not None:
+                platform_username = input(YELLOW + "👤 Enter new username (or type 'back' to return): " + RESET)
+                if platform_username.lower() == "back":
                     return
-            encrypted_pass = encrypt_data(new_password)
-            cur.execute("UPDATE passwords SET platform_username = ?, password = ? WHERE id = ?", (platform_username, encrypted_pass, row[0]))
-            self.db.conn.commit()
-            print(GREEN + "✅ Password updated successfully!" + RESET)
-        else:
+                new_password = input(YELLOW + "🔒 Enter new password (or type 'auto' to generate, 'back' to return): " + RESET)
+                if new_password.lower() == "back":
+                    return
+                if new_password.lower() == "auto":
+                    new_password = auto_generate_password(platform)
+                    print(YELLOW + f"Auto-generated Password: {new_password} ({generated_entropy(platform):.0f} bits)" + RESET)
+                rating = check_password_strength(new_password)
+                print(YELLOW + f"New Password Strength: {rating}" + RESET)
+                if rating == "Weak":
+                    choice = input(RED + "Your new password is weak. Do you want to re-enter? (yes/no): " + RESET)
+                    if choice.lower() in ["yes", "y"]:
+                        continue
+                self.store.update_password(entry_id, platform_username, new_password)
+                print(GREEN + "✅ Password updated successfully!" + RESET)
+            else:
+                print(RED + "❌ No saved credentials for this platform!" + RESET)
+            input("\nPress Enter to continue...")
+            return
+
+    def password_history(self, username):
+        clear_screen()
+        UI.print_heading("history")
+        platform = self.ask_platform(username, YELLOW + "🕘 Enter platform name (or type 'back' to return): " + RESET)
+        if platform.lower() == "back":
+            return
+        entry_id = self.store.find_entry(username, platform)
+        if entry_id is None:
             print(RED + "❌ No saved credentials for this platform!" + RESET)
+            input("\nPress Enter to continue...")
+            return
+        versions = self.store.history(entry_id)
+        if not versions:
+            print(RED + "❌ This password has never been changed." + RESET)
+            input("\nPress Enter to continue...")
+            return
+        for version, old_password, replaced_at in versions:
+            replaced = time.strftime("%Y-%m-%d %H:%M", time.localtime(replaced_at))
+            print(CYAN + f"{version}. {old_password} (replaced {replaced})" + RESET)
+        choice = input(YELLOW + "Enter a version number to restore it (or type 'back' to return): " + RESET)
+        if choice.isdigit() and self.store.restore_version(entry_id, int(choice)):
+            print(GREEN + "✅ Password restored! The replaced password was added to the history." + RESET)
+        elif choice.lower() != "back":
+            print(RED + "❌ No such version." + RESET)
         input("\nPress Enter to continue...")
 
     def show_listed_platforms(self, username):
-        os.system("cls" if os.name == "nt" else "clear")
+        clear_screen()
         UI.print_heading("showplat")
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT DISTINCT platform FROM passwords WHERE username = ?", (username,))
-        rows = cur.fetchall()
-        if rows:
-            for i, row in enumerate(rows, 1):
-                print(CYAN + f"{i}. {row[0].title()}" + RESET)
+        platforms = self.store.platform_summary(username)
+        if platforms:
+            for i, (platform, entries, modified_at) in enumerate(platforms, 1):
+                modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(modified_at))
+                print(CYAN + f"{i}. {platform.title()} ({entries} saved, last modified {modified})" + RESET)
         else:
             print(RED + "❌ No saved platforms found!" + RESET)
         input()
 
+    def find_accounts(self, username):
+        """Lists every entry using an email address or platform username, e.g. after a provider breach."""
+        clear_screen()
+        value = input("Enter an email address or platform username (or type 'back' to return): ").strip()
+        if value.lower() == "back" or not value:
+            return
+        matches = self.store.lookup_identity(username, value)
+        if matches:
+            print(GREEN + f"✅ {len(matches)} saved account(s) use {value}:" + RESET)
+            for entry_id, platform, platform_username, email in matches:
+                print(CYAN + f"- {platform.title()}: {platform_username} <{email}>" + RESET)
+        else:
+            print(RED + f"❌ No saved accounts use {value}." + RESET)
+        input()
+
+    def manage_tags(self, username):
+        """Tags group entries across platforms; folders are tags named like 'work/clients'."""
+        clear_screen()
+        UI.print_heading("tags")
+        tags = self.tags.tags(username)
+        for tag, entries in tags:
+            print(CYAN + f"- {tag} ({entries})" + RESET)
+        if not tags:
+            print(RED + "❌ No tags yet." + RESET)
+        print(CYAN + "\n1.  Filter Entries by Tags" + RESET)
+        print(CYAN + "2.  Tag a Platform's Entries" + RESET)
+        print(CYAN + "3.  Untag a Platform's Entries" + RESET)
+        print(CYAN + "4.  Delete a Tag" + RESET)
+        choice = input(MAGENTA + "👉 Enter your choice (or press Enter to return): " + RESET)
+        try:
+            if choice == "1":
+                expression = input("Tags to match, e.g. 'work 2fa|otp' (space = AND, | = OR): ")
+                matches = self.tags.filter(username, expression)
+                if matches:
+                    print(GREEN + f"✅ {len(matches)} entries match:" + RESET)
+                    for entry_id, platform, platform_username, email in matches:
+                        print(CYAN + f"- {platform.title()}: {platform_username} <{email}>" + RESET)
+                else:
+                    print(RED + "❌ No entries match." + RESET)
+            elif choice in ("2", "3"):
+                platform = self.ask_platform(username, YELLOW + "🌐 Enter platform name: " + RESET)
+                entry_ids = self.store.entry_ids(username, platform)
+                if not entry_ids:
+                    print(RED + "❌ No saved credentials for this platform!" + RESET)
+                    return
+                tag = input("Tag or folder (e.g. 'work/clients'): ")
+                if choice == "2":
+                    count = self.tags.add_tag(username, entry_ids, tag)
+                    print(GREEN + f"✅ Tagged {count} entries." + RESET)
+                else:
+                    count = self.tags.remove_tag(username, entry_ids, tag)
+                    print(GREEN + f"✅ Untagged {count} entries." + RESET)
+            elif choice == "4":
+                if self.tags.delete_tag(username, input("Tag to delete: ")):
+                    print(GREEN + "✅ Tag deleted." + RESET)
+                else:
+                    print(RED + "❌ No such tag." + RESET)
+        except ValueError as e:
+            print(RED + f"❌ {e}" + RESET)
+
+    def import_passwords(self, username):
+        """Adds the entries of a browser or password-manager export; the format is recognised from the file."""
+        clear_screen()
+        UI.print_heading("import")
+        print(CYAN + "Supported: " + ", ".join(importer.label for importer in importers.IMPORTERS.values()) + RESET)
+        path = input("Enter the export file name or full path (or type 'back' to return): ").strip().strip('"')
+        if path.lower() == "back" or not path:
+            return
+        try:
+            importer = importers.detect_format(path)
+            print(YELLOW + f"Importing {importer.label} export..." + RESET)
+            imported, skipped = importers.import_file(self.db, username, path, importer.name)
+        except (StagingError, OSError) as e:
+            print(RED + f"❌ Import failed, nothing was changed: {e}" + RESET)
+            return
+        print(GREEN + f"✅ Imported {imported} passwords ({skipped} already saved were skipped)." + RESET)
+
+    def two_factor_codes(self, username):
+        clear_screen()
+        UI.print_heading("totp")
+        print(CYAN + "1.  Show Live Codes" + RESET)
+        print(CYAN + "2.  Add or Replace a 2FA Secret" + RESET)
+        print(CYAN + "3.  Remove a 2FA Secret" + RESET)
+        choice = input(MAGENTA + "👉 Enter your choice (or press Enter to return): " + RESET)
+        if choice == "1":
+            self.show_live_codes(username)
+            return
+        if choice not in ("2", "3"):
+            return
+        platform = self.ask_platform(username, YELLOW + "🌐 Enter platform name: " + RESET)
+        entry_id = self.store.find_entry(username, platform)
+        if entry_id is None:
+            print(RED + "❌ No saved credentials for this platform!" + RESET)
+        elif choice == "2":
+            try:
+                secret, digits, period, algorithm = totp.parse_secret(
+                    input("Enter the setup key or otpauth:// link shown by the site: "))
+            except ValueError as e:
+                print(RED + f"❌ {e}" + RESET)
+                return
+            self.store.set_totp(entry_id, secret, digits, period, algorithm)
+            print(GREEN + f"✅ 2FA secret saved. Current code: {totp.totp(secret, None, digits, period, algorithm)}" + RESET)
+        elif self.store.remove_totp(entry_id):
+            print(GREEN + "✅ 2FA secret removed." + RESET)
+        else:
+            print(RED + "❌ This entry has no 2FA secret." + RESET)
+
+    def show_live_codes(self, username):
+        """Redraws every current code once a second until Ctrl+C."""
+        try:
+            while True:
+                codes = self.codes.codes(username)
+                clear_screen()
+                UI.print_heading("totp")
+                if not codes:
+                    print(RED + "❌ No entries have a 2FA secret yet." + RESET)
+                    return
+                for entry_id, platform, platform_username, code, seconds_left in codes:
+                    color = RED if seconds_left <= 5 else CYAN
+                    print(color + f"{platform.title():<24} {platform_username:<24} {code}  ({seconds_left:2d}s)" + RESET)
+                print("\nPress Ctrl+C to return.")
+                time.sleep(1)
+        except KeyboardInterrupt:
+            return
+
     def check_password_health(self, username):
-        os.system("cls" if os.name == "nt" else "clear")
+        clear_screen()
         UI.print_heading("passhealth")
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT platform, password FROM passwords WHERE username = ?", (username,))
-        rows = cur.fetchall()
-        if rows:
-            for row in rows:
-                platform, encrypted_pass = row
-                plain_password = decrypt_data(encrypted_pass)
-                rating = check_password_strength(plain_password)
-                print(CYAN + f"Platform: {platform.title()} -> Password Strength: {rating}" + RESET)
+        results = health.check_health(self.db, username)
+        if results:
+            for platform, result, hits in results:
+                notes = f"; {result.feedback}" if result.feedback else ""
+                line = (f"Platform: {platform.title()} -> Password Strength: {result.rating} "
+                        f"({result.entropy_bits:.0f} bits{notes})")
+                # The breach column is only shown when a local breach index has been built.
+                if hits is None:
+                    print(CYAN + line + RESET)
+                elif hits:
+                    print(CYAN + line + RED + f" | Breached: seen {hits:,} times" + RESET)
+                else:
+                    print(CYAN + line + GREEN + " | Breached: no" + RESET)
         else:
             print(RED + "❌ No saved platform passwords found!" + RESET)
+        due = self.store.rotation_due(username, health.ROTATION_DAYS)
+        if due:
+            print(YELLOW + f"\n⚠️  Not changed in over {health.ROTATION_DAYS} days:" + RESET)
+            for entry_id, platform, platform_username, rotated_at in due:
+                age = int((time.time() - rotated_at) // 86400)
+                print(YELLOW + f"- {platform.title()} ({platform_username}): last changed {age} days ago" + RESET)
         input("\nPress Enter to continue...")
 
 class UI:
@@ -578,6 +660,18 @@ class UI:
             print(GREEN + "=" * 55)
             print("⭐ Login Form ⭐".center(55))
             print("=" * 55 + RESET)
+        elif txt == "tags":
+            print(GREEN + "=" * 35)
+            print("⭐ Tags & Folders ⭐".center(35))
+            print("=" * 35 + RESET)
+        elif txt == "import":
+            print(GREEN + "=" * 45)
+            print("⭐ Import from Browser or Manager ⭐".center(45))
+            print("=" * 45 + RESET)
+        elif txt == "totp":
+            print(GREEN + "=" * 35)
+            print("⭐ 2FA Codes ⭐".center(35))
+            print("=" * 35 + RESET)
         elif txt == "passmenu":
             print(GREEN + "=" * 35)
             print("⭐ Password Manager ⭐".center(35))
@@ -590,6 +684,10 @@ class UI:
             print(GREEN + "=" * 45)
             print("⭐ Delete Account ⭐".center(45))
             print("=" * 45 + RESET)
+        elif txt == "history":
+            print(GREEN + "=" * 35)
+            print("⭐ Password History ⭐".center(35))
+            print("=" * 35 + RESET)
         elif txt == "editpass":
             print(GREEN + "=" * 35)
             print("⭐ Edit Password ⭐".center(35))
@@ -628,18 +726,39 @@ class UI:
             print("=" * 40 + RESET)
 
 class Application:
-    def __init__(self, db_file):
-        self.db_manager = DatabaseManager(db_file)
-        self.user_manager = UserManager(self.db_manager)
-        self.password_manager = PasswordManager(self.db_manager)
+    def __init__(self, db_file, shard_dir=None):
+        self.vault = None
+        if shard_dir:
+            # Sharded mode: accounts are looked up in the catalog, entries live in each user's shard,
+            # whose history is pruned when it is first opened.
+            self.vault = ShardedVault(shard_dir, on_open=lambda db: start_history_pruning(db.path))
+            self.db_manager = None
+            self.user_manager = UserManager(None, ShardedUserStore(self.vault))
+            self.password_manager = None
+        else:
+            self.db_manager = DatabaseManager(db_file)
+            self.user_manager = UserManager(self.db_manager)
+            self.password_manager = PasswordManager(self.db_manager)
+            start_history_pruning(db_file)
+
+    def whole_vault_only(self):
+        """CSV and online backup work on a single-file vault; shards are backed up per user."""
+        if self.vault is None:
+            return False
+        print(RED + "❌ Not available for a sharded vault. Use: python -m vault_core.shards backup <dir> <user> <file>" + RESET)
+        input()
+        return True
 
     def csv_menu(self):
+        if self.whole_vault_only():
+            return
         while True:
-            os.system("cls" if os.name == "nt" else "clear")
+            clear_screen()
             UI.print_heading("csvmenu")
             print(CYAN + "1.  Export Data to CSV" + RESET)
             print(CYAN + "2.  Import Data from CSV" + RESET)
-            print(CYAN + "3.  Back to Main Menu" + RESET)
+            print(CYAN + "3.  Merge Data from CSV" + RESET)
+            print(CYAN + "4.  Back to Main Menu" + RESET)
             choice = input(MAGENTA + "👉 Enter your choice: " + RESET)
             if choice == "1":
                 self.export_csv()
@@ -648,81 +767,77 @@ class Application:
                 self.import_csv()
                 input("\nPress Enter to continue...")
             elif choice == "3":
+                self.merge_csv()
+                input("\nPress Enter to continue...")
+            elif choice == "4":
                 break
             else:
                 print(RED + "❌ Invalid choice! Try again." + RESET)
                 input()
 
     def export_csv(self):
-        cur = self.db_manager.conn.cursor()
-        cur.execute("SELECT username, password, security_question, security_answer FROM users")
-        users = cur.fetchall()
-        with open("export_users.csv", "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["username","password_hash","security_question_encrypted","security_answer_encrypted"])
-            writer.writerows(users)
-        cur.execute("SELECT id, username, platform, platform_username, email, password FROM passwords")
-        pwds = cur.fetchall()
-        with open("export_passwords.csv","w",newline="",encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["id","username","platform","platform_username","email","password_encrypted"])
-            writer.writerows(pwds)
-        print(GREEN + "✅ Data exported to export_users.csv & export_passwords.csv" + RESET)
+        csv_io.export_csv(self.db_manager)
+        print(GREEN + f"✅ Data exported to {csv_io.USERS_CSV} & {csv_io.PASSWORDS_CSV}" + RESET)
 
-    def import_csv(self):
-        confirm = input(YELLOW + "⚠️  This will overwrite your local data. Continue? (yes/no): " + RESET)
-        if confirm.lower() not in ["yes","y"]:
-            print(RED + "Import canceled." + RESET)
-            return
+    def ask_csv_files(self):
+        """Prompts for the two CSV files; returns (users file, passwords file) or None."""
         pass_file = input("Enter Passwords CSV file name or full path: ")
         if pass_file == "":
             print(RED + "File name cannot be empty." + RESET)
-            return
+            return None
         user_file = input("Enter Users CSV file name or full path: ")
         if user_file == "":
             print(RED + "File name cannot be empty." + RESET)
-            return
-        if ".csv" in pass_file:
+            return None
+        if not pass_file.lower().endswith(".csv"):
             pass_file += ".csv"
 
-        if ".csv" in user_file:
+        if not user_file.lower().endswith(".csv"):
             user_file += ".csv"
         
         if not (os.path.exists(pass_file) and os.path.exists(user_file)):
             print(RED + "CSV files not found." + RESET)
+            return None
+        return user_file, pass_file
+
+    def import_csv(self):
+        confirm = input(YELLOW + "⚠️  This will overwrite your local data. Continue? (yes/no): " + RESET)
+        if confirm.lower() not in ["yes","y"]:
+            print(RED + "Import canceled." + RESET)
             return
-        
-        cur = self.db_manager.conn.cursor()
-        cur.execute("DELETE FROM passwords")
-        cur.execute("DELETE FROM users")
-        self.db_manager.conn.commit()
-        # import users
-        with open(user_file, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                cur.execute(
-                    "INSERT INTO users (username,password,security_question,security_answer) VALUES (?,?,?,?)",
-                    (row["username"], row["password_hash"], row["security_question_encrypted"], row["security_answer_encrypted"])
-                )
-        # import passwords
-        with open("export_passwords.csv", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                cur.execute(
-                    "INSERT INTO passwords (id,username,platform,platform_username,email,password) VALUES (?,?,?,?,?,?)",
-                    (row["id"], row["username"], row["platform"], row["platform_username"], row["email"], row["password_encrypted"])
-                )
-        self.db_manager.conn.commit()
-        print(GREEN + "✅ Data imported from CSV successfully!" + RESET)
+        files = self.ask_csv_files()
+        if files is None:
+            return
+        try:
+            users, passwords = csv_io.import_csv(self.db_manager, *files)
+        except StagingError as e:
+            print(RED + f"❌ Import failed, your data was not changed: {e}" + RESET)
+            return
+        print(GREEN + f"✅ Imported {users} users and {passwords} passwords from CSV successfully!" + RESET)
 
+    def merge_csv(self):
+        files = self.ask_csv_files()
+        if files is None:
+            return
+        policy = ask_merge_policy()
+        try:
+            counts = csv_io.merge_csv(self.db_manager, *files, policy=policy)
+        except StagingError as e:
+            print(RED + f"❌ Merge failed, your data was not changed: {e}" + RESET)
+            return
+        print_merge_counts(counts)
 
     def backup_restore_menu(self):
+        if self.whole_vault_only():
+            return
         while True:
-            os.system("cls" if os.name == "nt" else "clear")
+            clear_screen()
             UI.print_heading("backupmenu")
             print(CYAN + "1.  Online Backup" + RESET)
             print(CYAN + "2.  Online Restore" + RESET)
-            print(CYAN + "3.  Back to Main Menu" + RESET)
+            print(CYAN + "3.  Merge Online Backup" + RESET)
+            print(CYAN + "4.  Two-way Sync with Other Devices" + RESET)
+            print(CYAN + "5.  Back to Main Menu" + RESET)
             choice = input(MAGENTA + "👉 Enter your choice: " + RESET)
             if choice == "1":
                 backup_online_data(self.db_manager)
@@ -731,14 +846,21 @@ class Application:
                 restore_online_data(self.db_manager)
                 input("\nPress Enter to continue...")
             elif choice == "3":
+                merge_online_data(self.db_manager, ask_merge_policy())
+                input("\nPress Enter to continue...")
+            elif choice == "4":
+                sync_online_data(self.db_manager)
+                input("\nPress Enter to continue...")
+            elif choice == "5":
                 break
             else:
                 print(RED + "❌ Invalid choice! Try again." + RESET)
                 input()
 
     def password_menu(self, username):
+        password_manager = PasswordManager(self.vault.open_user(username)) if self.vault else self.password_manager
         while True:
-            os.system("cls" if os.name == "nt" else "clear")
+            clear_screen()
             UI.print_heading("passmenu")
             print(CYAN + "1.  Add Password" + RESET)
             print(CYAN + "2.  Access Passwords" + RESET)
@@ -746,29 +868,48 @@ class Application:
             print(CYAN + "4.  Delete Password" + RESET)
             print(CYAN + "5.  List Platforms" + RESET)
             print(CYAN + "6.  Check Password Health" + RESET)
-            print(CYAN + "7.  Logout" + RESET)
+            print(CYAN + "7.  Find Accounts by Email/Username" + RESET)
+            print(CYAN + "8.  Password History" + RESET)
+            print(CYAN + "9.  Tags & Folders" + RESET)
+            print(CYAN + "10. 2FA Codes" + RESET)
+            print(CYAN + "11. Import from Browser or Password Manager" + RESET)
+            print(CYAN + "12. Logout" + RESET)
             choice = input(MAGENTA + "👉 Enter your choice: " + RESET)
             if choice == "1":
-                self.password_manager.add_password(username)
+                password_manager.add_password(username)
             elif choice == "2":
-                self.password_manager.access_passwords(username)
+                password_manager.access_passwords(username)
             elif choice == "3":
-                self.password_manager.edit_password(username)
+                password_manager.edit_password(username)
             elif choice == "4":
-                self.password_manager.delete_password(username)
+                password_manager.delete_password(username)
             elif choice == "5":
-                self.password_manager.show_listed_platforms(username)
+                password_manager.show_listed_platforms(username)
             elif choice == "6":
-                self.password_manager.check_password_health(username)
+                password_manager.check_password_health(username)
             elif choice == "7":
+                password_manager.find_accounts(username)
+            elif choice == "8":
+                password_manager.password_history(username)
+            elif choice == "9":
+                password_manager.manage_tags(username)
+            elif choice == "10":
+                password_manager.two_factor_codes(username)
+            elif choice == "11":
+                password_manager.import_passwords(username)
+            elif choice == "12":
                 break
             else:
                 print(RED + "❌ Invalid choice! Try again." + RESET)
             input()
 
+    def run_tui(self):
+        """The full-screen interface (vault_core.tui) on the same stores as the menus."""
+        tui.run(self.user_manager.store, self.vault.open_user if self.vault else lambda username: self.db_manager)
+
     def run(self):
         while True:
-            os.system("cls" if os.name == "nt" else "clear")
+            clear_screen()
             UI.print_heading("main")
             print(CYAN + "1.  Signup" + RESET)
             print(CYAN + "2.  Login" + RESET)
@@ -784,7 +925,8 @@ class Application:
                 username = self.user_manager.login()
                 if username:
                     # Automatically back up online after login if internet is available.
-                    backup_online_data(self.db_manager)
+                    if self.vault is None:
+                        backup_online_data(self.db_manager)
                     self.password_menu(username)
             elif choice == "3":
                 self.user_manager.list_users()
@@ -794,15 +936,70 @@ class Application:
                 self.backup_restore_menu()
             elif choice == "6":
                 self.csv_menu()
-            elif choice == "6":
+            elif choice == "7":
                 print(GREEN + "🚪 Exiting... Goodbye!" + RESET)
                 break
             else:
                 print(RED + "❌ Invalid choice! Try again." + RESET)
             input()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Secure Password Manager")
+    parser.add_argument("--storage-format", choices=STORAGE_FORMATS,
+                        help="Migrate the vault to this storage format and exit.")
+    parser.add_argument("--stats", action="store_true",
+                        help="Print latency statistics for database, crypto, CSV and backup operations on exit.")
+    parser.add_argument("--stats-file", metavar="PATH",
+                        help="Write the statistics on exit as Prometheus text (.prom/.txt) or JSON (any other name).")
+    parser.add_argument("--history-keep", type=int, metavar="N",
+                        help="Keep the N most recent earlier passwords of each entry (default %d) and exit; "
+                             "with --shards, in every shard." % HISTORY_KEEP)
+    parser.add_argument("--shards", metavar="DIR",
+                        help="Use a sharded vault (one SQLite file per user) in DIR instead of database.db. "
+                             "Create one with: python -m vault_core.shards split database.db DIR. "
+                             "CSV import/export, online backup and sync work on database.db only: "
+                             "back up a sharded user with python -m vault_core.shards backup DIR USER FILE")
+    parser.add_argument("--tui", action="store_true",
+                        help="Use the full-screen terminal interface instead of the numbered menus.")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    # Initialize Firebase for online backup/restore
-    init_firebase()
-    app = Application(DB_FILE)
-    app.run()
+    args = parse_args()
+    # Timing costs a little on every statement, so it is only switched on when asked for.
+    stats.enabled = bool(args.stats or args.stats_file)
+    if args.storage_format:
+        db_manager = DatabaseManager(DB_FILE)
+        size_before = os.path.getsize(DB_FILE)
+        count = db_manager.migrate_storage_format(args.storage_format)
+        db_manager.close()
+        print(GREEN + f"✅ Rewrote {count} encrypted values as '{args.storage_format}' "
+              f"({size_before} -> {os.path.getsize(DB_FILE)} bytes)." + RESET)
+        sys.exit(0)
+    if args.history_keep is not None:
+        if args.shards:
+            vault = ShardedVault(args.shards)
+            removed = sum(set_history_keep(vault.open_shard(shard), args.history_keep) for shard in vault.shards())
+            vault.close()
+        else:
+            db_manager = DatabaseManager(DB_FILE)
+            removed = set_history_keep(db_manager, args.history_keep)
+            db_manager.close()
+        print(GREEN + f"✅ Keeping {max(args.history_keep, 0)} earlier passwords per entry "
+              f"({removed} older versions removed)." + RESET)
+        sys.exit(0)
+    if not args.tui:
+        # Initialize Firebase for online backup/restore
+        init_firebase()
+    app = Application(DB_FILE, args.shards)
+    try:
+        if args.tui:
+            app.run_tui()
+        else:
+            app.run()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        if args.stats:
+            print(CYAN + stats.format_table() + RESET)
+        if args.stats_file:
+            stats.dump(args.stats_file)
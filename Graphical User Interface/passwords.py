@@ -1,286 +1,115 @@
 import sys
 import os
-import sqlite3
-import hashlib
-import csv
-import socket
-import secrets
-import string
-from cryptography.fernet import Fernet
-import firebase_admin
-from firebase_admin import credentials, firestore
+import time
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QStackedWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QListWidget, QMessageBox, QFileDialog,
-    QTableWidget, QTableWidgetItem, QInputDialog, QFormLayout, QGroupBox
+    QPushButton, QLabel, QLineEdit, QListWidget, QListWidgetItem, QMessageBox, QFileDialog,
+    QTableWidget, QTableWidgetItem, QInputDialog, QFormLayout, QGroupBox, QAbstractItemView, QCompleter
 )
 from PyQt5.QtGui import QFont, QColor, QPalette
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, QAbstractListModel, QModelIndex
+
+# vault_core lives at the repository root, one level above this script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vault_core import csv_io, health, importers, merge, replication, sync, totp
+from vault_core.generator import PasswordGenerator
+from vault_core.instrumentation import stats
+from vault_core.platforms import PlatformIndex
+from vault_core.storage import PAGE_SIZE, DatabaseManager, PasswordStore, StagingError, UserStore, prune_history
+from vault_core.tags import TagStore
 
 # --------------------
-# Encryption Utilities
+# Generation & Online Sync
 # --------------------
-def load_key():
-    if os.path.exists("secret.key"):
-        with open("secret.key", "rb") as f:
-            return f.read()
-    key = Fernet.generate_key()
-    with open("secret.key", "wb") as f:
-        f.write(key)
-    return key
-
-KEY = load_key()
-cipher = Fernet(KEY)
-
-def encrypt_data(data: str) -> bytes:
-    return cipher.encrypt(data.encode())
+password_generator = PasswordGenerator.from_file()
 
-def decrypt_data(data: bytes) -> str:
-    return cipher.decrypt(data).decode()
+def run_sync(action, db):
+    """Runs an online backup or restore; returns None on success, else the error message."""
+    try:
+        action(db)
+        return None
+    except Exception as e:
+        return str(e)
 
 # --------------------
-# Password Strength & Generation
+# Background Bulk Operations
 # --------------------
-def check_password_strength(password: str) -> str:
-    score = 0
-    if len(password) >= 8: score += 1
-    if any(c.islower() for c in password): score += 1
-    if any(c.isupper() for c in password): score += 1
-    if any(c.isdigit() for c in password): score += 1
-    if any(c in string.punctuation for c in password): score += 1
-    if score <= 2:
-        return "Weak"
-    elif score == 3:
-        return "Medium"
-    elif score == 4:
-        return "Strong"
-    else:
-        return "Very Strong"
+class BulkWorker(QThread):
+    """
+    Runs one bulk PasswordStore operation on its own connection (SQLite connections
+    are bound to the thread that opened them) so the window stays responsive.
+    """
+    done = pyqtSignal(object, str)  # result, error message ("" on success)
+
+    def __init__(self, db_path: str, operation: str, *args):
+        super().__init__()
+        self.db_path, self.operation, self.args = db_path, operation, args
+
+    def target(self, db):
+        return getattr(PasswordStore(db), self.operation)
+
+    def run(self):
+        db = DatabaseManager(self.db_path)
+        try:
+            self.done.emit(self.target(db)(*self.args), "")
+        except Exception as e:
+            self.done.emit(None, str(e))
+        finally:
+            db.close()
+
+class ImportWorker(BulkWorker):
+    """Runs a vault_core.importers function, which takes the connection first, in the background."""
+    def target(self, db):
+        return lambda *args: getattr(importers, self.operation)(db, *args)
+
+class HistoryPruner(QThread):
+    """Trims old password history versions on its own connection, in short batches."""
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
 
-# --------------------
-# Database Manager
-# --------------------
-class DatabaseManager:
-    def __init__(self, path="database.db"):
-        self.conn = sqlite3.connect(path)
-        self.conn.execute("PRAGMA foreign_keys = ON")
-        self.create_tables()
-
-    def create_tables(self):
-        c = self.conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT NOT NULL,
-            security_q BLOB NOT NULL,
-            security_a BLOB NOT NULL
-        )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS passwords (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            owner TEXT NOT NULL,
-            platform TEXT NOT NULL,
-            platform_user TEXT NOT NULL,
-            email TEXT NOT NULL,
-            pwd BLOB NOT NULL,
-            FOREIGN KEY(owner) REFERENCES users(username) ON DELETE CASCADE
-        )''')
-        self.conn.commit()
-
-    def close(self):
-        self.conn.close()
+    def run(self):
+        db = DatabaseManager(self.db_path)
+        try: prune_history(db)
+        finally: db.close()
 
-# --------------------
-# Firebase Init
-# --------------------
-db_online = None
-def init_firebase():
-    global db_online
-    try:
-        cred = credentials.Certificate("serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-        db_online = firestore.client()
-    except Exception:
-        db_online = None
+class NetworkInit(QThread):
+    """Initializes Firebase off the UI thread: importing firebase_admin alone takes longer than showing the window."""
+    def run(self):
+        try: sync.init_firebase()
+        except Exception: pass
 
 # --------------------
-# Internet Check
+# Platform Completion
 # --------------------
-def internet_available(host="8.8.8.8", port=53, timeout=3):
-    try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return True
-    except Exception:
-        return False
+class PlatformModel(QAbstractListModel):
+    """
+    The user's platform names for a QCompleter, served straight from a PlatformIndex's
+    sorted list: no item object per platform, and the completer can binary-search it.
+    """
+    def __init__(self, index: PlatformIndex):
+        super().__init__()
+        self.index = index
+        self.names = []
 
-# --------------------
-# Business Logic
-# --------------------
-class UserManager:
-    def __init__(self, db: DatabaseManager):
-        self.db = db
-
-    def hash_password(self, pwd: str) -> str:
-        return hashlib.sha256(pwd.encode()).hexdigest()
-
-    def signup(self, username: str, password: str, question: str, answer: str) -> bool:
-        c = self.db.conn.cursor()
-        c.execute("SELECT 1 FROM users WHERE username=?", (username,))
-        if c.fetchone(): return False
-        pwd_hash = self.hash_password(password)
-        enc_q = encrypt_data(question)
-        enc_a = encrypt_data(answer)
-        c.execute("INSERT INTO users(username,password,security_q,security_a) VALUES(?,?,?,?)",
-                  (username, pwd_hash, enc_q, enc_a))
-        self.db.conn.commit()
-        return True
-
-    def login(self, username: str, password: str) -> bool:
-        c = self.db.conn.cursor()
-        c.execute("SELECT password FROM users WHERE username=?", (username,))
-        row = c.fetchone()
-        if not row: return False
-        return row[0] == self.hash_password(password)
-
-    def get_security(self, username: str):
-        c = self.db.conn.cursor()
-        c.execute("SELECT security_q, security_a FROM users WHERE username=?", (username,))
-        row = c.fetchone()
-        if not row: return None
-        return (decrypt_data(row[0]), decrypt_data(row[1]))
-
-    def reset_password(self, username: str, new_password: str) -> bool:
-        c = self.db.conn.cursor()
-        c.execute("SELECT 1 FROM users WHERE username=?", (username,))
-        if not c.fetchone(): return False
-        c.execute("UPDATE users SET password=? WHERE username=?",
-                  (self.hash_password(new_password), username))
-        self.db.conn.commit()
-        return True
-
-    def delete_account(self, username: str) -> bool:
-        c = self.db.conn.cursor()
-        c.execute("DELETE FROM users WHERE username=?", (username,))
-        self.db.conn.commit()
-        return True
-
-class PasswordManagerLogic:
-    def __init__(self, db: DatabaseManager):
-        self.db = db
-
-    def add_password(self, owner: str, platform: str, plat_user: str, email: str, pwd: str):
-        c = self.db.conn.cursor()
-        enc_pwd = encrypt_data(pwd)
-        c.execute(
-            "INSERT INTO passwords(owner,platform,platform_user,email,pwd) VALUES(?,?,?,?,?)",
-            (owner, platform, plat_user, email, enc_pwd)
-        )
-        self.db.conn.commit()
-
-    def list_platforms(self, owner: str):
-        c = self.db.conn.cursor()
-        c.execute("SELECT DISTINCT platform FROM passwords WHERE owner=?", (owner,))
-        return [r[0] for r in c.fetchall()]
-
-    def get_passwords(self, owner: str, platform: str):
-        c = self.db.conn.cursor()
-        c.execute("SELECT id,platform_user,email,pwd FROM passwords WHERE owner=? AND platform=?",
-                  (owner, platform))
-        rows = c.fetchall()
-        return [(r[0], r[1], r[2], decrypt_data(r[3])) for r in rows]
-
-    def delete_password(self, pwd_id: int):
-        c = self.db.conn.cursor()
-        c.execute("DELETE FROM passwords WHERE id=?", (pwd_id,))
-        self.db.conn.commit()
-
-    def update_password(self, pwd_id: int, new_user: str, new_pwd: str):
-        c = self.db.conn.cursor()
-        c.execute(
-            "UPDATE passwords SET platform_user=?,pwd=? WHERE id=?",
-            (new_user, encrypt_data(new_pwd), pwd_id)
-        )
-        self.db.conn.commit()
-
-    def check_health(self, owner: str):
-        c = self.db.conn.cursor()
-        c.execute("SELECT platform,pwd FROM passwords WHERE owner=?", (owner,))
-        results = []
-        for plat, pwd_blob in c.fetchall():
-            pwd = decrypt_data(pwd_blob)
-            results.append((plat, check_password_strength(pwd)))
-        return results
-
-# CSV Import/Export
-def export_csv(db: DatabaseManager):
-    c = db.conn.cursor()
-    c.execute("SELECT username,password,security_q,security_a FROM users")
-    users = c.fetchall()
-    with open("export_users.csv","w",newline='',encoding='utf-8') as f:
-        w = csv.writer(f)
-        w.writerow(["username","password_hash","security_q","security_a"])
-        w.writerows(users)
-
-    c.execute("SELECT id,owner,platform,platform_user,email,pwd FROM passwords")
-    pwds = c.fetchall()
-    with open("export_passwords.csv","w",newline='',encoding='utf-8') as f:
-        w = csv.writer(f)
-        w.writerow(["id","owner","platform","platform_user","email","pwd"])
-        w.writerows(pwds)
-
-def import_csv(db: DatabaseManager):
-    c = db.conn.cursor()
-    c.execute("DELETE FROM passwords")
-    c.execute("DELETE FROM users")
-    db.conn.commit()
-    with open("export_users.csv",newline='',encoding='utf-8') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            c.execute(
-                "INSERT INTO users(username,password,security_q,security_a) VALUES(?,?,?,?)",
-                (row['username'], row['password_hash'], row['security_q'], row['security_a'])
-            )
-    with open("export_passwords.csv",newline='',encoding='utf-8') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            c.execute(
-                "INSERT INTO passwords(id,owner,platform,platform_user,email,pwd) VALUES(?,?,?,?,?,?)",
-                (row['id'], row['owner'], row['platform'], row['platform_user'], row['email'], row['pwd'])
-            )
-    db.conn.commit()
-
-# Firebase Backup/Restore
-def backup_online(db: DatabaseManager):
-    global db_online
-    if not db_online or not internet_available(): return False
-    c = db.conn.cursor()
-    c.execute("SELECT username,password,security_q,security_a FROM users")
-    users = [dict(username=r[0],password=r[1],security_q=r[2],security_a=r[3]) for r in c.fetchall()]
-    c.execute("SELECT id,owner,platform,platform_user,email,pwd FROM passwords")
-    pwds = [dict(id=r[0],owner=r[1],platform=r[2],platform_user=r[3],email=r[4],pwd=r[5]) for r in c.fetchall()]
-    db_online.collection('db_backup').document('backup').set({'users':users,'passwords':pwds})
-    return True
-
-def restore_online(db: DatabaseManager):
-    global db_online
-    if not db_online or not internet_available(): return False
-    doc = db_online.collection('db_backup').document('backup').get()
-    if not doc.exists: return False
-    data = doc.to_dict()
-    c = db.conn.cursor()
-    c.execute("DELETE FROM passwords")
-    c.execute("DELETE FROM users")
-    for u in data['users']:
-        c.execute(
-            "INSERT INTO users(username,password,security_q,security_a) VALUES(?,?,?,?)",
-            (u['username'], u['password'], u['security_q'], u['security_a'])
-        )
-    for p in data['passwords']:
-        c.execute(
-            "INSERT INTO passwords(id,owner,platform,platform_user,email,pwd) VALUES(?,?,?,?,?,?)",
-            (p['id'], p['owner'], p['platform'], p['platform_user'], p['email'], p['pwd'])
-        )
-    db.conn.commit()
-    return True
+    def load(self, owner):
+        names = self.index.platforms(owner) if owner else []
+        if names is self.names: return  # the index handed back its cached list: nothing changed
+        self.beginResetModel(); self.names = names; self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole) and 0 <= index.row() < len(self.names):
+            return self.names[index.row()]
+        return None
+
+def platform_completer(model: PlatformModel, parent: QWidget) -> QCompleter:
+    completer = QCompleter(model, parent)
+    completer.setCaseSensitivity(Qt.CaseSensitive)
+    completer.setModelSorting(QCompleter.CaseSensitivelySortedModel)
+    return completer
 
 # --------------------
 # PyQt5 GUI
@@ -288,16 +117,38 @@ def restore_online(db: DatabaseManager):
 class SecureManagerGUI(QWidget):
     def __init__(self):
         super().__init__()
-        init_firebase()
         self.db = DatabaseManager()
-        self.user_logic = UserManager(self.db)
-        self.pwd_logic = PasswordManagerLogic(self.db)
+        self.user_logic = UserStore(self.db)
+        self.pwd_logic = PasswordStore(self.db)
+        self.tag_logic = TagStore(self.db)
+        self.platform_model = PlatformModel(PlatformIndex(self.db))
+        self.code_board = totp.CodeBoard(self.pwd_logic)
         self.current_user = None
+        self.bulk_worker = None
+        # Started after the first paint (see start_background_work), so they never delay the login window.
+        self.history_pruner = HistoryPruner(self.db.path)
+        self.network_init = NetworkInit()
+        self.background_started = False
         self.setWindowTitle("Secure Password Manager")
         self.resize(1000, 700)
+        # The theme stays up front (skipping it would flash an unstyled window); it only styles the screens built so far.
         self.apply_theme()
         self.build_ui()
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        self.start_background_work()
+
+    def start_background_work(self):
+        if self.background_started: return
+        self.background_started = True
+        self.network_init.start(); self.history_pruner.start()
+
+    def wait_for_network(self):
+        """Online actions call this first, in case Firebase is still being initialized."""
+        self.start_background_work()
+        self.network_init.wait()
+
     def apply_theme(self):
         # global black/green theme
         pal = QPalette()
@@ -334,18 +185,23 @@ class SecureManagerGUI(QWidget):
         v = QVBoxLayout(self)
         v.addWidget(self.stack)
 
-        self.login_screen = self.screen_login()
-        self.signup_screen = self.screen_signup()
-        self.dashboard = self.screen_dashboard()
-        self.pwd_screen = self.screen_passwords()
-        self.backup_screen = self.screen_backup()
-        self.csv_screen = self.screen_csv()
+        # Only the login screen is built up front; the others are built the first time they are shown.
+        self.screen_factories = {
+            "login": self.screen_login, "signup": self.screen_signup, "dashboard": self.screen_dashboard,
+            "passwords": self.screen_passwords, "backup": self.screen_backup, "csv": self.screen_csv,
+            "diagnostics": self.screen_diagnostics, "totp": self.screen_totp,
+        }
+        self.screens = {}
+        self.show_screen("login")
 
-        for w in [self.login_screen, self.signup_screen, self.dashboard,
-                  self.pwd_screen, self.backup_screen, self.csv_screen]:
-            self.stack.addWidget(w)
+    def screen(self, name: str) -> QWidget:
+        if name not in self.screens:
+            self.screens[name] = self.screen_factories[name]()
+            self.stack.addWidget(self.screens[name])
+        return self.screens[name]
 
-        self.stack.setCurrentWidget(self.login_screen)
+    def show_screen(self, name: str):
+        self.stack.setCurrentWidget(self.screen(name))
 
     # -- Login Screen --
     def screen_login(self):
@@ -360,7 +216,7 @@ class SecureManagerGUI(QWidget):
         form.addRow("Password:", self.login_pwd)
         btn_login = QPushButton("Login"); btn_login.clicked.connect(self.do_login)
         btn_to_signup = QPushButton("Sign Up")
-        btn_to_signup.clicked.connect(lambda: self.stack.setCurrentWidget(self.signup_screen))
+        btn_to_signup.clicked.connect(lambda: self.show_screen("signup"))
         h = QHBoxLayout(); h.addWidget(btn_login); h.addWidget(btn_to_signup)
         form.addRow(h)
         w.setLayout(form)
@@ -371,9 +227,10 @@ class SecureManagerGUI(QWidget):
         p = self.login_pwd.text()
         if self.user_logic.login(u,p):
             self.current_user = u
-            backup_online(self.db)
+            self.wait_for_network()
+            run_sync(sync.backup_online, self.db)
             self.refresh_password_list()
-            self.stack.setCurrentWidget(self.dashboard)
+            self.show_screen("dashboard")
             self.login_user.clear(); self.login_pwd.clear()
         else:
             QMessageBox.warning(self, "Error", "Invalid credentials.")
@@ -395,7 +252,7 @@ class SecureManagerGUI(QWidget):
         form.addRow("Answer:", self.su_a)
         btn_create = QPushButton("Create"); btn_create.clicked.connect(self.do_signup)
         btn_back = QPushButton("Back")
-        btn_back.clicked.connect(lambda: self.stack.setCurrentWidget(self.login_screen))
+        btn_back.clicked.connect(lambda: self.show_screen("login"))
         h = QHBoxLayout(); h.addWidget(btn_create); h.addWidget(btn_back)
         form.addRow(h)
         w.setLayout(form); return w
@@ -407,7 +264,7 @@ class SecureManagerGUI(QWidget):
             return
         if self.user_logic.signup(u,p,q,a):
             QMessageBox.information(self, "Success", "Account created.")
-            self.stack.setCurrentWidget(self.login_screen)
+            self.show_screen("login")
             self.su_user.clear(); self.su_pwd.clear(); self.su_q.clear(); self.su_a.clear()
         else:
             QMessageBox.warning(self, "Error", "Username exists.")
@@ -416,9 +273,10 @@ class SecureManagerGUI(QWidget):
     def screen_dashboard(self):
         w = QWidget(); v = QVBoxLayout()
         for text, func in [
-            ("Manage Passwords", lambda:self.stack.setCurrentWidget(self.pwd_screen)),
-            ("Backup/Restore", lambda:self.stack.setCurrentWidget(self.backup_screen)),
-            ("CSV Import/Export", lambda:self.stack.setCurrentWidget(self.csv_screen)),
+            ("Manage Passwords", self.show_passwords),
+            ("Backup/Restore", lambda:self.show_screen("backup")),
+            ("CSV Import/Export", lambda:self.show_screen("csv")),
+            ("Diagnostics", self.show_diagnostics),
             ("Logout", self.do_logout)
         ]:
             btn = QPushButton(text); btn.clicked.connect(func)
@@ -426,51 +284,190 @@ class SecureManagerGUI(QWidget):
         w.setLayout(v); return w
 
     def do_logout(self):
+        # Nothing of this user may be left for the next one: their passwords, platforms, tags and 2FA codes are cleared.
         self.current_user = None
-        self.stack.setCurrentWidget(self.login_screen)
+        if "passwords" in self.screens:
+            self.platform_list.clear(); self.platform_search.clear(); self.tag_filter.clear()
+            self.tag_list.blockSignals(True); self.tag_list.clear(); self.tag_list.blockSignals(False)
+            self.pwd_table.setRowCount(0); self.page_after = None; self.bulk_status.clear()
+        if "totp" in self.screens:
+            self.totp_timer.stop(); self.totp_table.setRowCount(0)
+        self.platform_model.load(None); self.code_board.clear()
+        self.show_screen("login")
 
     # -- Password Manager Screen --
+    def show_passwords(self):
+        self.show_screen("passwords")
+        self.refresh_password_list()
+
     def screen_passwords(self):
         w = QWidget(); v = QVBoxLayout(); h = QHBoxLayout()
         self.platform_list = QListWidget(); self.platform_list.clicked.connect(self.on_platform_select)
         self.pwd_table = QTableWidget(0,4)
         self.pwd_table.setHorizontalHeaderLabels(["ID","User","Email","Password"])
-        h.addWidget(self.platform_list,1); h.addWidget(self.pwd_table,3)
+        # Ctrl/Shift-click selects several entries for the bulk actions.
+        self.pwd_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.pwd_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.pwd_table.verticalScrollBar().valueChanged.connect(self.on_table_scroll)
+        self.page_after = None
+        # Sidebar: platforms, then tags; selecting tags (or typing a filter) lists the entries carrying them.
+        side = QVBoxLayout()
+        self.platform_search = QLineEdit(); self.platform_search.setPlaceholderText("Go to platform...")
+        self.platform_search.setCompleter(platform_completer(self.platform_model, self.platform_search))
+        self.platform_search.returnPressed.connect(self.on_platform_search)
+        side.addWidget(self.platform_search); side.addWidget(self.platform_list,2)
+        side.addWidget(QLabel("Tags"))
+        self.tag_list = QListWidget(); self.tag_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.tag_list.itemSelectionChanged.connect(self.on_tags_select)
+        side.addWidget(self.tag_list,1)
+        self.tag_filter = QLineEdit(); self.tag_filter.setPlaceholderText("work 2fa|otp  (space = AND, | = OR)")
+        self.tag_filter.returnPressed.connect(self.on_tag_filter)
+        side.addWidget(self.tag_filter)
+        h.addLayout(side,1); h.addWidget(self.pwd_table,3)
         v.addLayout(h)
+        self.pwd_buttons = []
         for text, func in [
             ("Add", self.on_add_pwd),
             ("Edit", self.on_edit_pwd),
-            ("Delete", self.on_del_pwd),
+            ("Delete Selected", self.on_del_pwd),
+            ("Move Selected to Platform", self.on_move_pwds),
+            ("Regenerate Selected", self.on_regenerate_pwds),
             ("Check Health", self.on_check_health),
-            ("Back", lambda:self.stack.setCurrentWidget(self.dashboard))
+            ("Find by Email/Username", self.on_find_accounts),
+            ("History of Selected", self.on_password_history),
+            ("Tag Selected", self.on_tag_pwds),
+            ("Untag Selected", self.on_untag_pwds),
+            ("Set 2FA Secret for Selected", self.on_set_totp),
+            ("2FA Codes", self.show_totp),
+            ("Import from Browser/Manager", self.on_import_export),
+            ("Back", lambda:self.show_screen("dashboard"))
         ]:
             btn = QPushButton(text); btn.clicked.connect(func)
             btn.setFont(QFont('Consolas',12)); v.addWidget(btn)
+            self.pwd_buttons.append(btn)
+        self.bulk_status = QLabel(""); v.addWidget(self.bulk_status)
         w.setLayout(v); return w
 
     def refresh_password_list(self):
+        """Reloads the platform list from the platform summary: one row per platform, no scan of the entries."""
+        if not self.current_user or "passwords" not in self.screens: return
+        current = self.current_platform()
         self.platform_list.clear()
-        if self.current_user:
-            for plat in self.pwd_logic.list_platforms(self.current_user):
-                self.platform_list.addItem(plat)
+        for plat, count, modified_at in self.pwd_logic.platform_summary(self.current_user):
+            item = QListWidgetItem(f"{plat} ({count})")
+            item.setData(Qt.UserRole, plat)
+            item.setToolTip("Last modified " + time.strftime("%Y-%m-%d %H:%M", time.localtime(modified_at)))
+            self.platform_list.addItem(item)
+            if plat == current: self.platform_list.setCurrentItem(item)
+        self.platform_model.load(self.current_user)
+        self.refresh_tag_list()
+
+    def refresh_tag_list(self):
+        self.tag_list.blockSignals(True); self.tag_list.clear()
+        for tag, count in self.tag_logic.tags(self.current_user):
+            item = QListWidgetItem(f"{tag} ({count})")
+            item.setData(Qt.UserRole, tag); self.tag_list.addItem(item)
+        self.tag_list.blockSignals(False)
+
+    def current_platform(self):
+        item = self.platform_list.currentItem()
+        return item.data(Qt.UserRole) if item else None
+
+    def in_tag_view(self):
+        """True while the table lists tag-filter matches from many platforms, with their passwords masked."""
+        return self.current_platform() is None
+
+    def on_platform_search(self):
+        plat = self.platform_search.text().strip()
+        for row in range(self.platform_list.count()):
+            if self.platform_list.item(row).data(Qt.UserRole) == plat:
+                self.platform_list.setCurrentRow(row); self.platform_search.clear()
+                self.on_platform_select(); return
+        QMessageBox.warning(self, "Platform", f"No saved credentials for '{plat}'.")
+
+    def ask_platform(self, title: str, label: str):
+        """QInputDialog.getText for a platform name, completing it from the user's saved platforms."""
+        dialog = QInputDialog(self); dialog.setWindowTitle(title); dialog.setLabelText(label)
+        dialog.setInputMode(QInputDialog.TextInput)  # builds the line edit now, so it can take the completer
+        line_edit = dialog.findChild(QLineEdit)
+        line_edit.setCompleter(platform_completer(self.platform_model, line_edit))
+        ok = dialog.exec_() == QInputDialog.Accepted
+        text = dialog.textValue().strip(); dialog.deleteLater()
+        return text, ok
 
     def on_platform_select(self):
-        plat = self.platform_list.currentItem().text()
-        data = self.pwd_logic.get_passwords(self.current_user, plat)
-        self.pwd_table.setRowCount(len(data))
-        for i, row in enumerate(data):
+        # Loads the first page only; load_more_rows fetches the next one as the table scrolls near its end.
+        self.page_after = ("", 0)
+        self.pwd_table.setRowCount(0)
+        self.load_more_rows(); self.fill_table()
+
+    def load_more_rows(self):
+        plat = self.current_platform()
+        if plat is None or self.page_after is None: return
+        data = self.pwd_logic.passwords_page(self.current_user, plat, self.page_after, PAGE_SIZE)
+        self.page_after = (data[-1][1], data[-1][0]) if len(data) == PAGE_SIZE else None
+        start = self.pwd_table.rowCount()
+        self.pwd_table.setRowCount(start + len(data))
+        for i, row in enumerate(data, start):
             for j, val in enumerate(row):
                 self.pwd_table.setItem(i,j,QTableWidgetItem(str(val)))
 
+    def fill_table(self):
+        # Rows that fit without a scrollbar never scroll, so keep fetching pages until one appears or none are left.
+        bar = self.pwd_table.verticalScrollBar()
+        self.pwd_table.updateGeometries()  # the scrollbar range is otherwise only updated on the next layout pass
+        while bar.maximum() == 0 and self.page_after is not None:
+            self.load_more_rows(); self.pwd_table.updateGeometries()
+
+    def on_table_scroll(self, value):
+        if value >= self.pwd_table.verticalScrollBar().maximum() - 5: self.load_more_rows(); self.fill_table()
+
+    def on_tags_select(self):
+        self.tag_filter.setText(" ".join(item.data(Qt.UserRole) for item in self.tag_list.selectedItems()))
+        self.on_tag_filter()
+
+    def on_tag_filter(self):
+        try: matches = self.tag_logic.filter(self.current_user, self.tag_filter.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Tags", str(e)); return
+        # Entries from many platforms: passwords stay hidden here (decrypting them all would be slow); select a platform to see them.
+        self.platform_list.clearSelection(); self.platform_list.setCurrentItem(None); self.page_after = None
+        self.pwd_table.setRowCount(len(matches))
+        for i, (pwd_id, plat, user, email) in enumerate(matches):
+            for j, val in enumerate((pwd_id, user, email, "••••••")):
+                item = QTableWidgetItem(str(val)); item.setToolTip(plat)
+                self.pwd_table.setItem(i,j,item)
+
+    def on_tag_pwds(self):
+        ids = self.selected_ids()
+        if not ids: return
+        tag, ok = QInputDialog.getText(self, "Tag", f"Tag or folder (e.g. work/clients) for {len(ids)} entries:")
+        if not ok or not tag.strip(): return
+        try: self.tag_logic.add_tag(self.current_user, ids, tag)
+        except ValueError as e:
+            QMessageBox.warning(self, "Tags", str(e)); return
+        self.refresh_tag_list()
+
+    def on_untag_pwds(self):
+        ids = self.selected_ids()
+        if not ids: return
+        tag, ok = QInputDialog.getItem(self, "Untag", f"Remove from {len(ids)} entries:",
+                                       [tag for tag, _ in self.tag_logic.tags(self.current_user)], 0, False)
+        if not ok or not tag: return
+        self.tag_logic.remove_tag(self.current_user, ids, tag)
+        self.refresh_tag_list()
+
     def on_add_pwd(self):
-        plat, ok = QInputDialog.getText(self, "Platform", "Enter platform name:")
+        plat, ok = self.ask_platform("Platform", "Enter platform name:")
         if not ok or not plat: return
         user, ok = QInputDialog.getText(self, "Username", "Enter platform username:")
         if not ok or not user: return
         email, ok = QInputDialog.getText(self, "Email", "Enter email:")
         if not ok or not email: return
-        pwd, ok = QInputDialog.getText(self, "Password", "Enter password:")
+        pwd, ok = QInputDialog.getText(self, "Password", "Enter password (or 'auto' to generate):")
         if not ok or not pwd: return
+        if pwd.lower() == "auto":
+            pwd = self.show_generated(plat)
         self.pwd_logic.add_password(self.current_user, plat, user, email, pwd)
         self.refresh_password_list()
 
@@ -480,22 +477,174 @@ class SecureManagerGUI(QWidget):
         pwd_id = int(self.pwd_table.item(row,0).text())
         new_user, ok = QInputDialog.getText(self, "Edit User", "New platform user:")
         if not ok: return
-        new_pwd, ok = QInputDialog.getText(self, "Edit Password", "New password:")
+        new_pwd, ok = QInputDialog.getText(self, "Edit Password", "New password (or 'auto' to generate):")
         if not ok: return
+        if new_pwd.lower() == "auto":
+            # Tag-filter rows carry their platform in the tooltip.
+            new_pwd = self.show_generated(self.current_platform() or self.pwd_table.item(row,0).toolTip())
         self.pwd_logic.update_password(pwd_id, new_user, new_pwd)
-        self.on_platform_select()
+        # Only this row changed: update it in place instead of reloading the platform.
+        self.pwd_table.item(row,1).setText(new_user)
+        if not self.in_tag_view(): self.pwd_table.setItem(row,3,QTableWidgetItem(new_pwd))  # masked in the tag view
+        self.refresh_password_list()
+
+    def show_generated(self, platform: str) -> str:
+        policy = password_generator.policy_for(platform)
+        pwd = policy.generate()
+        QMessageBox.information(self, "Generated Password",
+                                f"{pwd}\n\n{policy.describe()}: {policy.entropy_bits():.0f} bits of entropy")
+        return pwd
+
+    # -- Bulk actions on the selected rows --
+    def selected_ids(self):
+        return [int(self.pwd_table.item(i.row(),0).text()) for i in self.pwd_table.selectionModel().selectedRows()]
+
+    def run_bulk(self, operation: str, args: tuple, then, status: str = None, worker_class=BulkWorker):
+        """Runs a PasswordStore bulk operation in the background, then calls then(result) on success."""
+        if self.bulk_worker is not None: return
+        for btn in self.pwd_buttons: btn.setEnabled(False)
+        self.bulk_status.setText(status or f"Working on {len(args[0])} entries...")
+        self.bulk_then = then
+        self.bulk_worker = worker_class(self.db.path, operation, *args)
+        self.bulk_worker.done.connect(self.on_bulk_done)
+        self.bulk_worker.start()
+
+    def on_bulk_done(self, result, error: str):
+        self.bulk_worker.wait(); self.bulk_worker = None
+        for btn in self.pwd_buttons: btn.setEnabled(True)
+        self.bulk_status.setText("")
+        if error:
+            QMessageBox.warning(self, "Error", f"Nothing was changed: {error}")
+            return
+        self.bulk_then(result)
+
+    def remove_rows(self, ids):
+        """Drops rows from the table without re-querying the platform, then refreshes the platform counts."""
+        ids = set(ids)
+        for row in reversed(range(self.pwd_table.rowCount())):
+            if int(self.pwd_table.item(row,0).text()) in ids:
+                self.pwd_table.removeRow(row)
+        self.refresh_password_list()
 
     def on_del_pwd(self):
+        ids = self.selected_ids()
+        if not ids: return
+        if len(ids) > 1 and QMessageBox.question(self, "Delete", f"Delete {len(ids)} entries?") != QMessageBox.Yes:
+            return
+        self.run_bulk("delete_passwords", (ids,), lambda _: self.remove_rows(ids))
+
+    def on_move_pwds(self):
+        ids = self.selected_ids()
+        if not ids: return
+        target, ok = self.ask_platform("Move", f"Move {len(ids)} entries to platform:")
+        if not ok or not target or target == self.current_platform(): return
+        def moved(_):
+            # Moved entries keep their tags: the tag view lists them again, under their new platform.
+            if self.in_tag_view():
+                self.refresh_password_list(); self.on_tag_filter()
+            else:
+                self.remove_rows(ids)
+        self.run_bulk("move_passwords", (ids, target), moved)
+
+    def on_regenerate_pwds(self):
+        ids = self.selected_ids()
+        if not ids: return
+        if QMessageBox.question(self, "Regenerate", f"Replace the passwords of {len(ids)} entries with generated ones?") != QMessageBox.Yes:
+            return
+        def regenerated(new_pwds):
+            if self.in_tag_view(): return  # passwords stay masked there
+            for row in range(self.pwd_table.rowCount()):
+                pwd = new_pwds.get(int(self.pwd_table.item(row,0).text()))
+                if pwd is not None: self.pwd_table.setItem(row,3,QTableWidgetItem(pwd))
+        self.run_bulk("regenerate_passwords", (ids, password_generator.generate), regenerated)
+
+    def on_import_export(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Passwords", "", "Exports (*.csv *.json *.xml);;All Files (*)")
+        if not path: return
+        try: importer = importers.detect_format(path)
+        except (StagingError, OSError) as e:
+            QMessageBox.warning(self, "Import", str(e)); return
+        def imported(result):
+            QMessageBox.information(self, "Import", f"Imported {result[0]} passwords ({result[1]} already saved were skipped).")
+            self.refresh_password_list()
+        # The whole file goes in one transaction on the worker's connection; the window stays responsive meanwhile.
+        self.run_bulk("import_file", (self.current_user, path, importer.name), imported,
+                      status=f"Importing {importer.label} export...", worker_class=ImportWorker)
+
+    def on_check_health(self):
+        results = health.check_health(self.db, self.current_user)
+        def breach_note(hits):
+            if hits is None: return ""
+            return f" | breached {hits:,} times" if hits else " | not breached"
+        msg = "\n".join([f"{plat}: {result.rating}{breach_note(hits)}" for plat, result, hits in results])
+        due = self.pwd_logic.rotation_due(self.current_user, health.ROTATION_DAYS)
+        if due:
+            msg += f"\n\nNot changed in over {health.ROTATION_DAYS} days:\n" + "\n".join(
+                f"{plat} ({user}): {int((time.time() - rotated_at) // 86400)} days" for _, plat, user, rotated_at in due)
+        QMessageBox.information(self, "Health Check", msg)
+
+    def on_find_accounts(self):
+        value, ok = QInputDialog.getText(self, "Find Accounts", "Email address or platform username:")
+        if not ok or not value.strip(): return
+        matches = self.pwd_logic.lookup_identity(self.current_user, value.strip())
+        msg = "\n".join(f"{plat}: {user} <{email}>" for _, plat, user, email in matches)
+        QMessageBox.information(self, "Find Accounts", msg or f"No saved accounts use {value.strip()}.")
+
+    def on_password_history(self):
         row = self.pwd_table.currentRow()
         if row < 0: return
         pwd_id = int(self.pwd_table.item(row,0).text())
-        self.pwd_logic.delete_password(pwd_id)
-        self.on_platform_select()
+        versions = self.pwd_logic.history(pwd_id)
+        if not versions:
+            QMessageBox.information(self, "Password History", "This password has never been changed."); return
+        items = [f"{version}. {pwd} (replaced {time.strftime('%Y-%m-%d %H:%M', time.localtime(replaced_at))})"
+                 for version, pwd, replaced_at in versions]
+        item, ok = QInputDialog.getItem(self, "Password History", "Restore an earlier password:", items, 0, False)
+        if not ok: return
+        self.pwd_logic.restore_version(pwd_id, int(item.split(".")[0]))
+        self.pwd_table.setItem(row,3,QTableWidgetItem(versions[items.index(item)][1]))
+        self.refresh_password_list()
 
-    def on_check_health(self):
-        results = self.pwd_logic.check_health(self.current_user)
-        msg = "\n".join([f"{r[0]}: {r[1]}" for r in results])
-        QMessageBox.information(self, "Health Check", msg)
+    def on_set_totp(self):
+        row = self.pwd_table.currentRow()
+        if row < 0: return
+        text, ok = QInputDialog.getText(self, "2FA Secret", "Setup key or otpauth:// link (empty to remove):")
+        if not ok: return
+        pwd_id = int(self.pwd_table.item(row,0).text())
+        if not text.strip():
+            self.pwd_logic.remove_totp(pwd_id); return
+        try: secret, digits, period, algorithm = totp.parse_secret(text)
+        except ValueError as e:
+            QMessageBox.warning(self, "2FA Secret", str(e)); return
+        self.pwd_logic.set_totp(pwd_id, secret, digits, period, algorithm)
+        QMessageBox.information(self, "2FA Secret", f"Saved. Current code: {totp.totp(secret, None, digits, period, algorithm)}")
+
+    # -- 2FA Codes Screen --
+    def screen_totp(self):
+        w = QWidget(); v = QVBoxLayout()
+        lbl = QLabel("2FA Codes"); lbl.setFont(QFont('Consolas',24)); v.addWidget(lbl)
+        self.totp_table = QTableWidget(0,4)
+        self.totp_table.setHorizontalHeaderLabels(["Platform","User","Code","Seconds"])
+        v.addWidget(self.totp_table)
+        btn = QPushButton("Back"); btn.clicked.connect(lambda:self.show_screen("passwords"))
+        btn.setFont(QFont('Consolas',12)); v.addWidget(btn)
+        # Ticks once a second while the screen is shown; each seed is decrypted once per session by the code board.
+        self.totp_timer = QTimer(w); self.totp_timer.timeout.connect(self.refresh_totp)
+        w.setLayout(v); return w
+
+    def show_totp(self):
+        self.show_screen("totp")
+        self.refresh_totp()
+        self.totp_timer.start(1000)
+
+    def refresh_totp(self):
+        if self.stack.currentWidget() is not self.screens["totp"] or not self.current_user:
+            self.totp_timer.stop(); return
+        codes = self.code_board.codes(self.current_user)
+        self.totp_table.setRowCount(len(codes))
+        for i, (_, plat, user, code, left) in enumerate(codes):
+            for j, val in enumerate((plat, user, code, str(left))):
+                self.totp_table.setItem(i,j,QTableWidgetItem(val))
 
     # -- Backup/Restore Screen --
     def screen_backup(self):
@@ -503,32 +652,129 @@ class SecureManagerGUI(QWidget):
         for text, func in [
             ("Backup Online", self.do_backup),
             ("Restore Online", self.do_restore),
-            ("Back", lambda:self.stack.setCurrentWidget(self.dashboard))
+            ("Merge Online Backup", self.do_merge_online),
+            ("Two-way Sync", self.do_two_way_sync),
+            ("Compact Storage", self.do_compact_storage),
+            ("Back", lambda:self.show_screen("dashboard"))
         ]:
             btn = QPushButton(text); btn.clicked.connect(func)
             btn.setFont(QFont('Consolas',14)); v.addWidget(btn)
         w.setLayout(v); return w
 
     def do_backup(self):
-        ok = backup_online(self.db)
-        QMessageBox.information(self, "Backup", "Backup successful." if ok else "Backup failed.")
+        self.wait_for_network()
+        error = run_sync(sync.backup_online, self.db)
+        QMessageBox.information(self, "Backup", f"Backup failed: {error}" if error else "Backup successful.")
 
     def do_restore(self):
-        ok = restore_online(self.db)
-        QMessageBox.information(self, "Restore", "Restore successful." if ok else "Restore failed.")
+        self.wait_for_network()
+        error = run_sync(sync.restore_online, self.db)
+        QMessageBox.information(self, "Restore", f"Restore failed: {error}" if error else "Restore successful.")
+        if not error: self.refresh_password_list()
+
+    def ask_merge_policy(self):
+        policy, ok = QInputDialog.getItem(self, "Merge", "When an entry differs, keep the:", list(merge.POLICIES), 0, False)
+        return policy if ok else None
+
+    def show_merge_counts(self, counts):
+        QMessageBox.information(self, "Merge",
+            f"{counts['users']} new users, {counts['inserted']} new and {counts['updated']} updated passwords.\n"
+            f"{counts['unchanged']} already up to date, {counts['kept']} conflicting local passwords kept.")
+        self.refresh_password_list()
+
+    def do_merge_online(self):
+        policy = self.ask_merge_policy()
+        if policy is None: return
+        self.wait_for_network()
+        try: counts = sync.merge_online(self.db, policy)
+        except Exception as e:
+            QMessageBox.warning(self, "Merge", f"Merge failed: {e}"); return
+        self.show_merge_counts(counts)
+
+    def do_two_way_sync(self):
+        self.wait_for_network()
+        try: report = replication.sync_vault(self.db, replication.FirestoreTransport())
+        except Exception as e:
+            QMessageBox.warning(self, "Sync", f"Sync failed: {e}"); return
+        QMessageBox.information(self, "Sync",
+            f"Sent {report['pushed']} changes, received {report['pulled']} ({report['applied']} applied).\n"
+            f"{report['round_trips']} requests, {report['bytes_sent']} bytes sent, {report['bytes_received']} bytes received.")
+        self.refresh_password_list()
+
+    def do_compact_storage(self):
+        if QMessageBox.question(self, "Storage", "Rewrite all encrypted values in the compact binary format?") != QMessageBox.Yes:
+            return
+        count = self.db.migrate_storage_format("binary")
+        QMessageBox.information(self, "Storage", f"Rewrote {count} values in the binary format.")
 
     # -- CSV Screen --
     def screen_csv(self):
         w = QWidget(); v = QVBoxLayout()
         for text, func in [
-            ("Export CSV", lambda: (export_csv(self.db), QMessageBox.information(self,"CSV","Export done"))),
-            ("Import CSV", lambda: (import_csv(self.db), QMessageBox.information(self,"CSV","Import done"))),
-            ("Back", lambda:self.stack.setCurrentWidget(self.dashboard))
+            ("Export CSV", lambda: (csv_io.export_csv(self.db), QMessageBox.information(self,"CSV","Export done"))),
+            ("Import CSV", self.do_import_csv),
+            ("Merge CSV", self.do_merge_csv),
+            ("Back", lambda:self.show_screen("dashboard"))
         ]:
             btn = QPushButton(text); btn.clicked.connect(func)
             btn.setFont(QFont('Consolas',14)); v.addWidget(btn)
         w.setLayout(v); return w
 
+    def do_import_csv(self):
+        try: users, passwords = csv_io.import_csv(self.db)
+        except (StagingError, OSError) as e:
+            QMessageBox.warning(self, "CSV", f"Import failed, your data was not changed: {e}"); return
+        QMessageBox.information(self, "CSV", f"Imported {users} users and {passwords} passwords.")
+        self.refresh_password_list()
+
+    def do_merge_csv(self):
+        policy = self.ask_merge_policy()
+        if policy is None: return
+        try: counts = csv_io.merge_csv(self.db, policy=policy)
+        except (StagingError, OSError) as e:
+            QMessageBox.warning(self, "CSV", f"Merge failed, your data was not changed: {e}"); return
+        self.show_merge_counts(counts)
+
+    # -- Diagnostics Screen --
+    def screen_diagnostics(self):
+        w = QWidget(); v = QVBoxLayout()
+        lbl = QLabel("Diagnostics"); lbl.setFont(QFont('Consolas',24)); v.addWidget(lbl)
+        self.diag_table = QTableWidget(0,6)
+        self.diag_table.setHorizontalHeaderLabels(["Operation","Count","Mean ms","p95 ms","Max ms","Total ms"])
+        v.addWidget(self.diag_table)
+        for text, func in [
+            ("Refresh", self.refresh_diagnostics),
+            ("Export JSON", lambda: self.export_diagnostics("JSON (*.json)")),
+            ("Export Prometheus", lambda: self.export_diagnostics("Prometheus text (*.prom)")),
+            ("Reset", lambda: (stats.reset(), self.refresh_diagnostics())),
+            ("Back", lambda:self.show_screen("dashboard"))
+        ]:
+            btn = QPushButton(text); btn.clicked.connect(func)
+            btn.setFont(QFont('Consolas',12)); v.addWidget(btn)
+        w.setLayout(v); return w
+
+    def show_diagnostics(self):
+        # Statistics are collected from the first visit on; until then nothing is timed.
+        stats.enabled = True
+        self.show_screen("diagnostics")
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        rows = [[name, str(count), f"{mean:.3f}", f"{p95:.3f}", f"{peak:.3f}", f"{total:.1f}"]
+                for name, count, mean, p95, peak, total in stats.rows()]
+        # Counters (rows written, bytes encrypted, ...) have a count only.
+        rows += [[name, str(value)] for name, value in stats.snapshot()["counters"].items()]
+        self.diag_table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, val in enumerate(row):
+                self.diag_table.setItem(i,j,QTableWidgetItem(val))
+
+    def export_diagnostics(self, file_filter: str):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Statistics", "", file_filter)
+        if not path: return
+        stats.dump(path)
+        QMessageBox.information(self, "Diagnostics", f"Statistics written to {path}")
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     gui = SecureManagerGUI()
@@ -0,0 +1,189 @@
+"""
+Benchmark fixtures: synthetic vaults for both frontends and a fake Firestore.
+
+The benchmarks need pytest-benchmark (``pip install pytest-benchmark``) and are
+skipped without it; the behaviour tests (test_replication.py, test_totp.py, ...)
+need only pytest. Vaults of 1k entries are built by default; larger vaults are
+opt-in because building and scanning them takes minutes:
+
+    pytest benchmarks                                   # 1k entries
+    pytest benchmarks --vault-sizes 1000,100000,1000000
+
+Save a baseline and compare later runs against it; the run fails when any
+benchmark's mean is more than 10% slower than the saved baseline:
+
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Baselines are stored as JSON under ``.benchmarks/``.
+"""
+import importlib.util
+import itertools
+import os
+import sys
+
+import pytest
+
+# GUI tests (and the subprocesses they start) need no display; set before anything imports PyQt5.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from vault_core import crypto, sync
+from vault_core.storage import DatabaseManager, UserStore
+CLI_SCRIPT = os.path.join(ROOT, "Command Line Interface", "passwords.py")
+GUI_SCRIPT = os.path.join(ROOT, "Graphical User Interface", "passwords.py")
+
+OWNER = "alice"
+OWNER_PASSWORD = "Correct-Horse-42"
+# Ciphertexts are drawn from a pool of distinct values: decrypting entry i costs the
+# same as with unique ciphertexts, while building a 1M-entry vault stays fast.
+CIPHERTEXT_POOL = 1024
+ENTRIES_PER_PLATFORM = 5
+
+def pytest_addoption(parser):
+    parser.addoption("--vault-sizes", default="1000",
+                     help="Comma-separated vault sizes to benchmark (e.g. 1000,100000,1000000).")
+
+def pytest_generate_tests(metafunc):
+    if "vault_size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--vault-sizes").split(",") if s.strip()]
+        ids = [f"{s // 1000}k" if s >= 1000 and s % 1000 == 0 else str(s) for s in sizes]
+        metafunc.parametrize("vault_size", sizes, ids=ids, scope="session")
+
+def load_script(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope="session")
+def workdir(tmp_path_factory):
+    """Both frontends read secret.key and write CSV exports relative to the working directory."""
+    path = tmp_path_factory.mktemp("bench")
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
+
+@pytest.fixture(scope="session")
+def cli(workdir):
+    pytest.importorskip("pwinput")
+    pytest.importorskip("firebase_admin")
+    return load_script(CLI_SCRIPT, "bench_cli_passwords")
+
+@pytest.fixture(scope="session")
+def gui(workdir):
+    pytest.importorskip("PyQt5")
+    pytest.importorskip("firebase_admin")
+    return load_script(GUI_SCRIPT, "bench_gui_passwords")
+
+def platform_name(i):
+    return f"platform{i // ENTRIES_PER_PLATFORM:07d}"
+
+def ciphertext_pool(encrypt):
+    return [encrypt(f"Pa55word!{i:06d}#x") for i in range(CIPHERTEXT_POOL)]
+
+@pytest.fixture(scope="session")
+def cli_vault(cli, workdir, vault_size):
+    """A CLI DatabaseManager whose owner has ``vault_size`` entries."""
+    db = cli.DatabaseManager(str(workdir / f"cli_{vault_size}.db"))
+    if not db.conn.execute("SELECT 1 FROM users WHERE username = ?", (OWNER,)).fetchone():
+        pool = ciphertext_pool(crypto.encrypt_data)
+        cli.UserStore(db).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+        db.conn.executemany(
+            "INSERT INTO passwords (username, platform, platform_username, email, password) VALUES (?, ?, ?, ?, ?)",
+            ((OWNER, platform_name(i), f"user{i}", f"user{i}@example.com", pool[i % CIPHERTEXT_POOL])
+             for i in range(vault_size)))
+        db.conn.commit()
+    yield db
+    db.close()
+
+@pytest.fixture(scope="session")
+def gui_vault(gui, workdir, vault_size):
+    """A GUI DatabaseManager whose owner has ``vault_size`` entries."""
+    db = gui.DatabaseManager(str(workdir / f"gui_{vault_size}.db"))
+    if not db.conn.execute("SELECT 1 FROM users WHERE username = ?", (OWNER,)).fetchone():
+        pool = ciphertext_pool(crypto.encrypt_data)
+        gui.UserStore(db).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+        db.conn.executemany(
+            "INSERT INTO passwords (username, platform, platform_username, email, password) VALUES (?, ?, ?, ?, ?)",
+            ((OWNER, platform_name(i), f"user{i}", f"user{i}@example.com", pool[i % CIPHERTEXT_POOL])
+             for i in range(vault_size)))
+        db.conn.commit()
+    yield db
+    db.close()
+
+@pytest.fixture
+def vault(workdir, tmp_path):
+    """A fresh single-file vault holding only the owner's account, for the behaviour tests."""
+    db = DatabaseManager(str(tmp_path / "vault.db"))
+    UserStore(db).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    yield db
+    db.close()
+
+# -----------------------------
+# Fake Firestore
+# -----------------------------
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+class FakeDocument:
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+        self.id = key[1]
+
+    def set(self, data):
+        self.store[self.key] = data
+
+    def get(self):
+        return FakeSnapshot(self.store.get(self.key))
+
+    def delete(self):
+        self.store.pop(self.key, None)
+
+class FakeCollection:
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeDocument(self.store, (self.name, doc_id))
+
+    def list_documents(self):
+        return [FakeDocument(self.store, key) for key in self.store if key[0] == self.name]
+
+class FakeFirestore:
+    """In-memory stand-in for the slice of the Firestore client the backup code uses."""
+
+    def __init__(self):
+        self.store = {}
+
+    def collection(self, name):
+        return FakeCollection(self.store, name)
+
+@pytest.fixture
+def fake_firestore(monkeypatch):
+    """Installs a FakeFirestore as the sync client and pretends the network is up."""
+    client = FakeFirestore()
+    monkeypatch.setattr(sync, "db_online", client)
+    monkeypatch.setattr(sync, "internet_available", lambda *args, **kwargs: True)
+    return client
+
+@pytest.fixture
+def scripted_input(monkeypatch):
+    """
+    Answers the CLI's input()/pwinput prompts from ``answers``, repeating them for
+    every benchmark round, and skips the screen clears so the output stays readable.
+    """
+    def install(module, answers):
+        it = itertools.cycle(answers)
+        monkeypatch.setattr("builtins.input", lambda prompt="": next(it))
+        monkeypatch.setattr(module.UserManager, "get_password", staticmethod(lambda prompt="": next(it)))
+        monkeypatch.setattr(module, "clear_screen", lambda: None)
+    return install
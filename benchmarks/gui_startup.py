@@ -0,0 +1,79 @@
+"""
+Measures how long the GUI takes to show its login window.
+
+Each run starts a fresh interpreter in a temporary directory (the GUI creates
+its database and key there) and reports, from the moment the process was
+launched, when the GUI module finished importing, when SecureManagerGUI() was
+built and when the window received its first paint event. It also reports
+which screens exist and whether firebase_admin was already loaded at first paint.
+
+    python benchmarks/gui_startup.py --runs 10
+
+Without a display, Qt's offscreen platform is used.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_SCRIPT = os.path.join(ROOT, "Graphical User Interface", "passwords.py")
+
+PROBE = """
+import importlib.util, json, sys, time
+from PyQt5.QtCore import QEvent, QObject
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+spec = importlib.util.spec_from_file_location("gui_passwords", {script!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+marks = {{"imported": time.time()}}
+window = module.SecureManagerGUI()
+marks["constructed"] = time.time()
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and "painted" not in marks:
+            marks["painted"] = time.time()
+            marks["firebase_loaded"] = "firebase_admin" in sys.modules
+            marks["screens"] = window.stack.count()
+            app.quit()
+        return False
+
+first_paint = FirstPaint()
+window.installEventFilter(first_paint)
+window.show()
+app.exec_()
+print(json.dumps(marks))
+"""
+
+def run_once():
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    if not (env.get("DISPLAY") or env.get("WAYLAND_DISPLAY")):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with tempfile.TemporaryDirectory() as workdir:
+        launched = time.time()
+        out = subprocess.run([sys.executable, "-c", PROBE.format(script=GUI_SCRIPT)], cwd=workdir, env=env,
+                             check=True, capture_output=True, text=True)
+    marks = json.loads(out.stdout.strip().splitlines()[-1])
+    for key in ("imported", "constructed", "painted"):
+        marks[key] = (marks[key] - launched) * 1000
+    return marks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    runs = [run_once() for _ in range(args.runs)]
+    for key, label in (("imported", "module imported"), ("constructed", "window built"), ("painted", "first paint")):
+        values = [run[key] for run in runs]
+        print(f"{label:<16} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    print(f"screens built at first paint: {runs[-1]['screens']}")
+    print(f"firebase_admin loaded at first paint: {runs[-1]['firebase_loaded']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares the on-disk cost of the "fernet" and "binary" storage formats.
+
+For each format a synthetic vault is written to a temporary directory and the
+script reports the database file size, the number of pages in the passwords
+table (every one of them is read by a full-vault operation such as the health
+check, export or backup) and the time to scan and decrypt the whole vault.
+
+    python benchmarks/storage_format.py --entries 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vault_core import crypto
+from vault_core.storage import DatabaseManager
+
+
+def table_pages(conn, table):
+    return conn.execute("SELECT COUNT(*) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+
+
+def run(storage_format, entries):
+    path = f"bench_{storage_format}.db"
+    db = DatabaseManager(path)
+    encrypt = lambda value: crypto.encrypt_data(value, storage_format=storage_format)
+    db.conn.execute("INSERT INTO users VALUES (?, ?, ?, ?)", ("bench", "x", encrypt("question"), encrypt("answer")))
+    db.conn.executemany(
+        "INSERT INTO passwords (username, platform, platform_username, email, password) VALUES (?, ?, ?, ?, ?)",
+        (("bench", f"platform{i}", f"user{i}", f"user{i}@example.com", encrypt(f"Pa55word!{i:08d}"))
+         for i in range(entries)))
+    db.set_meta("storage_format", storage_format)
+    db.conn.commit()
+    db.conn.execute("VACUUM")
+
+    start = time.perf_counter()
+    for (pwd,) in db.conn.execute("SELECT password FROM passwords"):
+        crypto.decrypt_data(pwd)
+    scan = time.perf_counter() - start
+
+    result = {
+        "format": storage_format,
+        "file_bytes": os.path.getsize(path),
+        "page_size": db.conn.execute("PRAGMA page_size").fetchone()[0],
+        "passwords_pages": table_pages(db.conn, "passwords"),
+        "full_scan_seconds": scan,
+    }
+    db.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # the key is loaded on first use, and a new secret.key written into the working directory
+        results = [run(fmt, args.entries) for fmt in crypto.STORAGE_FORMATS]
+
+    print(f"{'format':<8} {'file bytes':>12} {'table pages':>12} {'full scan (s)':>14}")
+    for r in results:
+        print(f"{r['format']:<8} {r['file_bytes']:>12} {r['passwords_pages']:>12} {r['full_scan_seconds']:>14.3f}")
+    base = results[0]
+    for r in results[1:]:
+        print(f"{r['format']}: {base['file_bytes'] / r['file_bytes']:.2f}x smaller file, "
+              f"{base['passwords_pages'] / r['passwords_pages']:.2f}x fewer pages read per full-vault pass")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Offline breach index: building from both HIBP dump formats, lookups, range queries and the health report."""
+import hashlib
+import os
+
+import pytest
+
+from conftest import OWNER
+from vault_core import breach
+from vault_core.health import check_health
+from vault_core.storage import PasswordStore
+
+BREACHED = {"password": 9_545_824, "123456": 37_359_195, "letmein": 1_000}
+# Synthetic hashes in the first and last of the 2**20 buckets.
+FIRST = "00000" + "A" * 35
+LAST = "FFFFF" + "B" * 35
+
+def sha1(password):
+    return hashlib.sha1(password.encode()).hexdigest().upper()
+
+def dump_lines():
+    lines = [f"{sha1(password)}:{count}" for password, count in BREACHED.items()]
+    # "letmein" is listed twice; the index holds the sum.
+    return lines + [f"{FIRST}:3", f"{LAST}:4", f"{sha1('letmein')}:234"]
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / "pwned.txt"
+    path.write_text("\n".join(dump_lines()) + "\n", encoding="ascii")
+    return path
+
+@pytest.fixture
+def index_path(tmp_path, dump):
+    path = tmp_path / "breach_index.bin"
+    assert breach.build_index(str(dump), str(path)) == 5
+    return path
+
+def test_lookup_hit_and_miss(index_path):
+    with breach.BreachIndex(str(index_path)) as index:
+        assert index.count == 5
+        assert index.lookup("password") == 9_545_824
+        assert index.lookup("123456") == 37_359_195
+        assert index.lookup("Correct-Horse-42") == 0
+        # Same bucket as "password", different tail.
+        digest = bytearray(hashlib.sha1(b"password").digest())
+        digest[-1] ^= 0xFF
+        digest[5] ^= 0xFF
+        assert index.lookup_digest(bytes(digest)) == 0
+
+def test_duplicate_hashes_are_summed(index_path):
+    with breach.BreachIndex(str(index_path)) as index:
+        assert index.lookup("letmein") == 1_234
+
+def test_layout_is_an_offset_table_and_12_byte_records(index_path):
+    assert breach.RECORD.size == 12
+    table = breach.OFFSET.size * (breach.BUCKETS + 1)
+    assert os.path.getsize(index_path) == breach.HEADER.size + table + 5 * breach.RECORD.size
+
+def test_range_returns_the_bucket(index_path):
+    with breach.BreachIndex(str(index_path)) as index:
+        digest = sha1("password")
+        assert index.range(digest[:5]) == [(digest[5:21], 9_545_824)]
+        assert index.range("00000") == [("A" * 16, 3)]
+        assert index.range("FFFFF") == [("B" * 16, 4)]
+        assert index.range("12345") == []
+        assert index.lookup_digest(bytes.fromhex("12345" + "0" * 35)) == 0
+
+def test_external_merge_sort_matches_a_single_run(tmp_path, dump, index_path):
+    merged = tmp_path / "merged.bin"
+    # Two records per run: five runs, and the duplicate "letmein" lines end up in different runs.
+    assert breach.build_index(str(dump), str(merged), run_records=2) == 5
+    assert merged.read_bytes() == index_path.read_bytes()
+    assert not list(tmp_path.glob("*.run"))
+
+def test_range_directory_builds_the_same_index(tmp_path, index_path):
+    ranges = tmp_path / "ranges"
+    ranges.mkdir()
+    buckets = {}
+    for line in dump_lines():
+        digest, count = line.split(":")
+        buckets.setdefault(digest[:5], []).append(f"{digest[5:]}:{count}")
+    for prefix, lines in buckets.items():
+        (ranges / f"{prefix.lower()}.txt").write_text("\r\n".join(lines), encoding="ascii")
+    (ranges / "README.md").write_text("not a range file", encoding="ascii")
+    from_ranges = tmp_path / "from_ranges.bin"
+    assert breach.build_index(str(ranges), str(from_ranges)) == 5
+    assert from_ranges.read_bytes() == index_path.read_bytes()
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * breach.HEADER.size)
+    with pytest.raises(ValueError):
+        breach.BreachIndex(str(path))
+
+def test_check_health_hits_column(vault, tmp_path, index_path):
+    store = PasswordStore(vault)
+    store.add_password(OWNER, "github", "alice", "", "password")
+    store.add_password(OWNER, "bank", "alice", "", "Correct-Horse-42")
+    hits = {platform: count for platform, _, count in check_health(vault, OWNER, str(index_path))}
+    assert hits == {"github": 9_545_824, "bank": 0}
+    # Without a built index the column is left out.
+    missing = str(tmp_path / "missing.bin")
+    assert {count for _, _, count in check_health(vault, OWNER, missing)} == {None}
@@ -0,0 +1,157 @@
+"""Hot paths of the command line frontend, driven through its interactive methods."""
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD, platform_name
+from vault_core import crypto
+
+pytest.importorskip("pytest_benchmark")
+
+def test_cli_login_hashing(benchmark, cli, cli_vault):
+    users = cli.UserManager(cli_vault)
+    assert benchmark(users.encrypt_password, OWNER_PASSWORD)
+
+def test_cli_login(benchmark, cli, cli_vault, scripted_input):
+    scripted_input(cli, [OWNER, OWNER_PASSWORD])
+    users = cli.UserManager(cli_vault)
+    assert benchmark(users.login) == OWNER
+
+def test_cli_list_users_paged(benchmark, cli, workdir, vault_size, scripted_input):
+    # Page forward through the middle of a large account list and back: each page is one index seek.
+    db = cli.DatabaseManager(str(workdir / f"cli_users_{vault_size}.db"))
+    db.conn.executemany("INSERT OR IGNORE INTO users (username, password, security_question, security_answer) "
+                        "VALUES (?, '', '', '')", ((f"user{i:07d}",) for i in range(vault_size)))
+    db.conn.commit()
+    users = cli.UserManager(db)
+    scripted_input(cli, ["n", "n", "p", ""])
+    benchmark(users.list_users)
+    assert users.store.users_page("user0000099", 2) == ["user0000100", "user0000101"]
+    db.close()
+
+def test_cli_add_password(benchmark, cli, cli_vault, scripted_input):
+    scripted_input(cli, ["benchplatform", "bench", "bench@example.com", "Zq7#rT9!mW2$", "yes"])
+    manager = cli.PasswordManager(cli_vault)
+    benchmark(manager.add_password, OWNER)
+
+def test_cli_access_passwords(benchmark, cli, cli_vault, vault_size, scripted_input):
+    # Look up the platform added last, the worst case for a scan in insertion order.
+    scripted_input(cli, [platform_name(vault_size - 1), ""])
+    manager = cli.PasswordManager(cli_vault)
+    benchmark(manager.access_passwords, OWNER)
+
+def test_cli_complete_platform(benchmark, cli, cli_vault, vault_size):
+    # Tab completion of the last platform's name: two binary searches over the cached sorted names.
+    manager = cli.PasswordManager(cli_vault)
+    last = platform_name(vault_size - 1)
+    matches = benchmark(manager.platforms.complete, OWNER, last[:-1])
+    assert last in matches and all(name.startswith(last[:-1]) for name in matches)
+    # A platform added on another connection shows up in the next completion.
+    other = cli.DatabaseManager(cli_vault.path)
+    entry_id = cli.PasswordStore(other).add_password(OWNER, last + "-new", "u", "e", "pw")
+    assert manager.platforms.complete(OWNER, last) == [last, last + "-new"]
+    cli.PasswordStore(other).delete_password(entry_id)
+    other.close()
+    assert manager.platforms.complete(OWNER, last) == [last]
+
+def test_cli_find_accounts(benchmark, cli, cli_vault, vault_size, scripted_input):
+    # Reverse lookup of the last entry's email, spelled with a '+tag' and other case.
+    scripted_input(cli, [f" User{vault_size - 1}+Promo@Example.COM", ""])
+    manager = cli.PasswordManager(cli_vault)
+    benchmark(manager.find_accounts, OWNER)
+    assert manager.store.lookup_identity(OWNER, f"user{vault_size - 1}+x@example.com")
+
+def test_cli_password_history(benchmark, cli, cli_vault, vault_size, scripted_input):
+    # Give the last platform's entry a few earlier passwords, then list them without restoring.
+    manager = cli.PasswordManager(cli_vault)
+    platform = platform_name(vault_size - 1)
+    entry_id = manager.store.find_entry(OWNER, platform)
+    for i in range(3):
+        cli_vault.conn.execute("UPDATE passwords SET password = ? WHERE id = ?",
+                               (crypto.encrypt_data(f"History!{i}#pw", timestamp=1_600_000_000 + i), entry_id))
+    cli_vault.conn.commit()
+    scripted_input(cli, [platform, "back", ""])
+    benchmark(manager.password_history, OWNER)
+    assert len(manager.store.history(entry_id)) >= 3
+    assert cli.prune_history(cli_vault, keep=1) >= 2
+
+def test_cli_filter_tags(benchmark, cli, cli_vault, scripted_input):
+    # Three overlapping tags (every 2nd, 3rd and 5th entry); the filter wants all three.
+    manager = cli.PasswordManager(cli_vault)
+    ids = [row[0] for row in cli_vault.conn.execute("SELECT id FROM passwords WHERE username = ?", (OWNER,))]
+    for step in (2, 3, 5):
+        manager.tags.add_tag(OWNER, ids[::step], f"bench/every{step}")
+    scripted_input(cli, ["1", "bench/every2 bench/every3 bench/every5"])
+    benchmark(manager.manage_tags, OWNER)
+    assert len(manager.tags.filter(OWNER, "bench/every2 bench/every3 bench/every5")) == len(set(ids[::2]) & set(ids[::3]) & set(ids[::5]))
+
+def test_cli_totp_codes(benchmark, cli, cli_vault):
+    # One refresh tick of the live 2FA view over 500 seeds, after the first tick decrypted them.
+    manager = cli.PasswordManager(cli_vault)
+    ids = [row[0] for row in cli_vault.conn.execute("SELECT id FROM passwords WHERE username = ? LIMIT 500", (OWNER,))]
+    with cli_vault.transaction():
+        for i in ids:
+            manager.store.set_totp(i, "JBSWY3DPEHPK3PXP")
+    manager.codes.codes(OWNER)
+    codes = benchmark(manager.codes.codes, OWNER)
+    assert len(codes) == len(ids) and codes[0][3] == cli.totp.totp("JBSWY3DPEHPK3PXP")
+
+def test_cli_check_password_health(benchmark, cli, cli_vault, scripted_input):
+    scripted_input(cli, [""])
+    manager = cli.PasswordManager(cli_vault)
+    benchmark.pedantic(manager.check_password_health, args=(OWNER,), rounds=3, iterations=1)
+
+def test_cli_export_csv(benchmark, cli, cli_vault):
+    app = cli.Application.__new__(cli.Application)
+    app.db_manager = cli_vault
+    benchmark.pedantic(app.export_csv, rounds=3, iterations=1)
+
+def test_cli_import_csv(benchmark, cli, cli_vault, scripted_input):
+    app = cli.Application.__new__(cli.Application)
+    app.db_manager = cli_vault
+    app.export_csv()
+    scripted_input(cli, ["yes", "export_passwords.csv", "export_users.csv"])
+    before = cli_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0]
+    benchmark.pedantic(app.import_csv, rounds=3, iterations=1)
+    assert cli_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0] == before
+
+def test_cli_import_keepass_export(benchmark, cli, workdir, vault_size, scripted_input):
+    # A KeePass XML export of vault_size entries in a folder, imported into a fresh vault every round.
+    path = workdir / f"keepass_{vault_size}.xml"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<KeePassFile><Root><Group><Name>Database</Name><Group><Name>Work</Name>")
+        for i in range(vault_size):
+            f.write(f"<Entry><String><Key>Title</Key><Value>{platform_name(i)}</Value></String>"
+                    f"<String><Key>UserName</Key><Value>user{i}@example.com</Value></String>"
+                    f"<String><Key>Password</Key><Value>Pa55word!{i:06d}#x</Value></String></Entry>")
+        f.write("</Group></Group></Root></KeePassFile>")
+    scripted_input(cli, [str(path)])
+    vaults = []
+    def fresh_vault():
+        db = cli.DatabaseManager(str(workdir / f"import_{vault_size}_{len(vaults)}.db"))
+        cli.UserStore(db).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+        vaults.append(db)
+        return (cli.PasswordManager(db),), {}
+    benchmark.pedantic(lambda manager: manager.import_passwords(OWNER), setup=fresh_vault, rounds=3, iterations=1)
+    for db in vaults:
+        assert db.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0] == vault_size
+        assert cli.TagStore(db).tags(OWNER) == [("work", vault_size)]
+        db.close()
+
+def test_cli_merge_csv(benchmark, cli, cli_vault, scripted_input):
+    # Merging an unchanged export compares every entry but writes nothing.
+    app = cli.Application.__new__(cli.Application)
+    app.db_manager = cli_vault
+    app.export_csv()
+    scripted_input(cli, ["export_passwords.csv", "export_users.csv", "newest"])
+    before = cli_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0]
+    benchmark.pedantic(app.merge_csv, rounds=3, iterations=1)
+    assert cli_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0] == before
+
+def test_cli_online_backup(benchmark, cli, cli_vault, fake_firestore):
+    benchmark.pedantic(cli.backup_online_data, args=(cli_vault,), rounds=3, iterations=1)
+    assert fake_firestore.store
+
+def test_cli_online_restore(benchmark, cli, cli_vault, fake_firestore):
+    cli.backup_online_data(cli_vault)
+    before = cli_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0]
+    benchmark.pedantic(cli.restore_online_data, args=(cli_vault,), rounds=3, iterations=1)
+    assert cli_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0] == before
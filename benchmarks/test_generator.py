@@ -0,0 +1,144 @@
+"""Password generation policies and the strength estimate at their edges."""
+import importlib.util
+import itertools
+import math
+import random
+import secrets
+import string
+
+import pytest
+
+from conftest import OWNER
+from vault_core.generator import (AMBIGUOUS_CHARACTERS, CHARACTER_CLASSES, PassphrasePolicy, PasswordGenerator,
+                                  PasswordPolicy, load_wordlist, policy_from_dict)
+from vault_core.health import check_health
+from vault_core.storage import PasswordStore
+from vault_core.strength import DICTIONARY_FILES, RATINGS, estimate, rating
+
+# -----------------------------
+# Generator
+# -----------------------------
+def test_every_class_appears():
+    policy = PasswordPolicy(length=4)
+    for password in policy.generate_many(500):
+        assert len(password) == 4
+        for chars in CHARACTER_CLASSES.values():
+            assert set(password) & set(chars)
+
+def test_entropy_counts_only_compliant_passwords():
+    policy = PasswordPolicy(length=3, classes=("lower", "digits"))
+    compliant = sum(1 for candidate in itertools.product(policy.alphabet, repeat=3)
+                    if set(candidate) & set(CHARACTER_CLASSES["lower"]) and set(candidate) & set(CHARACTER_CLASSES["digits"]))
+    assert policy.compliant_count() == compliant
+    assert policy.entropy_bits() == pytest.approx(math.log2(compliant))
+
+def test_class_named_twice_counts_once():
+    assert PasswordPolicy(classes=("lower", "lower")).entropy_bits() == PasswordPolicy(classes=("lower",)).entropy_bits()
+
+def test_excluded_characters_never_appear():
+    policy = PasswordPolicy(length=20, exclude_ambiguous=True, exclude="xyz")
+    drawn = set("".join(policy.generate_many(200)))
+    assert not drawn & set(AMBIGUOUS_CHARACTERS + "xyz")
+
+@pytest.mark.parametrize("kwargs", [
+    {"length": 3},                                             # shorter than the four required classes
+    {"classes": ("lower", "emoji")},
+    {"classes": ()},
+    {"classes": ("digits",), "exclude": "0123456789"},
+])
+def test_impossible_policies(kwargs):
+    with pytest.raises(ValueError):
+        PasswordPolicy(**kwargs)
+
+def test_passphrase():
+    policy = PassphrasePolicy(words=4, separator=" ", capitalize=True)
+    words = policy.generate().split(" ")
+    assert len(words) == 4 and all(word[0].isupper() for word in words)
+    assert {word.lower() for word in words} <= set(load_wordlist())
+    assert policy.entropy_bits() == pytest.approx(4 * math.log2(7776))
+    with pytest.raises(ValueError):
+        PassphrasePolicy(words=0)
+
+def test_policies_round_trip():
+    for policy in (PasswordPolicy(length=20, classes=("lower", "digits"), exclude_ambiguous=True),
+                   PassphrasePolicy(words=5, separator=".")):
+        assert policy_from_dict(policy.to_dict()).to_dict() == policy.to_dict()
+    with pytest.raises(ValueError):
+        policy_from_dict({"type": "pin"})
+
+def test_generator_policy_per_platform(tmp_path):
+    generator = PasswordGenerator()
+    generator.set_policy("MyBank", PasswordPolicy(length=10, classes=("lower", "digits")))
+    path = str(tmp_path / "policies.json")
+    generator.save(path)
+    loaded = PasswordGenerator.from_file(path)
+    assert len(loaded.generate("mybank")) == 10 and loaded.generate("mybank").isalnum()
+    assert loaded.policy_for("other").to_dict() == generator.default.to_dict()
+    assert PasswordGenerator.from_file(str(tmp_path / "missing.json")).policies == {}
+
+# -----------------------------
+# Strength
+# -----------------------------
+def test_empty_password():
+    result = estimate("")
+    assert result.guesses == 1 and result.rating == "Weak"
+
+@pytest.mark.parametrize("password, pattern", [
+    ("password", "common word"),
+    ("abcdefgh", "character sequence"),
+    ("aaaaaaaa", "repeated characters"),
+    ("summer2019", "year"),
+])
+def test_guessable_patterns_are_weak(password, pattern):
+    result = estimate(password)
+    assert result.rating == "Weak"
+    assert pattern in result.feedback
+
+def test_random_passwords_are_strong():
+    for password in PasswordPolicy(length=16).generate_many(50):
+        assert rating(password) == "Very Strong"
+
+def test_longer_is_never_weaker():
+    password = "Zq7#rT9!mW2$xLp4"
+    scores = [estimate(password[:n]).score for n in range(1, len(password) + 1)]
+    assert scores == sorted(scores)
+    assert RATINGS[scores[-1]] == "Very Strong"
+
+def test_very_long_password(vault, tmp_path):
+    # Needs more guesses than a float can hold: the estimate stays in log space instead of overflowing.
+    password = secrets.token_urlsafe(300)
+    result = estimate(password)
+    assert result.rating == "Very Strong"
+    assert result.entropy_bits > 1024 and result.guesses == math.inf
+    PasswordStore(vault).add_password(OWNER, "github", "alice", "", password)
+    [(platform, checked, hits)] = check_health(vault, OWNER, str(tmp_path / "no_index.bin"))
+    assert checked.rating == "Very Strong" and hits is None
+
+@pytest.fixture(scope="module")
+def strength_corpus():
+    """10k passwords of the kinds vaults hold: random, word + year, l33t, keyboard walk + word, and passphrases."""
+    rng = random.Random(28)
+    with open(DICTIONARY_FILES[1], encoding="utf-8") as f:
+        words = [line.strip() for line in f if len(line.strip()) >= 3]
+    alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
+    leet = str.maketrans("aeios", "@310$")
+    makers = (
+        lambda: "".join(rng.choice(alphabet) for _ in range(rng.randint(8, 20))),
+        lambda: rng.choice(words).capitalize() + str(rng.randint(1950, 2030)),
+        lambda: rng.choice(words).translate(leet) + rng.choice("!?#"),
+        lambda: rng.choice(["qwerty", "asdfgh", "zxcvbn", "123456", "abcdef"]) + rng.choice(words),
+        lambda: "".join(rng.choice(words) for _ in range(3)),
+    )
+    return [makers[i % len(makers)]() for i in range(10000)]
+
+# Passwords rated per second that health audits of large vaults need (best of the benchmark's rounds).
+STRENGTH_TARGET = 10_000
+
+@pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None, reason="needs pytest-benchmark")
+def test_estimate_throughput(benchmark, strength_corpus):
+    # The health check rates every saved password. Compare runs against a saved baseline (see conftest.py)
+    # to catch smaller regressions.
+    results = benchmark.pedantic(lambda: [estimate(password) for password in strength_corpus], rounds=5)
+    assert len(results) == len(strength_corpus)
+    assert {result.rating for result in results} >= {"Weak", "Very Strong"}
+    assert len(strength_corpus) / benchmark.stats["min"] >= STRENGTH_TARGET
@@ -0,0 +1,93 @@
+"""Group commit: writes are deferred until the window or max_pending is reached, and flush()/close() commit the rest."""
+import sqlite3
+import time
+
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD
+from vault_core.storage import DatabaseManager, PasswordStore, UserStore
+
+@pytest.fixture
+def open_vault(workdir, tmp_path):
+    """Opens tmp_path/vault.db with the given group-commit settings, the owner's account already committed."""
+    opened = []
+
+    def open_vault(**options):
+        db = DatabaseManager(str(tmp_path / "vault.db"), **options)
+        UserStore(db).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+        db.flush()
+        opened.append(db)
+        return db
+    yield open_vault
+    for db in opened:
+        db.close()
+
+@pytest.fixture
+def other(tmp_path):
+    """A second connection to the same file that does not wait for locks."""
+    conn = sqlite3.connect(str(tmp_path / "vault.db"), timeout=0)
+    yield conn
+    conn.close()
+
+def committed(conn):
+    return conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0]
+
+def test_commits_are_deferred_within_the_window(open_vault, other):
+    db = open_vault(group_commit=60)
+    store = PasswordStore(db)
+    for i in range(3):
+        store.add_password(OWNER, "github", f"user{i}", "", "pw")
+    assert db.conn.in_transaction and committed(other) == 0
+    db.flush()
+    assert not db.conn.in_transaction and committed(other) == 3
+
+def test_a_write_after_the_window_commits(open_vault, other):
+    db = open_vault(group_commit=0.05)
+    store = PasswordStore(db)
+    store.add_password(OWNER, "github", "user0", "", "pw")
+    assert committed(other) == 0
+    time.sleep(0.06)
+    store.add_password(OWNER, "github", "user1", "", "pw")
+    assert not db.conn.in_transaction and committed(other) == 2
+
+def test_max_pending_commits_without_waiting_for_the_window(open_vault, other):
+    db = open_vault(group_commit=60, max_pending=3)
+    store = PasswordStore(db)
+    for i in range(2):
+        store.add_password(OWNER, "github", f"user{i}", "", "pw")
+    assert committed(other) == 0
+    store.add_password(OWNER, "github", "user2", "", "pw")
+    assert not db.conn.in_transaction and committed(other) == 3
+
+def test_close_commits_what_is_pending(workdir, tmp_path):
+    db = DatabaseManager(str(tmp_path / "vault.db"), group_commit=60)
+    UserStore(db).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    PasswordStore(db).add_password(OWNER, "github", "alice", "", "pw")
+    assert db.conn.in_transaction
+    db.close()
+    reopened = DatabaseManager(str(tmp_path / "vault.db"))
+    try:
+        assert PasswordStore(reopened).get_passwords(OWNER, "github")[0][3] == "pw"
+    finally:
+        reopened.close()
+
+def test_pending_writes_hold_the_write_lock(open_vault, other):
+    # Documented behaviour: another connection cannot write until the deferred commit is flushed.
+    db = open_vault(group_commit=60)
+    PasswordStore(db).add_password(OWNER, "github", "alice", "", "pw")
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        other.execute("DELETE FROM password_history")
+    db.flush()
+    other.execute("DELETE FROM password_history")
+    other.commit()
+
+def test_transaction_flushes_pending_writes_first(open_vault, other):
+    db = open_vault(group_commit=60)
+    store = PasswordStore(db)
+    store.add_password(OWNER, "github", "user0", "", "pw")
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            store.add_password(OWNER, "github", "user1", "", "pw")
+            raise RuntimeError("abort")
+    # The rolled-back block takes only its own write with it.
+    assert committed(other) == 1
@@ -0,0 +1,60 @@
+"""Hot paths of the GUI frontend's logic layer (no widgets are created)."""
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD, platform_name
+
+pytest.importorskip("pytest_benchmark")
+
+def test_gui_login(benchmark, gui, gui_vault):
+    users = gui.UserStore(gui_vault)
+    assert benchmark(users.login, OWNER, OWNER_PASSWORD)
+
+def test_gui_add_password(benchmark, gui, gui_vault):
+    logic = gui.PasswordStore(gui_vault)
+    benchmark(logic.add_password, OWNER, "benchplatform", "bench", "bench@example.com", "Zq7#rT9!mW2$")
+
+def test_gui_add_passwords_batched(benchmark, gui, gui_vault):
+    # 100 adds in one unit of work: one commit instead of 100.
+    logic = gui.PasswordStore(gui_vault)
+    def add_batch():
+        with gui_vault.transaction():
+            for i in range(100):
+                logic.add_password(OWNER, "benchbatch", f"bench{i}", "bench@example.com", "Zq7#rT9!mW2$")
+    benchmark.pedantic(add_batch, rounds=3, iterations=1)
+
+def test_gui_bulk_delete(benchmark, gui, gui_vault):
+    logic = gui.PasswordStore(gui_vault)
+    def setup():
+        with gui_vault.transaction():
+            ids = [logic.add_password(OWNER, "benchbulk", f"bench{i}", "bench@example.com", "x") for i in range(500)]
+        return (ids,), {}
+    benchmark.pedantic(logic.delete_passwords, setup=setup, rounds=3, iterations=1)
+    assert "benchbulk" not in logic.list_platforms(OWNER)
+
+def test_gui_list_platforms(benchmark, gui, gui_vault):
+    logic = gui.PasswordStore(gui_vault)
+    assert benchmark(logic.list_platforms, OWNER)
+
+def test_gui_get_passwords(benchmark, gui, gui_vault, vault_size):
+    logic = gui.PasswordStore(gui_vault)
+    assert benchmark(logic.get_passwords, OWNER, platform_name(vault_size - 1))
+
+def test_gui_check_health(benchmark, gui, gui_vault, vault_size):
+    results = benchmark.pedantic(gui.health.check_health, args=(gui_vault, OWNER), rounds=3, iterations=1)
+    assert len(results) >= vault_size
+
+def test_gui_export_csv(benchmark, gui, gui_vault):
+    benchmark.pedantic(gui.csv_io.export_csv, args=(gui_vault,), rounds=3, iterations=1)
+
+def test_gui_import_csv(benchmark, gui, gui_vault):
+    gui.csv_io.export_csv(gui_vault)
+    before = gui_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0]
+    benchmark.pedantic(gui.csv_io.import_csv, args=(gui_vault,), rounds=3, iterations=1)
+    assert gui_vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0] == before
+
+def test_gui_online_backup(benchmark, gui, gui_vault, fake_firestore):
+    assert benchmark.pedantic(gui.run_sync, args=(gui.sync.backup_online, gui_vault), rounds=3, iterations=1) is None
+
+def test_gui_online_restore(benchmark, gui, gui_vault, fake_firestore):
+    gui.sync.backup_online(gui_vault)
+    assert benchmark.pedantic(gui.run_sync, args=(gui.sync.restore_online, gui_vault), rounds=3, iterations=1) is None
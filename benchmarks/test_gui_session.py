@@ -0,0 +1,62 @@
+"""GUI sessions: logging out leaves nothing of the user on screen or in the completer, and the tag view keeps passwords masked."""
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD
+
+@pytest.fixture
+def window(gui):
+    app = gui.QApplication.instance() or gui.QApplication([])
+    window = gui.SecureManagerGUI()
+    if not window.user_logic.login(OWNER, OWNER_PASSWORD):
+        window.user_logic.signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    yield window
+    window.close(); window.db.close(); app.processEvents()
+
+def test_logout_clears_the_users_data(window):
+    entry = window.pwd_logic.add_password(OWNER, "github", "alice", "", "secret-pw")
+    window.tag_logic.add_tag(OWNER, [entry], "work")
+    window.pwd_logic.set_totp(entry, "JBSWY3DPEHPK3PXP")
+    window.current_user = OWNER  # do_login would also back up online
+    window.show_passwords()
+    window.platform_list.setCurrentRow(0); window.on_platform_select()
+    window.show_totp()
+    assert window.pwd_table.rowCount() and window.tag_list.count() and window.totp_table.rowCount()
+    assert window.platform_model.rowCount() == 1
+    window.do_logout()
+    assert window.stack.currentWidget() is window.screens["login"]
+    assert window.pwd_table.rowCount() == 0 and window.page_after is None
+    assert window.platform_list.count() == window.tag_list.count() == window.totp_table.rowCount() == 0
+    assert window.platform_model.rowCount() == 0 and window.platform_search.completer().completionCount() == 0
+    assert not window.totp_timer.isActive() and window.code_board._macs == {}
+
+@pytest.fixture
+def tag_view(gui, window, monkeypatch):
+    """The window showing the "tagview" filter over two entries on different platforms; dialogs answer yes."""
+    ids = [window.pwd_logic.add_password(OWNER, plat, "alice", "", "secret-pw") for plat in ("tv-mail", "tv-bank")]
+    window.tag_logic.add_tag(OWNER, ids, "tagview")
+    window.current_user = OWNER
+    window.show_passwords()
+    window.tag_filter.setText("tagview"); window.on_tag_filter()
+    monkeypatch.setattr(gui.QMessageBox, "question", lambda *args: gui.QMessageBox.Yes)
+    yield window
+    window.pwd_logic.delete_passwords(ids)
+
+def run_bulk(gui, window, action):
+    window.pwd_table.selectAll(); action()
+    while window.bulk_worker is not None:
+        window.bulk_worker.wait(); gui.QApplication.processEvents()
+
+def shown(window):
+    return sorted((window.pwd_table.item(row,0).toolTip(), window.pwd_table.item(row,1).text(),
+                   window.pwd_table.item(row,3).text()) for row in range(window.pwd_table.rowCount()))
+
+def test_tag_view_bulk_actions_keep_passwords_masked(gui, tag_view, monkeypatch):
+    run_bulk(gui, tag_view, tag_view.on_regenerate_pwds)
+    assert shown(tag_view) == [("tv-bank", "alice", "••••••"), ("tv-mail", "alice", "••••••")]
+    monkeypatch.setattr(tag_view, "ask_platform", lambda *args: ("tv-moved", True))
+    run_bulk(gui, tag_view, tag_view.on_move_pwds)
+    assert shown(tag_view) == [("tv-moved", "alice", "••••••")] * 2
+    answers = iter([("bob", True), ("new-secret", True)])
+    monkeypatch.setattr(gui.QInputDialog, "getText", lambda *args: next(answers))
+    tag_view.pwd_table.setCurrentCell(0, 1); tag_view.on_edit_pwd()
+    assert sorted(row[1:] for row in shown(tag_view)) == [("alice", "••••••"), ("bob", "••••••")]
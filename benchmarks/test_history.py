@@ -0,0 +1,83 @@
+"""Password history: every change is recorded, restores can be undone, and pruning keeps the newest."""
+import pytest
+
+from conftest import OWNER
+from vault_core import crypto
+from vault_core.storage import DatabaseManager, PasswordStore, UserStore, history_keep, prune_history
+
+@pytest.fixture
+def store(vault):
+    return PasswordStore(vault)
+
+def versions(store, entry_id):
+    return [(version, password) for version, password, _ in store.history(entry_id)]
+
+def test_every_change_is_recorded(store):
+    # Several changes within the same second each keep the password they replaced.
+    entry = store.add_password(OWNER, "github", "alice", "", "p0")
+    for i in range(1, 4):
+        store.update_password(entry, "alice", f"p{i}")
+    assert versions(store, entry) == [(3, "p2"), (2, "p1"), (1, "p0")]
+
+def test_unchanged_password_adds_nothing(store):
+    entry = store.add_password(OWNER, "github", "alice", "", "p0")
+    store.update_username(entry, "alice2")
+    assert store.history(entry) == []
+
+def test_restore_is_recorded_and_can_be_undone(store):
+    entry = store.add_password(OWNER, "github", "alice", "", "p0")
+    store.update_password(entry, "alice", "p1")
+    assert store.restore_version(entry, 1)
+    assert crypto.decrypt_data(store.db.conn.execute("SELECT password FROM passwords WHERE id = ?",
+                                                     (entry,)).fetchone()[0]) == "p0"
+    assert versions(store, entry) == [(2, "p1"), (1, "p0")]
+    assert not store.restore_version(entry, 99)
+
+def test_reencryption_adds_no_history(store, vault):
+    entry = store.add_password(OWNER, "github", "alice", "", "p0")
+    store.update_password(entry, "alice", "p1")
+    assert vault.migrate_storage_format("binary") > 0
+    assert versions(store, entry) == [(1, "p0")]
+
+def test_each_vault_writes_in_its_own_format(store, vault, tmp_path):
+    # Opening another vault (a shard, a replica) must not change the format this one writes in.
+    vault.migrate_storage_format("binary")
+    other = DatabaseManager(str(tmp_path / "other.db"))
+    try:
+        assert (vault.storage_format, other.storage_format) == ("binary", "fernet")
+        UserStore(other).signup(OWNER, "Correct-Horse-42", "pet?", "rex")
+        entry = store.add_password(OWNER, "github", "alice", "", "p0")
+        other_entry = PasswordStore(other).add_password(OWNER, "github", "alice", "", "p0")
+        written = lambda db, entry_id: db.conn.execute("SELECT password FROM passwords WHERE id = ?",
+                                                       (entry_id,)).fetchone()[0]
+        assert crypto.storage_format_of(written(vault, entry)) == "binary"
+        assert crypto.storage_format_of(written(other, other_entry)) == "fernet"
+    finally:
+        other.close()
+    assert DatabaseManager(vault.path).storage_format == "binary"
+
+def test_deleted_entry_takes_its_history(store, vault):
+    entry = store.add_password(OWNER, "github", "alice", "", "p0")
+    store.update_password(entry, "alice", "p1")
+    store.delete_password(entry)
+    assert vault.conn.execute("SELECT COUNT(*) FROM password_history").fetchone()[0] == 0
+
+def test_prune_keeps_the_newest(store, vault):
+    entries = [store.add_password(OWNER, f"site{i}", "alice", "", "p0") for i in range(3)]
+    for entry in entries:
+        for i in range(1, 6):
+            store.update_password(entry, "alice", f"p{i}")
+    # Small batches: pruning loops until a batch comes back short.
+    assert prune_history(vault, keep=2, batch_size=4) == 3 * 3
+    assert versions(store, entries[0]) == [(5, "p4"), (4, "p3")]
+    assert prune_history(vault, keep=2) == 0
+
+def test_prune_uses_the_vault_setting(store, vault):
+    vault.set_meta("history_keep", "1")
+    vault.commit()
+    assert history_keep(vault) == 1
+    entry = store.add_password(OWNER, "github", "alice", "", "p0")
+    store.update_password(entry, "alice", "p1")
+    store.update_password(entry, "alice", "p2")
+    assert prune_history(vault) == 1
+    assert versions(store, entry) == [(2, "p1")]
@@ -0,0 +1,64 @@
+"""
+Import-time budget for vault_core, which both frontends import at startup, and
+the GUI's time to first paint (see gui_startup.py for the full measurement).
+
+Each check runs in a fresh interpreter, so nothing imported by the rest of the
+suite is already cached.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+CORE_MODULES = ["vault_core.crypto", "vault_core.storage", "vault_core.csv_io", "vault_core.sync",
+                "vault_core.health", "vault_core.generator", "vault_core.instrumentation", "vault_core.shards",
+                "vault_core.merge", "vault_core.changes", "vault_core.replication", "vault_core.tags",
+                "vault_core.totp", "vault_core.tui", "vault_core.platforms",
+                "vault_core.importers"]
+# Loaded on first use only: firebase_admin by sync.init_firebase, the GUI toolkit never.
+DEFERRED_MODULES = ["firebase_admin", "google.cloud.firestore", "PyQt5"]
+BUDGET_SECONDS = 0.25
+RUNS = 3
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+import vault_core.strength
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": [m for m in {deferred!r} if m in sys.modules],
+    "dictionary_loaded": vault_core.strength._dictionary is not None,
+}}))
+"""
+
+def probe(tmp_path):
+    code = PROBE.format(modules=CORE_MODULES, deferred=DEFERRED_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True, capture_output=True, text=True,
+                         env=dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1"))
+    return json.loads(out.stdout)
+
+def test_core_import_budget(tmp_path):
+    best = min(probe(tmp_path)["seconds"] for _ in range(RUNS))
+    assert best < BUDGET_SECONDS, f"importing vault_core took {best * 1000:.0f} ms (budget {BUDGET_SECONDS * 1000:.0f} ms)"
+
+def test_core_import_defers_heavy_work(tmp_path):
+    result = probe(tmp_path)
+    assert result["loaded"] == []
+    assert not result["dictionary_loaded"]
+    # The key is read or created on first encryption, not at import.
+    assert not os.path.exists(tmp_path / "secret.key")
+
+def test_gui_first_paint_builds_login_only():
+    pytest.importorskip("PyQt5")
+    import gui_startup
+    marks = gui_startup.run_once()
+    # Only the login screen exists when the window first paints, and Firebase is set up after it.
+    assert marks["screens"] == 1
+    assert not marks["firebase_loaded"]
@@ -0,0 +1,153 @@
+"""Browser and password-manager exports: recognising the format, reading entries, folders and 2FA seeds."""
+import json
+import threading
+
+import pytest
+
+from conftest import OWNER
+from vault_core import crypto
+from vault_core.importers import IMPORTERS, detect_format, import_file, make_record, platform_of
+from vault_core.storage import DatabaseManager, StagingError
+from vault_core.tags import TagStore
+
+SEED = "JBSWY3DPEHPK3PXP"
+
+EXPORTS = {
+    "chrome": ("Passwords.csv",
+               "name,url,username,password\n"
+               "GitHub,https://github.com/login,alice@example.com,gh-pass\n"
+               ",https://www.bank.example/,alice,bank-pass\n"),
+    "firefox": ("logins.csv",
+                '"url","username","password","httpRealm","formActionOrigin","guid"\n'
+                '"https://github.com","alice@example.com","gh-pass",,"https://github.com","{1}"\n'
+                '"https://www.bank.example","alice","bank-pass",,"","{2}"\n'),
+    "bitwarden-csv": ("bitwarden.csv",
+                      "folder,favorite,type,name,notes,fields,reprompt,login_uri,login_username,login_password,login_totp\n"
+                      f"Work/Dev,,login,GitHub,,,0,https://github.com,alice@example.com,gh-pass,{SEED}\n"
+                      ",,note,Shopping list,milk,,0,,,,\n"
+                      ",,login,,,,0,https://www.bank.example,alice,bank-pass,\n"),
+    "bitwarden-json": ("bitwarden.json", json.dumps({
+        "encrypted": False,
+        "folders": [{"id": "f1", "name": "Work/Dev"}],
+        "items": [
+            {"type": 1, "name": "GitHub", "folderId": "f1",
+             "login": {"uris": [{"uri": "https://github.com"}], "username": "alice@example.com",
+                       "password": "gh-pass", "totp": f"otpauth://totp/GitHub?secret={SEED}&digits=8"}},
+            {"type": 2, "name": "Shopping list", "notes": "milk"},
+            {"type": 1, "name": None, "folderId": None,
+             "login": {"uris": [{"uri": "https://www.bank.example"}], "username": "alice", "password": "bank-pass"}},
+        ]})),
+    "keepass-xml": ("keepass.xml", f"""<?xml version="1.0" encoding="utf-8"?>
+<KeePassFile>
+  <Meta><RecycleBinUUID>BIN</RecycleBinUUID></Meta>
+  <Root><Group><UUID>ROOT</UUID><Name>Database</Name>
+    <Group><UUID>W</UUID><Name>Work</Name><Group><UUID>D</UUID><Name>Dev</Name>
+      <Entry>
+        <String><Key>Title</Key><Value>GitHub</Value></String>
+        <String><Key>URL</Key><Value>https://github.com</Value></String>
+        <String><Key>UserName</Key><Value>alice@example.com</Value></String>
+        <String><Key>Password</Key><Value>gh-pass</Value></String>
+        <String><Key>otp</Key><Value>otpauth://totp/GitHub?secret={SEED}</Value></String>
+        <History><Entry>
+          <String><Key>Title</Key><Value>GitHub</Value></String>
+          <String><Key>Password</Key><Value>old-pass</Value></String>
+        </Entry></History>
+      </Entry>
+    </Group></Group>
+    <Entry>
+      <String><Key>URL</Key><Value>https://www.bank.example/</Value></String>
+      <String><Key>UserName</Key><Value>alice</Value></String>
+      <String><Key>Password</Key><Value>bank-pass</Value></String>
+    </Entry>
+    <Group><UUID>BIN</UUID><Name>Recycle Bin</Name>
+      <Entry><String><Key>Title</Key><Value>Deleted</Value></String></Entry>
+    </Group>
+  </Group></Root>
+</KeePassFile>
+"""),
+}
+
+@pytest.fixture(params=sorted(EXPORTS))
+def export(request, tmp_path):
+    """(format name, path) of a small export holding a GitHub and a bank login."""
+    name, text = EXPORTS[request.param]
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return request.param, str(path)
+
+def test_detect_format(export):
+    fmt, path = export
+    assert detect_format(path) is IMPORTERS[fmt]
+
+def test_records(export):
+    fmt, path = export
+    records = {record[0]: record for record in IMPORTERS[fmt].records(path)}
+    platform = "github.com" if fmt == "firefox" else "github"  # Firefox saves no titles: the host is used
+    assert sorted(records) == ["bank.example", platform]
+    github = records[platform]
+    assert github[1:4] == ("alice@example.com", "alice@example.com", "gh-pass")
+    assert records["bank.example"][1:4] == ("alice", "", "bank-pass")
+    if fmt in ("bitwarden-csv", "bitwarden-json", "keepass-xml"):
+        assert github[4] == "work/dev"
+        assert github[5][0] == SEED
+        assert github[5][1] == (8 if fmt == "bitwarden-json" else 6)
+
+def test_import_file_is_idempotent(export, vault):
+    _, path = export
+    assert import_file(vault, OWNER, path, workers=1) == (2, 0)
+    assert import_file(vault, OWNER, path, workers=1) == (0, 2)
+    rows = vault.conn.execute("SELECT platform, password FROM passwords WHERE username = ?", (OWNER,)).fetchall()
+    assert sorted(crypto.decrypt_data(password) for _, password in rows) == ["bank-pass", "gh-pass"]
+
+def test_import_file_keeps_folders_and_seeds(tmp_path, vault):
+    path = tmp_path / "bitwarden.csv"
+    path.write_text(EXPORTS["bitwarden-csv"][1], encoding="utf-8")
+    import_file(vault, OWNER, str(path), workers=1)
+    tags = TagStore(vault)
+    assert [row[1] for row in tags.filter(OWNER, "work")] == ["github"]
+    secret = vault.conn.execute("SELECT secret FROM totp_secrets").fetchone()[0]
+    assert crypto.decrypt_data(secret) == SEED
+
+def test_parallel_import_from_a_thread(tmp_path, vault):
+    # As the GUI does: a background thread, its own connection, and a worker pool encrypting batches.
+    path = tmp_path / "bitwarden.csv"
+    path.write_text(EXPORTS["bitwarden-csv"][1], encoding="utf-8")
+    result = []
+
+    def run():
+        db = DatabaseManager(vault.path)
+        try:
+            result.append(import_file(db, OWNER, str(path), workers=2, batch_size=1))
+        finally:
+            db.close()
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(timeout=60)
+    assert result == [(2, 0)]
+    rows = vault.conn.execute("SELECT password FROM passwords WHERE username = ?", (OWNER,)).fetchall()
+    assert sorted(crypto.decrypt_data(password) for password, in rows) == ["bank-pass", "gh-pass"]
+
+def test_unrecognised_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("just some notes\n", encoding="utf-8")
+    with pytest.raises(StagingError):
+        detect_format(str(path))
+
+def test_encrypted_bitwarden_export_is_refused(tmp_path, vault):
+    path = tmp_path / "bitwarden.json"
+    path.write_text(json.dumps({"encrypted": True, "items": []}), encoding="utf-8")
+    with pytest.raises(StagingError):
+        import_file(vault, OWNER, str(path), workers=1)
+
+def test_broken_file_leaves_the_vault_unchanged(tmp_path, vault):
+    path = tmp_path / "keepass.xml"
+    path.write_text(EXPORTS["keepass-xml"][1][:-40], encoding="utf-8")  # cut off mid-file
+    with pytest.raises(StagingError):
+        import_file(vault, OWNER, str(path), workers=1)
+    assert vault.conn.execute("SELECT COUNT(*) FROM passwords").fetchone()[0] == 0
+
+def test_make_record_edge_cases():
+    assert platform_of("", "www.example.com/login") == "example.com"
+    assert platform_of("  My Bank ", "https://bank.example") == "my bank"
+    # Unsupported seeds and unusable folders are dropped, not the entry.
+    assert make_record("", "", "bob", "pw", folder=" / ", otp="steam://ABC") == ("imported", "bob", "", "pw", None, None)
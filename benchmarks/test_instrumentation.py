@@ -0,0 +1,46 @@
+"""Statistics: enabling them on an open vault times its statements and fills the counters, without a reconnect."""
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD
+from vault_core.instrumentation import stats
+from vault_core.shards import ShardedUserStore, ShardedVault
+from vault_core.storage import PasswordStore
+
+@pytest.fixture
+def recording():
+    stats.reset()
+    yield stats
+    stats.enabled = False
+    stats.reset()
+
+def test_nothing_is_recorded_until_enabled(vault, recording):
+    PasswordStore(vault).add_password(OWNER, "github", "alice", "", "pw")
+    recording.increment("events")
+    assert recording.snapshot() == {"timings": {}, "counters": {}}
+
+def test_enabling_later_keeps_the_connection(vault, recording):
+    conn = vault.conn
+    conn.execute("CREATE TEMP TABLE scratch (x)")
+    recording.enabled = True
+    store = PasswordStore(vault)
+    store.add_password(OWNER, "github", "alice", "", "pw")
+    assert store.get_passwords(OWNER, "github")[0][3] == "pw"
+    conn.executemany("INSERT INTO temp.scratch VALUES (?)", [(1,), (2,)])
+    vault.flush()
+    assert vault.conn is conn and conn.execute("SELECT COUNT(*) FROM temp.scratch").fetchone()[0] == 2
+    snapshot = recording.snapshot()
+    assert {"db.insert", "db.insert_many", "db.select", "db.fetch", "crypto.encrypt", "crypto.decrypt"} <= set(
+        snapshot["timings"])
+    counters = snapshot["counters"]
+    assert counters["db.rows_written"] >= 3 and counters["db.rows_fetched"] >= 1
+    assert counters["crypto.bytes_encrypted"] == counters["crypto.bytes_decrypted"] == 2
+
+def test_backup_bytes(workdir, tmp_path, recording):
+    vaults = ShardedVault(str(tmp_path / "shards"))
+    try:
+        ShardedUserStore(vaults).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+        recording.enabled = True
+        vaults.backup_user(OWNER, str(tmp_path / "alice.db"))
+    finally:
+        vaults.close()
+    assert recording.snapshot()["counters"]["backup.bytes"] == (tmp_path / "alice.db").stat().st_size
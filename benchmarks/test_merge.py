@@ -0,0 +1,101 @@
+"""Merging another copy of the vault: what each policy does with new, unchanged and conflicting entries."""
+import time
+
+import pytest
+
+from conftest import OWNER
+from vault_core import crypto
+from vault_core.merge import merge_vault
+from vault_core.storage import PasswordStore, StagingError
+from vault_core.tags import TagStore
+
+NOW = int(time.time())
+
+@pytest.fixture
+def local(vault):
+    """The vault with two entries, both encrypted a minute ago."""
+    for platform in ("github", "gitlab"):
+        vault.conn.execute("INSERT INTO passwords (username, platform, platform_username, email, password) "
+                           "VALUES (?, ?, 'alice', 'a@example.com', ?)",
+                           (OWNER, platform, crypto.encrypt_data(f"{platform} local", NOW - 60)))
+    vault.commit()
+    return vault
+
+def account(db):
+    return [db.conn.execute("SELECT username, password, security_question, security_answer FROM users").fetchone()]
+
+def entry(platform, password, age, email="a@example.com", entry_id=None):
+    return (entry_id, OWNER, platform, "alice", email, crypto.encrypt_data(password, NOW - age))
+
+def passwords(db):
+    rows = db.conn.execute("SELECT platform, email, password FROM passwords")
+    return {platform: (email, crypto.decrypt_data(password)) for platform, email, password in rows}
+
+def test_new_and_unchanged_entries(local):
+    counts = merge_vault(local, account(local), [entry("github", "github local", 10, entry_id=1),
+                                                 entry("bank", "bank", 10, entry_id=2)])
+    assert counts == {"users": 0, "inserted": 1, "updated": 0, "unchanged": 1, "kept": 0}
+    assert passwords(local)["bank"] == ("a@example.com", "bank")
+
+@pytest.mark.parametrize("policy, age, winner", [
+    ("newest", 10, "theirs"),
+    ("newest", 120, "local"),
+    ("ours", 10, "local"),
+    ("theirs", 120, "theirs"),
+])
+def test_conflict_policies(local, policy, age, winner):
+    counts = merge_vault(local, account(local), [entry("github", "theirs", age, entry_id=1)], policy=policy)
+    assert passwords(local)["github"][1] == ("theirs" if winner == "theirs" else "github local")
+    assert counts["updated" if winner == "theirs" else "kept"] == 1
+
+def test_changed_email_is_a_conflict(local):
+    counts = merge_vault(local, account(local), [entry("github", "github local", 10, "new@example.com", 1)])
+    assert counts["updated"] == 1
+    assert passwords(local)["github"] == ("new@example.com", "github local")
+
+def test_duplicate_in_import_counts_once(local):
+    counts = merge_vault(local, account(local), [entry("bank", "first", 10, entry_id=1),
+                                                 entry("bank", "second", 5, entry_id=2)])
+    assert counts["inserted"] == 1
+    assert passwords(local)["bank"][1] == "first"
+
+def test_seeds_tags_and_history_follow_their_entries(local):
+    # Staged ids differ from the ids the entries end up with: bank is inserted, github updated.
+    seed = crypto.encrypt_data("JBSWY3DPEHPK3PXP")
+    extras = {
+        "totp_secrets": [(7, seed, 6, 30, "SHA1"), (8, seed, 8, 30, "SHA1")],
+        "tags": [(OWNER, "finance"), (OWNER, "unused")],
+        "entry_tags": [(7, "finance"), (8, "work")],
+        "password_history": [(8, 1, crypto.encrypt_data("github older", NOW - 600), NOW - 60)],
+    }
+    counts = merge_vault(local, account(local), [entry("bank", "bank", 10, entry_id=7),
+                                                 entry("github", "theirs", 10, entry_id=8)], extras=extras)
+    assert (counts["inserted"], counts["updated"]) == (1, 1)
+    store, tags = PasswordStore(local), TagStore(local)
+    seeds = {platform: digits for _, platform, _, _, digits, _, _ in store.totp_entries(OWNER)}
+    assert seeds == {"bank": 6, "github": 8}
+    assert [row[1] for row in tags.filter(OWNER, "finance")] == ["bank"]
+    assert [row[1] for row in tags.filter(OWNER, "work")] == ["github"]
+    assert dict(tags.tags(OWNER))["unused"] == 0
+    github = local.conn.execute("SELECT id FROM passwords WHERE platform = 'github'").fetchone()[0]
+    # The replaced local password first, then the imported entry's own history.
+    assert [password for _, password, _ in store.history(github)] == ["github older", "github local"]
+
+def test_new_account_added_existing_left_alone(local):
+    other = ("bob", "hash", crypto.encrypt_data("q"), crypto.encrypt_data("a"))
+    changed = (OWNER, "other hash") + account(local)[0][2:]
+    counts = merge_vault(local, [changed, other], [(1, "bob", "github", "bob", "", crypto.encrypt_data("pw"))])
+    assert counts["users"] == 1 and counts["inserted"] == 1
+    assert account(local)[0][1] != "other hash"
+    assert PasswordStore(local).get_passwords("bob", "github")
+
+def test_invalid_import_changes_nothing(local):
+    before = passwords(local)
+    with pytest.raises(StagingError):
+        merge_vault(local, account(local), [entry("bank", "bank", 10, entry_id=1),
+                                            (2, OWNER, "broken", "alice", "", "not a ciphertext")])
+    assert passwords(local) == before
+
+def test_unknown_policy(local):
+    with pytest.raises(ValueError):
+        merge_vault(local, account(local), [], policy="mine")
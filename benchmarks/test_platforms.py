@@ -0,0 +1,18 @@
+"""Platform listings: sorted by platform, as the TUI's and the completer's binary searches need."""
+from conftest import OWNER
+from vault_core.platforms import PlatformIndex
+from vault_core.storage import PasswordStore, UserStore
+
+def test_platforms_are_sorted(vault):
+    UserStore(vault).signup("bob", "Another-Pass-9", "pet?", "tom")
+    store = PasswordStore(vault)
+    for owner, platform in ((OWNER, "zoom"), ("bob", "bank"), (OWNER, "amazon"), (OWNER, "mail"), (OWNER, "github"),
+                            (OWNER, "mail")):
+        store.add_password(owner, platform, owner, "", "pw")
+    expected = ["amazon", "github", "mail", "zoom"]
+    assert store.list_platforms(OWNER) == expected
+    assert [row[:2] for row in store.platform_summary(OWNER)] == [("amazon", 1), ("github", 1), ("mail", 2), ("zoom", 1)]
+    index = PlatformIndex(vault)
+    assert index.platforms(OWNER) == expected
+    store.add_password(OWNER, "gitlab", OWNER, "", "pw")
+    assert index.complete(OWNER, "git") == ["github", "gitlab"]
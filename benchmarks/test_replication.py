@@ -0,0 +1,119 @@
+"""Two-way sync: conflicting edits, deletes and entries that several vaults already hold."""
+import shutil
+
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD
+from vault_core import crypto
+from vault_core.replication import DirectoryTransport, sync_vault
+from vault_core.storage import DatabaseManager, PasswordStore, UserStore
+from vault_core.tags import TagStore
+
+def contents(db):
+    rows = db.conn.execute("SELECT username, platform, platform_username, email, password FROM passwords")
+    return sorted(row[:4] + (crypto.decrypt_data(row[4]),) for row in rows)
+
+@pytest.fixture
+def share(workdir, tmp_path):
+    return str(tmp_path / "share")
+
+@pytest.fixture
+def open_vault(workdir, tmp_path):
+    opened = []
+    def open_vault(name):
+        db = DatabaseManager(str(tmp_path / name))
+        opened.append(db)
+        return db
+    yield open_vault
+    for db in opened:
+        db.close()
+
+def sync_until_quiet(dbs, share, rounds=4):
+    for _ in range(rounds):
+        results = [sync_vault(db, DirectoryTransport(share)) for db in dbs]
+        if not any(r["pushed"] or r["applied"] for r in results):
+            return
+    raise AssertionError("the vaults kept exchanging changes")
+
+def test_new_entries_reach_every_vault(open_vault, share):
+    a, b = open_vault("a.db"), open_vault("b.db")
+    UserStore(a).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    PasswordStore(a).add_password(OWNER, "github", "alice", "a@example.com", "first")
+    sync_until_quiet([a, b], share)
+    assert contents(b) == contents(a) == [(OWNER, "github", "alice", "a@example.com", "first")]
+    assert UserStore(b).login(OWNER, OWNER_PASSWORD)
+
+def test_later_edit_wins_a_conflict(open_vault, share):
+    a, b = open_vault("a.db"), open_vault("b.db")
+    UserStore(a).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    entry = PasswordStore(a).add_password(OWNER, "github", "alice", "a@example.com", "first")
+    sync_until_quiet([a, b], share)
+    PasswordStore(a).update_password(entry, "alice", "from a")
+    sync_vault(a, DirectoryTransport(share))
+    PasswordStore(b).update_password(entry, "alice", "from b")
+    sync_until_quiet([b, a], share)
+    assert contents(a) == contents(b) == [(OWNER, "github", "alice", "a@example.com", "from b")]
+
+def test_delete_reaches_every_vault(open_vault, share):
+    a, b = open_vault("a.db"), open_vault("b.db")
+    UserStore(a).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    entry = PasswordStore(a).add_password(OWNER, "github", "alice", "a@example.com", "first")
+    PasswordStore(a).add_password(OWNER, "gitlab", "alice", "a@example.com", "second")
+    sync_until_quiet([a, b], share)
+    PasswordStore(b).delete_password(entry)
+    sync_until_quiet([a, b], share)
+    assert [row[1] for row in contents(a)] == [row[1] for row in contents(b)] == ["gitlab"]
+
+def extras(db):
+    """Each entry's tags, 2FA seed and earlier passwords, by platform, and the owner's tags."""
+    store, tags = PasswordStore(db), TagStore(db)
+    seeds = {row[1]: crypto.decrypt_data(row[3]) for row in store.totp_entries(OWNER)}
+    entries = {platform: (tags.entry_tags(entry), seeds.get(platform), [row[:2] for row in store.history(entry)])
+               for entry, platform in db.conn.execute("SELECT id, platform FROM passwords")}
+    return entries, [name for name, _ in tags.tags(OWNER)]
+
+def test_tags_seeds_and_history_reach_every_vault(open_vault, share):
+    a, b = open_vault("a.db"), open_vault("b.db")
+    UserStore(a).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    store = PasswordStore(a)
+    entry = store.add_password(OWNER, "github", "alice", "a@example.com", "first")
+    store.update_password(entry, "alice", "second")
+    store.set_totp(entry, "JBSWY3DPEHPK3PXP")
+    TagStore(a).add_tag(OWNER, [entry], "work/dev")
+    TagStore(a).add_tag(OWNER, [entry], "old")
+    sync_until_quiet([a, b], share)
+    assert extras(b) == extras(a) == ({"github": (["old", "work/dev"], "JBSWY3DPEHPK3PXP", [(1, "first")])},
+                                      ["old", "work/dev"])
+    # Changes made only to the extras are versioned and travel too.
+    [(entry,)] = b.conn.execute("SELECT id FROM passwords").fetchall()
+    PasswordStore(b).remove_totp(entry)
+    TagStore(b).delete_tag(OWNER, "old")
+    PasswordStore(b).update_password(entry, "alice", "third")
+    sync_until_quiet([a, b], share)
+    assert extras(a) == extras(b) == ({"github": (["work/dev"], None, [(2, "second"), (1, "first")])}, ["work/dev"])
+
+def test_vaults_holding_the_same_entry_do_not_duplicate_it(open_vault, share):
+    # Two vaults restored from the same export: every entry is already on both sides.
+    a, b = open_vault("a.db"), open_vault("b.db")
+    for db in (a, b):
+        UserStore(db).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+        PasswordStore(db).add_password(OWNER, "github", "alice", "a@example.com", "same")
+    PasswordStore(b).add_password(OWNER, "gitlab", "alice", "a@example.com", "only b")
+    sync_until_quiet([a, b], share)
+    assert contents(a) == contents(b)
+    assert [row[1] for row in contents(a)] == ["github", "gitlab"]
+
+def test_copied_vault_file_takes_its_own_node_id(open_vault, share, tmp_path):
+    a = open_vault("a.db")
+    UserStore(a).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    entry = PasswordStore(a).add_password(OWNER, "github", "alice", "a@example.com", "first")
+    sync_until_quiet([a], share)
+    a.flush()
+    shutil.copy(tmp_path / "a.db", tmp_path / "copy.db")
+    copy = open_vault("copy.db")
+    PasswordStore(copy).update_password(entry, "alice", "edited in the copy")
+    PasswordStore(copy).add_password(OWNER, "gitlab", "alice", "a@example.com", "new in the copy")
+    sync_until_quiet([copy, a], share)
+    assert contents(a) == contents(copy)
+    assert [row[4] for row in contents(a)] == ["edited in the copy", "new in the copy"]
+    assert a.get_meta("sync_node") != copy.get_meta("sync_node")
@@ -0,0 +1,144 @@
+"""Sharded vaults: splitting a single file and backing up or restoring one user keep everything of theirs."""
+import sqlite3
+
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD
+from vault_core import crypto
+from vault_core.shards import ShardedVault
+from vault_core.storage import DatabaseManager, PasswordStore, UserStore, hash_password
+from vault_core.tags import TagStore
+
+OTHER = "bob"
+
+def snapshot(db, username):
+    """Everything a vault holds for one user, with encrypted values left as stored."""
+    entries = "SELECT id FROM passwords WHERE username = ?"
+    return {
+        "users": db.conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchall(),
+        "passwords": db.conn.execute("SELECT id, platform, platform_username, email, password FROM passwords "
+                                     "WHERE username = ? ORDER BY id", (username,)).fetchall(),
+        "history": db.conn.execute(f"SELECT * FROM password_history WHERE entry_id IN ({entries}) "
+                                   "ORDER BY entry_id, version", (username,)).fetchall(),
+        "tags": db.conn.execute("SELECT name, entries FROM tags WHERE username = ? ORDER BY name",
+                                (username,)).fetchall(),
+        "entry_tags": db.conn.execute(f"SELECT e.entry_id, t.name FROM entry_tags e JOIN tags t ON t.id = e.tag_id "
+                                      f"WHERE e.entry_id IN ({entries}) ORDER BY 1, 2", (username,)).fetchall(),
+        "totp": db.conn.execute(f"SELECT * FROM totp_secrets WHERE entry_id IN ({entries})", (username,)).fetchall(),
+    }
+
+@pytest.fixture
+def single_file(vault):
+    """The vault file with two users, each with history, tags and a 2FA seed."""
+    UserStore(vault).signup(OTHER, "Another-Pass-9", "pet?", "tom")
+    store, tags = PasswordStore(vault), TagStore(vault)
+    for owner in (OWNER, OTHER):
+        entry = store.add_password(owner, "github", owner, "", "p0")
+        store.add_password(owner, "bank", owner, "", "b0")
+        store.update_password(entry, owner, "p1")
+        tags.add_tag(owner, [entry], "work/dev")
+        store.set_totp(entry, "JBSWY3DPEHPK3PXP")
+    vault.flush()
+    return vault
+
+@pytest.mark.parametrize("buckets", [None, 1, 4])
+def test_split_keeps_every_users_data(single_file, tmp_path, buckets):
+    sharded = ShardedVault(str(tmp_path / "shards"), buckets=buckets)
+    try:
+        assert sharded.split(single_file.path) == 2
+        for username in (OWNER, OTHER):
+            shard = sharded.open_user(username)
+            assert snapshot(shard, username) == snapshot(single_file, username)
+            assert all(snapshot(shard, username).values())
+            if buckets is None:
+                assert shard.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 1
+    finally:
+        sharded.close()
+
+@pytest.mark.parametrize("buckets", [None, 4])
+def test_split_migrates_an_old_vault_first(workdir, tmp_path, buckets):
+    # The schema vaults had before migrations: no meta table, no timestamps, history or tags.
+    old = str(tmp_path / "old.db")
+    conn = sqlite3.connect(old)
+    conn.execute("CREATE TABLE users (username TEXT PRIMARY KEY, password TEXT NOT NULL, "
+                 "security_question TEXT NOT NULL, security_answer TEXT NOT NULL)")
+    conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, "
+                 "platform TEXT NOT NULL, platform_username TEXT NOT NULL, email TEXT NOT NULL, "
+                 "password TEXT NOT NULL, FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE)")
+    for owner in (OWNER, OTHER):
+        conn.execute("INSERT INTO users VALUES (?, ?, ?, ?)", (owner, hash_password(OWNER_PASSWORD),
+                     crypto.encrypt_data("pet?"), crypto.encrypt_data("rex")))
+        conn.execute("INSERT INTO passwords (username, platform, platform_username, email, password) "
+                     "VALUES (?, 'github', ?, '', ?)", (owner, owner, crypto.encrypt_data(f"{owner}-pw")))
+    conn.commit()
+    conn.close()
+    sharded = ShardedVault(str(tmp_path / "shards"), buckets=buckets)
+    try:
+        assert sharded.split(old) == 2
+        for owner in (OWNER, OTHER):
+            shard = sharded.open_user(owner)
+            assert UserStore(shard).login(owner, OWNER_PASSWORD)
+            [(_, name, _, password)] = PasswordStore(shard).get_passwords(owner, "github")
+            assert (name, password) == (owner, f"{owner}-pw")
+            assert shard.conn.execute("SELECT created_at FROM passwords WHERE username = ?",
+                                      (owner,)).fetchone()[0] is not None
+    finally:
+        sharded.close()
+
+@pytest.mark.parametrize("buckets", [None, 1])
+def test_restore_user_replaces_only_that_user(single_file, tmp_path, buckets):
+    sharded = ShardedVault(str(tmp_path / "shards"), buckets=buckets)
+    try:
+        sharded.split(single_file.path)
+        backup = str(tmp_path / "alice.db")
+        sharded.backup_user(OWNER, backup)
+        before = {username: snapshot(sharded.open_user(username), username) for username in (OWNER, OTHER)}
+        shard = sharded.open_user(OWNER)
+        entry = before[OWNER]["passwords"][0][0]
+        PasswordStore(shard).update_password(entry, OWNER, "p2")
+        TagStore(shard).delete_tag(OWNER, "work/dev")
+        PasswordStore(shard).remove_totp(entry)
+        sharded.restore_user(OWNER, backup)
+        for username in (OWNER, OTHER):
+            assert snapshot(sharded.open_user(username), username) == before[username]
+    finally:
+        sharded.close()
+
+def test_restore_user_rejects_a_file_without_the_user(single_file, tmp_path):
+    sharded = ShardedVault(str(tmp_path / "shards"))
+    try:
+        sharded.split(single_file.path)
+        with pytest.raises(ValueError):
+            sharded.restore_user("carol", single_file.path)
+    finally:
+        sharded.close()
+
+def test_restore_into_a_bucket_rekeys_clashing_ids(single_file, tmp_path):
+    # A file from another vault: its entry and tag ids are ones the bucket's other users already have.
+    other = DatabaseManager(str(tmp_path / "carol.db"))
+    UserStore(other).signup("carol", "Third-Pass-7", "pet?", "kit")
+    store, tags = PasswordStore(other), TagStore(other)
+    entry = store.add_password("carol", "github", "carol", "", "c0")
+    store.update_password(entry, "carol", "c1")
+    tags.add_tag("carol", [entry], "home")
+    store.set_totp(entry, "JBSWY3DPEHPK3PXP")
+    other.close()
+    opened = []
+    sharded = ShardedVault(str(tmp_path / "shards"), buckets=1, on_open=opened.append)
+    try:
+        sharded.split(single_file.path)
+        before = {username: snapshot(sharded.open_user(username), username) for username in (OWNER, OTHER)}
+        assert entry in [row[0] for row in before[OWNER]["passwords"]]
+        sharded.restore_user("carol", str(tmp_path / "carol.db"))
+        shard = sharded.open_user("carol")
+        assert opened == [shard]  # one bucket, opened once
+        for username in (OWNER, OTHER):
+            assert snapshot(shard, username) == before[username]
+        carol = snapshot(shard, "carol")
+        [(new_id, *_)] = carol["passwords"]
+        assert new_id not in [row[0] for rows in before.values() for row in rows["passwords"]]
+        assert [row[1] for row in carol["history"]] == [1] and carol["entry_tags"] == [(new_id, "home")]
+        assert carol["tags"] == [("home", 1)] and carol["totp"][0][0] == new_id
+        assert PasswordStore(shard).get_passwords("carol", "github")[0][3] == "c1"
+    finally:
+        sharded.close()
@@ -0,0 +1,58 @@
+"""Two-way sync between several vault files (vault_core.replication)."""
+import pytest
+
+from conftest import OWNER, OWNER_PASSWORD, ciphertext_pool, platform_name
+from vault_core import crypto
+from vault_core.replication import DirectoryTransport, FirestoreTransport, sync_vault
+from vault_core.storage import DatabaseManager, PasswordStore, UserStore
+
+pytest.importorskip("pytest_benchmark")
+
+NODES = 3
+EDITS = 10
+
+def contents(db):
+    return sorted(db.conn.execute("SELECT username, platform, platform_username, email, password FROM passwords"))
+
+@pytest.fixture
+def vaults(workdir, tmp_path, vault_size):
+    """Three vault files; the first holds ``vault_size`` entries, the others start empty."""
+    dbs = [DatabaseManager(str(tmp_path / f"node{i}.db")) for i in range(NODES)]
+    pool = ciphertext_pool(crypto.encrypt_data)
+    UserStore(dbs[0]).signup(OWNER, OWNER_PASSWORD, "pet?", "rex")
+    with dbs[0].transaction():
+        dbs[0].conn.executemany(
+            "INSERT INTO passwords (username, platform, platform_username, email, password) VALUES (?, ?, ?, ?, ?)",
+            ((OWNER, platform_name(i), f"user{i}", f"user{i}@example.com", pool[i % len(pool)])
+             for i in range(vault_size)))
+    yield dbs
+    for db in dbs:
+        db.close()
+
+def sync_all(dbs, transport):
+    return [sync_vault(db, transport()) for db in dbs]
+
+def test_sync_incremental(benchmark, vaults, tmp_path):
+    # After the initial exchange, a sync moves only the edited rows.
+    share = str(tmp_path / "share")
+    sync_all(vaults, lambda: DirectoryTransport(share))
+    initial = sum(r["bytes_received"] for r in sync_all(vaults, lambda: DirectoryTransport(share)))
+    store = PasswordStore(vaults[1])
+    ids = [row[0] for row in vaults[1].conn.execute("SELECT id FROM passwords LIMIT ?", (EDITS,))]
+
+    def edit():
+        for entry_id in ids:
+            store.update_password(entry_id, "edited", "N3w-Pa55word!")
+        return (), {}
+    # The editing node pushes first, then the others pull.
+    order = [vaults[1], vaults[0], vaults[2]]
+    reports = benchmark.pedantic(lambda: sync_all(order, lambda: DirectoryTransport(share)), setup=edit,
+                                 rounds=3, iterations=1)
+    assert reports[0]["pushed"] == EDITS and reports[1]["applied"] == EDITS
+    assert contents(vaults[0]) == contents(vaults[1]) == contents(vaults[2])
+    assert initial < 1000 * NODES  # idle syncs only list the share
+
+def test_sync_firestore(vaults, fake_firestore):
+    reports = sync_all(vaults, FirestoreTransport) + sync_all(vaults, FirestoreTransport)
+    assert contents(vaults[0]) == contents(vaults[1]) == contents(vaults[2])
+    assert all(r["round_trips"] >= 1 for r in reports)
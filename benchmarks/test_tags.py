@@ -0,0 +1,73 @@
+"""Tag filters: AND across terms, OR within one, and folders matching everything below them."""
+import pytest
+
+from conftest import OWNER
+from vault_core.storage import PasswordStore, UserStore
+from vault_core.tags import TagStore, normalize_tag, parse_tag_filter
+
+@pytest.fixture
+def tagged(vault):
+    """The TagStore and {platform: id} of four entries tagged work, work/clients/acme, 2fa, otp and workshop."""
+    store = PasswordStore(vault)
+    ids = {name: store.add_password(OWNER, name, "alice", "", "pw") for name in ("github", "gitlab", "bank", "mail")}
+    tags = TagStore(vault)
+    tags.add_tag(OWNER, [ids["github"], ids["gitlab"]], "work")
+    tags.add_tag(OWNER, [ids["github"]], "work/clients/acme")
+    tags.add_tag(OWNER, [ids["github"], ids["bank"]], "2fa")
+    tags.add_tag(OWNER, [ids["mail"]], "otp")
+    tags.add_tag(OWNER, [ids["mail"]], "workshop")
+    return tags, ids
+
+def platforms(rows):
+    return [row[1] for row in rows]
+
+def test_parse_tag_filter():
+    assert parse_tag_filter(" Work  2FA|otp | ") == [["work"], ["2fa", "otp"]]
+    assert normalize_tag(" Work / Clients //Big Co ") == "work/clients/big-co"
+    with pytest.raises(ValueError):
+        normalize_tag(" / ")
+
+@pytest.mark.parametrize("expression, expected", [
+    ("work", ["github", "gitlab"]),
+    ("work 2fa", ["github"]),
+    ("2fa|otp", ["bank", "github", "mail"]),
+    ("work 2fa|otp", ["github"]),
+    ("work/clients", ["github"]),
+    ("work/clients/acme 2fa", ["github"]),
+    ("workshop", ["mail"]),
+    ("work otp", []),
+    ("missing", []),
+    ("", []),
+])
+def test_filter(tagged, expression, expected):
+    tags, _ = tagged
+    assert platforms(tags.filter(OWNER, expression)) == expected
+
+def test_folder_does_not_match_a_longer_name(tagged):
+    # 'work' finds 'work/...' but not 'workshop'.
+    tags, ids = tagged
+    assert ids["mail"] not in [row[0] for row in tags.filter(OWNER, "work")]
+
+def test_filter_follows_tag_changes(tagged):
+    tags, ids = tagged
+    assert platforms(tags.filter(OWNER, "2fa")) == ["bank", "github"]
+    tags.remove_tag(OWNER, [ids["bank"]], "2fa")
+    assert platforms(tags.filter(OWNER, "2fa")) == ["github"]
+    tags.add_tag(OWNER, [ids["gitlab"]], "2FA")
+    assert platforms(tags.filter(OWNER, "2fa")) == ["github", "gitlab"]
+    assert tags.delete_tag(OWNER, "work")
+    assert platforms(tags.filter(OWNER, "work")) == ["github"]  # still in the work/clients/acme folder
+
+def test_entry_counts(tagged, vault):
+    tags, ids = tagged
+    assert dict(tags.tags(OWNER))["work"] == 2
+    PasswordStore(vault).delete_password(ids["gitlab"])
+    assert dict(tags.tags(OWNER))["work"] == 1
+    assert tags.entry_tags(ids["github"]) == ["2fa", "work", "work/clients/acme"]
+
+def test_other_owners_entries_are_not_tagged(tagged, vault):
+    tags, _ = tagged
+    UserStore(vault).signup("bob", "Another-Pass-9", "pet?", "tom")
+    bobs = PasswordStore(vault).add_password("bob", "github", "bob", "", "pw")
+    assert tags.add_tag(OWNER, [bobs], "work") == 0
+    assert tags.filter("bob", "work") == []
@@ -0,0 +1,63 @@
+"""2FA codes against the RFC 6238 test vectors, and seeds as sites show them."""
+import base64
+
+import pytest
+
+from conftest import OWNER
+from vault_core.storage import PasswordStore
+from vault_core.totp import CodeBoard, parse_secret, totp
+
+# RFC 6238 appendix B: the seed is this ASCII text repeated to the hash's output size.
+SEEDS = {
+    "SHA1": b"12345678901234567890",
+    "SHA256": b"12345678901234567890123456789012",
+    "SHA512": b"1234567890123456789012345678901234567890123456789012345678901234",
+}
+VECTORS = [
+    (59, "94287082", "46119246", "90693936"),
+    (1111111109, "07081804", "68084774", "25091201"),
+    (1111111111, "14050471", "67062674", "99943326"),
+    (1234567890, "89005924", "91819424", "93441116"),
+    (2000000000, "69279037", "90698825", "38618901"),
+    (20000000000, "65353130", "77737706", "47863826"),
+]
+
+def base32(seed):
+    return base64.b32encode(seed).decode().rstrip("=")
+
+@pytest.mark.parametrize("at, sha1, sha256, sha512", VECTORS)
+def test_rfc6238_vectors(at, sha1, sha256, sha512):
+    for algorithm, expected in (("SHA1", sha1), ("SHA256", sha256), ("SHA512", sha512)):
+        assert totp(base32(SEEDS[algorithm]), at, digits=8, algorithm=algorithm) == expected
+
+def test_six_digit_code_is_the_tail_of_the_eight_digit_one():
+    assert totp(base32(SEEDS["SHA1"]), 59) == "287082"
+
+def test_parse_plain_seed():
+    assert parse_secret(" jbsw y3dp-ehpk 3pxp ") == ("JBSWY3DPEHPK3PXP", 6, 30, "SHA1")
+
+def test_parse_otpauth_uri():
+    uri = "otpauth://totp/Example:alice?secret=JBSWY3DPEHPK3PXP&digits=8&period=60&algorithm=sha256&issuer=Example"
+    assert parse_secret(uri) == ("JBSWY3DPEHPK3PXP", 8, 60, "SHA256")
+
+@pytest.mark.parametrize("text", [
+    "not base32!",
+    "",
+    "otpauth://hotp/Example?secret=JBSWY3DPEHPK3PXP&counter=1",
+    "otpauth://totp/Example?secret=JBSWY3DPEHPK3PXP&algorithm=MD5",
+    "otpauth://totp/Example?secret=JBSWY3DPEHPK3PXP&digits=4",
+])
+def test_parse_rejects(text):
+    with pytest.raises(ValueError):
+        parse_secret(text)
+
+def test_code_board_follows_seed_changes(vault):
+    store = PasswordStore(vault)
+    entry = store.add_password(OWNER, "github", "alice", "a@example.com", "pw")
+    store.set_totp(entry, base32(SEEDS["SHA1"]), digits=8)
+    board = CodeBoard(store)
+    assert board.codes(OWNER, at=59) == [(entry, "github", "alice", "94287082", 1)]
+    store.set_totp(entry, base32(SEEDS["SHA256"]), digits=8, algorithm="SHA256")
+    assert board.codes(OWNER, at=59)[0][3] == "46119246"
+    store.remove_totp(entry)
+    assert board.codes(OWNER, at=59) == []
@@ -0,0 +1,6 @@
+"""
+Shared building blocks for the Secure Password Manager frontends.
+
+Modules are imported individually (``from vault_core import generator``) so
+that starting either frontend only pays for the subsystems it actually uses.
+"""
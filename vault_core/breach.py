@@ -0,0 +1,249 @@
+"""
+Offline check of passwords against a local Have I Been Pwned (HIBP) dump.
+
+``build_index`` converts a Pwned Passwords SHA-1 dump into a compact binary
+index, and ``BreachIndex`` memory-maps that index to answer lookups without
+reading it into RAM. Nothing is ever sent over the network.
+
+Accepted dump formats:
+  - one file with ``SHA1HEX:COUNT`` lines (``pwned-passwords-sha1-*.txt``), sorted or not
+  - a directory of k-anonymity range files as written by the official
+    downloader: files named by the 5-hex-digit prefix holding ``SUFFIX:COUNT`` lines
+
+Index layout (all integers big-endian):
+  header   magic ``PMBI``, version (u16), reserved (u16), record count (u64)
+  offsets  2**20 + 1 u64 record offsets, one bucket per 5-hex-digit (20-bit) prefix
+  records  per bucket, sorted: the next 64 bits of the hash (8 bytes) + count (u32)
+
+Storing 64 bits after the 20-bit bucket prefix gives each record 12 bytes; the
+chance of a false match is about (bucket size / 2**64), i.e. negligible.
+
+    python -m vault_core.breach build pwned-passwords-sha1-ordered-by-hash-v8.txt breach_index.bin
+    python -m vault_core.breach check breach_index.bin
+"""
+import argparse
+import getpass
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+INDEX_FILE = "breach_index.bin"
+
+MAGIC = b"PMBI"
+VERSION = 1
+HEADER = struct.Struct(">4sHHQ")
+PREFIX_BITS = 20
+BUCKETS = 1 << PREFIX_BITS
+OFFSET = struct.Struct(">Q")
+RECORD = struct.Struct(">8sI")
+# Records in temporary sort runs carry their bucket so plain byte order is hash order.
+RUN_RECORD = struct.Struct(">I8sI")
+MAX_COUNT = 0xFFFFFFFF
+
+# -----------------------------
+# Building
+# -----------------------------
+def split_hash(digest):
+    """Splits a 20-byte SHA-1 digest into (20-bit bucket, following 8 bytes)."""
+    head = int.from_bytes(digest[:3], "big")
+    bucket = head >> 4
+    tail = (int.from_bytes(digest[2:11], "big") >> 4) & 0xFFFFFFFFFFFFFFFF
+    return bucket, tail.to_bytes(8, "big")
+
+def iter_dump(path):
+    """Yields (sha1 digest, count) from a dump file or a directory of range files."""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            prefix = os.path.splitext(name)[0].upper()
+            if len(prefix) != 5:
+                continue
+            with open(os.path.join(path, name), encoding="ascii") as f:
+                for line in f:
+                    suffix, _, count = line.strip().partition(":")
+                    if suffix:
+                        yield bytes.fromhex(prefix + suffix), int(count or 1)
+    else:
+        with open(path, encoding="ascii") as f:
+            for line in f:
+                digest, _, count = line.strip().partition(":")
+                if digest:
+                    yield bytes.fromhex(digest), int(count or 1)
+
+def _write_run(records, directory):
+    records.sort()
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"".join(records))
+    return path
+
+def _read_run(path, chunk=RUN_RECORD.size * 65536):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk)
+            if not block:
+                return
+            for i in range(0, len(block), RUN_RECORD.size):
+                yield block[i:i + RUN_RECORD.size]
+
+def build_index(dump_path, index_path=INDEX_FILE, run_records=1_000_000, progress=None):
+    """
+    Builds the binary index from a dump with an external merge sort, so memory
+    use is bounded by ``run_records`` whatever the size of the dump.
+    Returns the number of distinct hashes written.
+    """
+    work_dir = os.path.dirname(os.path.abspath(index_path))
+    runs, records = [], []
+    try:
+        for seen, (digest, count) in enumerate(iter_dump(dump_path), 1):
+            bucket, tail = split_hash(digest)
+            records.append(RUN_RECORD.pack(bucket, tail, min(count, MAX_COUNT)))
+            if len(records) >= run_records:
+                runs.append(_write_run(records, work_dir))
+                records = []
+                if progress:
+                    progress(seen)
+        if records:
+            runs.append(_write_run(records, work_dir))
+        records = None
+
+        offsets = [0] * (BUCKETS + 1)
+        written = 0
+        with open(index_path, "wb") as out:
+            out.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+            table_at = out.tell()
+            out.write(b"\0" * OFFSET.size * (BUCKETS + 1))
+            buffer = []
+
+            def emit(key, count):
+                nonlocal written, buffer
+                offsets[int.from_bytes(key[:4], "big") + 1] += 1
+                buffer.append(key[4:] + min(count, MAX_COUNT).to_bytes(4, "big"))
+                written += 1
+                if len(buffer) >= 65536:
+                    out.write(b"".join(buffer))
+                    buffer = []
+
+            current, total = None, 0
+            for raw in heapq.merge(*(_read_run(p) for p in runs)):
+                key, count = raw[:12], int.from_bytes(raw[12:], "big")
+                if key == current:
+                    # The same hash listed twice in the dump: add the counts together.
+                    total += count
+                    continue
+                if current is not None:
+                    emit(current, total)
+                current, total = key, count
+            if current is not None:
+                emit(current, total)
+            out.write(b"".join(buffer))
+
+            for bucket in range(BUCKETS):
+                offsets[bucket + 1] += offsets[bucket]
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, VERSION, 0, written))
+            out.seek(table_at)
+            out.write(b"".join(OFFSET.pack(o) for o in offsets))
+        return written
+    finally:
+        for path in runs:
+            os.remove(path)
+
+# -----------------------------
+# Lookup
+# -----------------------------
+class BreachIndex:
+    """A memory-mapped breach index. Lookups are a bucket jump plus a binary search."""
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a breach index (version {VERSION}).")
+        self._records_at = HEADER.size + OFFSET.size * (BUCKETS + 1)
+
+    def _bucket(self, bucket):
+        at = HEADER.size + OFFSET.size * bucket
+        lo, hi = struct.unpack_from(">QQ", self._map, at)
+        return lo, hi
+
+    def lookup_digest(self, digest):
+        """Returns how often a SHA-1 digest occurs in the breach corpus (0 if absent)."""
+        bucket, tail = split_hash(digest)
+        lo, hi = self._bucket(bucket)
+        base, size, data = self._records_at, RECORD.size, self._map
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = base + mid * size
+            probe = data[at:at + 8]
+            if probe < tail:
+                lo = mid + 1
+            elif probe > tail:
+                hi = mid
+            else:
+                return RECORD.unpack_from(data, at)[1]
+        return 0
+
+    def lookup(self, password):
+        """Returns how often ``password`` occurs in the breach corpus (0 if absent)."""
+        return self.lookup_digest(hashlib.sha1(password.encode("utf-8")).digest())
+
+    def range(self, prefix):
+        """
+        Returns [(hash tail hex, count)] for a 5-hex-digit prefix, the same
+        k-anonymity query the online HIBP range API answers. Only the first 16
+        of the 35 suffix digits are stored, so tails are 16 hex digits long.
+        """
+        lo, hi = self._bucket(int(prefix, 16))
+        at = self._records_at + lo * RECORD.size
+        return [(tail.hex().upper(), count) for tail, count in
+                RECORD.iter_unpack(self._map[at:self._records_at + hi * RECORD.size])]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_index(path=INDEX_FILE):
+    """Opens the breach index if it exists; returns None when no index has been built."""
+    if not os.path.exists(path):
+        return None
+    return BreachIndex(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query an offline breached-password index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build an index from an HIBP SHA-1 dump.")
+    build.add_argument("dump", help="HASH:COUNT file or directory of range files.")
+    build.add_argument("index", nargs="?", default=INDEX_FILE)
+    check = sub.add_parser("check", help="Check passwords typed at the prompt.")
+    check.add_argument("index", nargs="?", default=INDEX_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_index(args.dump, args.index, progress=lambda n: print(f"{n:,} hashes read", flush=True))
+        print(f"Wrote {count:,} hashes to {args.index}")
+        return
+    with BreachIndex(args.index) as index:
+        while True:
+            try:
+                password = getpass.getpass("Password (empty to quit): ")
+            except EOFError:
+                return
+            if not password:
+                return
+            hits = index.lookup(password)
+            print(f"Found {hits:,} times in breaches." if hits else "Not found in breaches.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Change data capture: a sequenced log of every insert, update and delete on
+accounts and saved passwords, so consumers (incremental backups, a search
+index, an audit trail) can process only what changed since they last looked.
+
+Triggers on ``users`` and ``passwords`` append one row per change to
+``change_log``; a change to an entry's tags or 2FA seed is logged as an update
+of the entry, and a change to an owner's tags as an update of the account.
+Sequence numbers only ever increase (AUTOINCREMENT), even after compaction. A
+change carries the key of the row, not its contents; consumers read the
+current row, and a delete means the row is gone.
+
+Each consumer is registered by name and starts at the current end of the log.
+It reads with a cursor, then acknowledges the last change it has processed.
+Changes every consumer has acknowledged are deleted. While no consumer is
+registered nothing is logged, so a vault without consumers pays nothing.
+
+    log = ChangeLog(db)
+    log.register("search-index")
+    for seq, table, op, username, entry_id, changed_at in log.read("search-index"):
+        ...
+    log.ack("search-index", seq)
+
+    python -m vault_core.changes database.db status
+    python -m vault_core.changes database.db read audit --limit 20
+"""
+import argparse
+import time
+
+from vault_core.storage import DB_FILE, DatabaseManager
+
+READ_BATCH = 500
+
+class ChangeLog:
+    def __init__(self, db):
+        self.db = db
+
+    def head(self):
+        """The sequence number of the newest change (0 if nothing was ever logged)."""
+        row = self.db.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        return row[0] if row else 0
+
+    # -- Consumers --
+    def register(self, consumer):
+        """Starts logging for a consumer, from the current end of the log. Registering twice is harmless."""
+        self.db.conn.execute("INSERT OR IGNORE INTO change_consumers (name, acked_seq) VALUES (?, ?)",
+                             (consumer, self.head()))
+        self.db.commit()
+
+    def unregister(self, consumer):
+        self.db.conn.execute("DELETE FROM change_consumers WHERE name = ?", (consumer,))
+        self.compact()
+
+    def consumers(self):
+        """(name, acknowledged sequence number, changes pending) for every consumer."""
+        return self.db.conn.execute('''
+            SELECT name, acked_seq, (SELECT COUNT(*) FROM change_log WHERE seq > acked_seq)
+            FROM change_consumers ORDER BY name
+        ''').fetchall()
+
+    def _acked(self, consumer):
+        row = self.db.conn.execute("SELECT acked_seq FROM change_consumers WHERE name = ?", (consumer,)).fetchone()
+        if row is None:
+            raise KeyError(consumer)
+        return row[0]
+
+    # -- Reading --
+    def read(self, consumer, after=None, limit=READ_BATCH):
+        """
+        Up to ``limit`` changes after ``after`` (default: the consumer's last
+        acknowledgement), oldest first, as (seq, table, op, username, entry_id,
+        changed_at). Pass the last seq back as ``after`` to page on without acknowledging.
+        """
+        if after is None:
+            after = self._acked(consumer)
+        return self.db.conn.execute('''
+            SELECT seq, table_name, op, username, entry_id, changed_at FROM change_log
+            WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (after, limit)).fetchall()
+
+    def iter_changes(self, consumer, batch_size=READ_BATCH):
+        """Yields every unacknowledged change, reading the log a batch at a time."""
+        after = self._acked(consumer)
+        while True:
+            batch = self.read(consumer, after, batch_size)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1][0]
+
+    def ack(self, consumer, seq):
+        """Marks every change up to ``seq`` as processed by the consumer, then compacts the log."""
+        cur = self.db.conn.execute("UPDATE change_consumers SET acked_seq = MAX(acked_seq, ?) WHERE name = ?",
+                                   (seq, consumer))
+        if cur.rowcount == 0:
+            raise KeyError(consumer)
+        self.compact()
+
+    def compact(self):
+        """Deletes the changes every consumer has acknowledged (all of them when none is left). Returns the count."""
+        cur = self.db.conn.execute('''
+            DELETE FROM change_log
+            WHERE seq <= COALESCE((SELECT MIN(acked_seq) FROM change_consumers), (SELECT MAX(seq) FROM change_log))
+        ''')
+        self.db.commit()
+        return cur.rowcount
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and consume the vault's change log.")
+    parser.add_argument("db_file", nargs="?", default=DB_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Show the newest sequence number and every consumer's position.")
+    for name, text in (("register", "Start logging changes for a consumer."),
+                       ("unregister", "Stop logging changes for a consumer."),
+                       ("read", "Print a consumer's unacknowledged changes."),
+                       ("ack", "Acknowledge a consumer's changes up to a sequence number.")):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument("consumer")
+        if name == "read":
+            cmd.add_argument("--limit", type=int, default=READ_BATCH)
+        if name == "ack":
+            cmd.add_argument("seq", type=int)
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db_file)
+    log = ChangeLog(db)
+    try:
+        if args.command == "status":
+            print(f"Head: {log.head()}")
+            for name, acked, pending in log.consumers():
+                print(f"{name:<20} acked {acked:<10} pending {pending}")
+        elif args.command == "register":
+            log.register(args.consumer)
+        elif args.command == "unregister":
+            log.unregister(args.consumer)
+        elif args.command == "read":
+            for seq, table, op, username, entry_id, changed_at in log.read(args.consumer, limit=args.limit):
+                when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(changed_at))
+                entry = "" if entry_id is None else f" #{entry_id}"
+                print(f"{seq:>8}  {when}  {op:<6} {table}{entry} ({username})")
+        else:
+            log.ack(args.consumer, args.seq)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Encryption of stored secrets.
+
+Two storage formats are supported and always readable:
+  "fernet" - base64url Fernet tokens, stored as text (the original format)
+  "binary" - raw AES-GCM ciphertext behind a compact header, stored as BLOBs:
+             version (1 byte) | timestamp (8 bytes) | nonce (12 bytes) | ciphertext + tag
+
+New values are written in the format passed as ``storage_format=``: callers
+pass their vault's ``DatabaseManager.storage_format``, read from its meta table
+when the vault is opened, so vaults in different formats can be open at once.
+The key is read from ``secret.key`` on first use, not at import time.
+"""
+import base64
+import os
+import struct
+import time
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from vault_core.instrumentation import stats, timed
+
+KEY_FILE = "secret.key"
+STORAGE_FORMATS = ("fernet", "binary")
+# Each vault records the format it writes in (DatabaseManager.storage_format); this is for vaults that never chose one.
+DEFAULT_STORAGE_FORMAT = "fernet"
+
+BINARY_VERSION = 0x01
+BINARY_HEADER = struct.Struct(">BQ12s")
+
+_key = None
+_fernet = None
+_blob_cipher = None
+
+def load_key(path=KEY_FILE):
+    """
+    Loads the secret key from 'secret.key'.
+    If the file does not exist, it generates a new key and saves it.
+    """
+    if os.path.exists(path):
+        with open(path, "rb") as key_file:
+            return key_file.read()
+    key = Fernet.generate_key()
+    with open(path, "wb") as key_file:
+        key_file.write(key)
+    return key
+
+def derive_blob_key(key):
+    """Derives the AES-256-GCM key for binary blobs from the Fernet key, so both formats share 'secret.key'."""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                info=b"passwords-manager binary blob v1").derive(base64.urlsafe_b64decode(key))
+
+def use_key(key):
+    """Installs the key used for all later encryption and decryption."""
+    global _key, _fernet, _blob_cipher
+    _key = key
+    _fernet = Fernet(key)
+    _blob_cipher = AESGCM(derive_blob_key(key))
+
+def _ciphers():
+    if _fernet is None:
+        use_key(load_key())
+    return _fernet, _blob_cipher
+
+def active_key():
+    """The key in use (loaded on first use), e.g. for worker processes that encrypt in parallel."""
+    _ciphers()
+    return _key
+
+def check_storage_format(fmt):
+    """Returns fmt, or raises ValueError if it is not one of STORAGE_FORMATS."""
+    if fmt not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format: {fmt}")
+    return fmt
+
+def storage_format_of(data):
+    """Returns which storage format an encrypted value was written in."""
+    if isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:1]) == bytes([BINARY_VERSION]):
+        return "binary"
+    return "fernet"
+
+def encryption_timestamp(data):
+    """Returns the UNIX time an encrypted value was created, for either storage format."""
+    if storage_format_of(data) == "binary":
+        return BINARY_HEADER.unpack_from(bytes(data))[1]
+    fernet, _ = _ciphers()
+    return fernet.extract_timestamp(data.encode() if isinstance(data, str) else bytes(data))
+
+@timed("crypto.encrypt")
+def encrypt_data(data, timestamp=None, storage_format=DEFAULT_STORAGE_FORMAT):
+    """
+    Encrypts a string in the given storage format (normally the vault's, db.storage_format).
+    Returns a Fernet token (str) for "fernet" or a bytes blob for "binary".
+    """
+    fernet, blob_cipher = _ciphers()
+    plaintext = data.encode()
+    stats.increment("crypto.bytes_encrypted", len(plaintext))
+    if storage_format == "binary":
+        header = BINARY_HEADER.pack(BINARY_VERSION, int(time.time() if timestamp is None else timestamp),
+                                    os.urandom(12))
+        return header + blob_cipher.encrypt(header[-12:], plaintext, header)
+    if timestamp is None:
+        return fernet.encrypt(plaintext).decode()
+    return fernet.encrypt_at_time(plaintext, int(timestamp)).decode()
+
+@timed("crypto.decrypt")
+def decrypt_data(data):
+    """Decrypts a value in either storage format and returns the original string."""
+    fernet, blob_cipher = _ciphers()
+    if storage_format_of(data) == "binary":
+        data = bytes(data)
+        header = data[:BINARY_HEADER.size]
+        plaintext = blob_cipher.decrypt(header[-12:], data[BINARY_HEADER.size:], header)
+    else:
+        plaintext = fernet.decrypt(data.encode() if isinstance(data, str) else bytes(data))
+    stats.increment("crypto.bytes_decrypted", len(plaintext))
+    return plaintext.decode()
+
+def reencrypt_data(data, storage_format):
+    """Re-encrypts a stored value into the given storage format, keeping its original timestamp."""
+    return encrypt_data(decrypt_data(data), encryption_timestamp(data), storage_format)
+
+# -----------------------------
+# Text encoding for CSV
+# -----------------------------
+def text_encode(value):
+    """Binary blobs become 'b64:'-prefixed text; Fernet tokens are already text."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        if storage_format_of(value) == "binary":
+            return "b64:" + base64.b64encode(value).decode()
+        return value.decode()
+    return value
+
+def text_decode(value):
+    """Reverses text_encode."""
+    if value.startswith("b64:"):
+        return base64.b64decode(value[4:])
+    return value
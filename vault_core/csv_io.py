@@ -0,0 +1,125 @@
+"""
+CSV export and import of a whole vault.
+
+Two files are written: one for accounts and one for saved passwords. An
+account's tags and an entry's tags, 2FA seed and earlier passwords go in its
+row as JSON lists. Encrypted columns stay encrypted; binary-format blobs are
+written as 'b64:' text (see crypto.text_encode). Files exported by older GUI
+versions, which used their own column names, are accepted on import; an import
+of a file without some of these columns keeps what they would hold for the
+accounts and entries it leaves in place.
+"""
+import binascii
+import csv
+import json
+
+from vault_core import crypto, merge
+from vault_core.instrumentation import timed
+from vault_core.storage import VAULT_EXTRAS, StagingError, replace_vault, vault_extras
+
+USERS_CSV = "export_users.csv"
+PASSWORDS_CSV = "export_passwords.csv"
+
+USER_COLUMNS = ["username", "password_hash", "security_question_encrypted", "security_answer_encrypted", "tags"]
+PASSWORD_COLUMNS = ["id", "username", "platform", "platform_username", "email", "password_encrypted", "tags",
+                    "totp", "history"]
+
+# The file and column each of storage.VAULT_EXTRAS travels in. A cell lists the rows of its account or
+# entry without the column naming it; a row left with one value is written as that value.
+EXTRA_COLUMNS = {
+    "password_history": ("passwords", "history"),
+    "totp_secrets": ("passwords", "totp"),
+    "tags": ("users", "tags"),
+    "entry_tags": ("passwords", "tags"),
+}
+
+# Column names written by older GUI exports.
+LEGACY_COLUMNS = {
+    "security_q": "security_question_encrypted",
+    "security_a": "security_answer_encrypted",
+    "owner": "username",
+    "platform_user": "platform_username",
+    "pwd": "password_encrypted",
+}
+
+def read_rows(path):
+    """Yields each CSV row as a dict keyed by the current column names."""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {LEGACY_COLUMNS.get(key, key): value for key, value in row.items()}
+
+def _extra_cells(db):
+    """{extra: {account or entry: cell rows}} for the VAULT_EXTRAS, as export_csv writes them."""
+    cells = {}
+    for name, rows in vault_extras(db).items():
+        extra = VAULT_EXTRAS[name]
+        column = cells[name] = {}
+        for parent, *values in rows:
+            values = [crypto.text_encode(v) if c == extra.encrypted else v for c, v in zip(extra.columns[1:], values)]
+            column.setdefault(parent, []).append(values[0] if len(values) == 1 else values)
+    return cells
+
+def _read_extras(extras, file, parent, row):
+    """Adds the VAULT_EXTRAS rows in one CSV row to ``extras``; an extra whose column is missing is left out."""
+    for name, (where, column) in EXTRA_COLUMNS.items():
+        if where != file or row.get(column) is None:
+            continue
+        extra = VAULT_EXTRAS[name]
+        rows = extras.setdefault(name, [])
+        for values in json.loads(row[column] or "[]"):
+            values = values if len(extra.columns) > 2 else [values]
+            rows.append((parent, *(crypto.text_decode(v) if c == extra.encrypted else v
+                                   for c, v in zip(extra.columns[1:], values, strict=True))))
+
+@timed("csv.export")
+def export_csv(db, users_path=USERS_CSV, passwords_path=PASSWORDS_CSV):
+    cur = db.conn.cursor()
+    cells = _extra_cells(db)
+    cur.execute("SELECT username, password, security_question, security_answer FROM users")
+    with open(users_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(USER_COLUMNS)
+        writer.writerows((u, p, crypto.text_encode(q), crypto.text_encode(a), json.dumps(cells["tags"].get(u, [])))
+                         for u, p, q, a in cur.fetchall())
+    cur.execute("SELECT id, username, platform, platform_username, email, password FROM passwords")
+    with open(passwords_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(PASSWORD_COLUMNS)
+        writer.writerows(row[:5] + (crypto.text_encode(row[5]), json.dumps(cells["entry_tags"].get(row[0], [])),
+                                    json.dumps(cells["totp_secrets"].get(row[0], [])),
+                                    json.dumps(cells["password_history"].get(row[0], [])))
+                         for row in cur.fetchall())
+
+def read_vault_csv(users_path=USERS_CSV, passwords_path=PASSWORDS_CSV):
+    """Reads both files into the (users, passwords, extras) taken by storage.stage_import."""
+    users, passwords, extras = [], [], {}
+    try:
+        for row in read_rows(users_path):
+            users.append((row["username"], row["password_hash"], crypto.text_decode(row["security_question_encrypted"]),
+                          crypto.text_decode(row["security_answer_encrypted"])))
+            _read_extras(extras, "users", row["username"], row)
+        for row in read_rows(passwords_path):
+            passwords.append((row["id"], row["username"], row["platform"], row["platform_username"], row["email"],
+                              crypto.text_decode(row["password_encrypted"])))
+            _read_extras(extras, "passwords", row["id"], row)
+    except KeyError as e:
+        raise StagingError(f"Missing CSV column {e}.") from e
+    except (csv.Error, UnicodeDecodeError, binascii.Error, ValueError, TypeError) as e:
+        raise StagingError(f"Unreadable CSV file: {e}") from e
+    return users, passwords, extras
+
+@timed("csv.import")
+def import_csv(db, users_path=USERS_CSV, passwords_path=PASSWORDS_CSV):
+    """
+    Replaces the vault's contents with the two CSV files. The files are loaded into
+    staging tables and validated first; the live data is only swapped out, in one
+    transaction, once they pass. Raises StagingError (vault unchanged) otherwise.
+    Returns the (users, passwords) counts imported.
+    """
+    return replace_vault(db, *read_vault_csv(users_path, passwords_path))
+
+@timed("csv.merge")
+def merge_csv(db, users_path=USERS_CSV, passwords_path=PASSWORDS_CSV, policy="newest"):
+    """Merges the two CSV files into the vault (see vault_core.merge). Returns the merge counts."""
+    users, passwords, extras = read_vault_csv(users_path, passwords_path)
+    return merge.merge_vault(db, users, passwords, policy=policy, extras=extras)
@@ -0,0 +1,39 @@
+"""
+Password health: strength ratings (vault_core.strength) and, when a local
+breach index has been built, breach counts (vault_core.breach).
+"""
+from vault_core import breach, crypto, strength
+from vault_core.instrumentation import timed
+
+# Built with: python -m vault_core.breach build <HIBP dump> breach_index.bin
+BREACH_INDEX_FILE = breach.INDEX_FILE
+# Passwords last set longer ago than this are reported as due for rotation.
+ROTATION_DAYS = 90
+
+def check_password_strength(password):
+    """
+    Checks the strength of the password by estimating how many guesses an attacker
+    needs, taking common passwords, dictionary words, keyboard walks, sequences,
+    repeats and years into account (see vault_core.strength).
+    Returns: A string rating: Weak, Medium, Strong, or Very Strong.
+    """
+    return strength.rating(password)
+
+@timed("health.check")
+def check_health(db, owner, index_path=BREACH_INDEX_FILE):
+    """
+    Returns (platform, StrengthResult, breach count) for every entry of the owner.
+    The breach count is None when no breach index has been built.
+    """
+    index = breach.open_index(index_path)
+    try:
+        results = []
+        for platform, encrypted in db.conn.execute("SELECT platform, password FROM passwords WHERE username = ?",
+                                                   (owner,)).fetchall():
+            password = crypto.decrypt_data(encrypted)
+            hits = index.lookup(password) if index is not None else None
+            results.append((platform, strength.estimate(password), hits))
+        return results
+    finally:
+        if index is not None:
+            index.close()
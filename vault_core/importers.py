@@ -0,0 +1,394 @@
+"""
+Imports from browser and password-manager exports into one owner's entries.
+
+Formats, recognised from the first few KB of the file (or chosen by name):
+  chrome          Chrome / Edge / Brave "Passwords.csv" (name, url, username, password)
+  firefox         Firefox "logins.csv" (url, username, password, httpRealm, ...)
+  bitwarden-csv   Bitwarden CSV export (folder, type, name, login_uri, login_username, ...)
+  bitwarden-json  Bitwarden JSON export (unencrypted)
+  keepass-xml     KeePass 2 XML export
+
+Files are read as a stream: CSV a row at a time, the JSON "folders" and "items"
+arrays an element at a time, and XML with iterparse, dropping each entry once it
+has been read. Records are encrypted in batches by worker processes while the
+next batches are parsed, and written with executemany in one transaction, so an
+import holds a few batches in memory however large the export is. Folders
+(Bitwarden folders, KeePass groups) become folder tags, and TOTP seeds are kept
+with their entry. Entries already saved (same platform and username) are
+skipped, so importing the same file twice adds nothing the second time.
+
+    imported, skipped = import_file(db, "alice", "bitwarden_export.json")
+    python -m vault_core.importers database.db alice Passwords.csv
+
+A new format is a registered Importer subclass:
+
+    @register
+    class MyManagerCsv(CsvImporter):
+        name, label = "mymanager", "My Manager CSV"
+        columns = frozenset({"site", "login", "secret"})
+
+        def record(self, row):
+            return make_record(row["site"], "", row["login"], row["secret"])
+"""
+import argparse
+import collections
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import time
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+
+from vault_core import crypto, totp
+from vault_core.instrumentation import timed
+from vault_core.storage import DB_FILE, NEXT_ENTRY_ID_SQL, DatabaseManager, StagingError
+from vault_core.tags import normalize_tag
+
+BATCH_SIZE = 1000
+HEAD_SIZE = 4096  # characters read to recognise a format
+READ_SIZE = 1 << 16  # characters read at a time from a JSON export
+
+# -----------------------------
+# Records
+# -----------------------------
+def platform_of(title, url):
+    """The platform an entry is saved under: its title, else its URL's host without 'www.'."""
+    title = (title or "").strip().lower()
+    if title:
+        return title
+    url = (url or "").strip()
+    host = urlparse(url if "//" in url else "//" + url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def make_record(title, url, username, password, folder="", otp=""):
+    """
+    One entry to import: (platform, platform_username, email, password, folder tag
+    or None, (secret, digits, period, algorithm) or None). A username that is an
+    email address is also saved as the email.
+    """
+    username = (username or "").strip()
+    try:
+        folder = normalize_tag(folder) if folder else None
+    except ValueError:
+        folder = None
+    try:
+        seed = totp.parse_secret(otp) if otp else None
+    except ValueError:  # e.g. steam:// codes: the entry is imported without its seed
+        seed = None
+    return (platform_of(title, url) or "imported", username, username if "@" in username else "",
+            password or "", folder, seed)
+
+# -----------------------------
+# Formats
+# -----------------------------
+class Importer:
+    """An export format: recognises its files from their first few KB and yields their records."""
+    name = ""
+    label = ""
+
+    def detect(self, head):
+        """True if a file starting with ``head`` (text) is in this format."""
+        return False
+
+    def records(self, path):
+        """Yields a record (see make_record) for every entry in the file."""
+        raise NotImplementedError
+
+# Tried in registration order by detect_format.
+IMPORTERS = {}
+
+def register(importer_class):
+    IMPORTERS[importer_class.name] = importer_class()
+    return importer_class
+
+class CsvImporter(Importer):
+    columns = frozenset()  # lower-case header names that identify the format
+
+    def detect(self, head):
+        header = next(csv.reader(io.StringIO(head)), [])
+        return bool(self.columns) and self.columns <= {column.strip().lower() for column in header}
+
+    def records(self, path):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                record = self.record({(key or "").strip().lower(): value or "" for key, value in row.items()})
+                if record is not None:
+                    yield record
+
+    def record(self, row):
+        """The record for a row (keys lower-cased), or None to skip it."""
+        raise NotImplementedError
+
+@register
+class ChromeCsv(CsvImporter):
+    name, label = "chrome", "Chrome / Edge CSV"
+    columns = frozenset({"name", "url", "username", "password"})
+
+    def record(self, row):
+        return make_record(row["name"], row["url"], row["username"], row["password"])
+
+@register
+class FirefoxCsv(CsvImporter):
+    name, label = "firefox", "Firefox CSV"
+    columns = frozenset({"url", "username", "password", "httprealm"})
+
+    def record(self, row):
+        return make_record("", row["url"], row["username"], row["password"])
+
+@register
+class BitwardenCsv(CsvImporter):
+    name, label = "bitwarden-csv", "Bitwarden CSV"
+    columns = frozenset({"name", "login_uri", "login_username", "login_password"})
+
+    def record(self, row):
+        if row.get("type", "login") != "login":  # notes, cards and identities have no password
+            return None
+        return make_record(row["name"], row["login_uri"], row["login_username"], row["login_password"],
+                           row.get("folder", ""), row.get("login_totp", ""))
+
+def iter_json_arrays(f, keys):
+    """
+    Yields (key, element) for every element of the arrays stored under ``keys``
+    in a JSON file, reading it in chunks: only the element being decoded is held,
+    never the whole document. Keys are found by their text ('"items": ['), which
+    in JSON cannot occur inside a string, where quotes are escaped.
+    """
+    decoder = json.JSONDecoder()
+    array_start = re.compile(r'"(%s)"\s*:\s*\[' % "|".join(re.escape(key) for key in keys))
+    separator = re.compile(r"[\s,]*")
+    buffer, pos, eof, key = "", 0, False, None
+    while True:
+        if key is None:
+            match = array_start.search(buffer, pos)
+            if match:
+                key, pos = match.group(1), match.end()
+                continue
+            if eof:
+                return
+            pos = max(pos, len(buffer) - 64)  # a key may be split across two chunks
+        else:
+            pos = separator.match(buffer, pos).end()
+            if pos < len(buffer):
+                if buffer[pos] == "]":
+                    key, pos = None, pos + 1
+                    continue
+                try:
+                    element, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise StagingError(f"Invalid JSON in the '{key}' list: {e.msg}.") from e
+                else:
+                    yield key, element
+                    continue
+            elif eof:
+                raise StagingError(f"The '{key}' list in the JSON file is not closed.")
+        chunk = f.read(READ_SIZE)
+        buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+
+@register
+class BitwardenJson(Importer):
+    name, label = "bitwarden-json", "Bitwarden JSON"
+
+    def detect(self, head):
+        return head.lstrip().startswith("{") and ('"encrypted"' in head or '"items"' in head)
+
+    def records(self, path):
+        folders = {}
+        with open(path, encoding="utf-8-sig") as f:
+            if re.search(r'"encrypted"\s*:\s*true', f.read(HEAD_SIZE)):
+                raise StagingError("This Bitwarden export is encrypted; export it again as unencrypted JSON.")
+            f.seek(0)
+            # Bitwarden writes the folders before the items, so every item's folder name is known by then.
+            for key, element in iter_json_arrays(f, ("folders", "items")):
+                if key == "folders":
+                    folders[element.get("id")] = element.get("name") or ""
+                elif element.get("type") == 1:  # a login
+                    login = element.get("login") or {}
+                    uris = login.get("uris") or [{}]
+                    yield make_record(element.get("name"), uris[0].get("uri"), login.get("username"),
+                                      login.get("password"), folders.get(element.get("folderId"), ""),
+                                      login.get("totp") or "")
+
+@register
+class KeePassXml(Importer):
+    name, label = "keepass-xml", "KeePass 2 XML"
+
+    def detect(self, head):
+        return head.lstrip().startswith("<") and "<KeePassFile" in head
+
+    def records(self, path):
+        stack = []  # the open elements, outermost first
+        groups = []  # [name, in the recycle bin] for each open group
+        recycle_bin = None
+        for event, elem in ElementTree.iterparse(path, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                if elem.tag == "Group":
+                    groups.append(["", bool(groups) and groups[-1][1]])
+                continue
+            stack.pop()
+            parent = stack[-1].tag if stack else None
+            if elem.tag == "RecycleBinUUID" and parent == "Meta":
+                recycle_bin = elem.text
+            elif elem.tag == "UUID" and parent == "Group" and elem.text and elem.text == recycle_bin:
+                groups[-1][1] = True
+            elif elem.tag == "Name" and parent == "Group":
+                groups[-1][0] = elem.text or ""
+            elif elem.tag == "Entry" and parent == "Group":  # not the old versions kept under <History>
+                if not groups[-1][1]:
+                    fields = {string.findtext("Key"): string.findtext("Value") or "" for string in elem.findall("String")}
+                    # The root group is the database itself; the groups below it are the folders.
+                    yield make_record(fields.get("Title"), fields.get("URL"), fields.get("UserName"),
+                                      fields.get("Password"), "/".join(name for name, _ in groups[1:]),
+                                      fields.get("otp") or fields.get("TimeOtp-Secret-Base32", ""))
+                stack[-1].remove(elem)
+            elif elem.tag in ("Group", "Meta"):
+                if elem.tag == "Group":
+                    groups.pop()
+                if stack:
+                    stack[-1].remove(elem)
+
+def detect_format(path):
+    """The registered Importer that recognises a file. Raises StagingError if none does."""
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        head = f.read(HEAD_SIZE)
+    for importer in IMPORTERS.values():
+        if importer.detect(head):
+            return importer
+    raise StagingError(f"Not a recognised export: {os.path.basename(path)}. "
+                       f"Supported: {', '.join(importer.label for importer in IMPORTERS.values())}.")
+
+# -----------------------------
+# Encryption
+# -----------------------------
+def _start_worker(key):
+    crypto.use_key(key)
+
+def encrypt_batch(records, storage_format):
+    """Encrypts the password and TOTP seed of each record (in a worker process when importing in parallel)."""
+    return [(platform, platform_username, email, crypto.encrypt_data(password, storage_format=storage_format),
+             folder, None if seed is None else
+             (crypto.encrypt_data(seed[0], storage_format=storage_format),) + tuple(seed[1:]))
+            for platform, platform_username, email, password, folder, seed in records]
+
+def batched(records, size):
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+def encrypted_batches(batches, workers, storage_format):
+    """
+    Encrypts batches in order. With more than one worker and more than one batch,
+    ``workers`` processes encrypt while parsing continues, with at most two batches
+    per worker in flight, so a huge file is never read far ahead of the database.
+    Workers are spawned, not forked: the GUI imports from a QThread, and forking a
+    multi-threaded process can leave the child holding another thread's locks.
+    """
+    batches = iter(batches)
+    first = list(itertools.islice(batches, 2))
+    if workers <= 1 or len(first) < 2:
+        for batch in itertools.chain(first, batches):
+            yield encrypt_batch(batch, storage_format)
+        return
+    # Imported here: multiprocessing alone would double the time it takes to import vault_core.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_start_worker, initargs=(crypto.active_key(),)) as pool:
+        pending = collections.deque()
+        for batch in itertools.chain(first, batches):
+            pending.append(pool.submit(encrypt_batch, batch, storage_format))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# -----------------------------
+# Import
+# -----------------------------
+# The passwords_created trigger still runs for every row: it keeps the created_at given here (the import
+# time) and sets rotated_at from the new ciphertext's timestamp (vault_token_time), when it was encrypted.
+INSERT_ENTRY = (
+    "INSERT INTO passwords (id, username, platform, platform_username, email, password, created_at) "
+    "SELECT ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS "
+    "(SELECT 1 FROM passwords WHERE username = ? AND platform = ? AND platform_username = ?)")
+
+@timed("importers.import")
+def import_file(db, owner, path, fmt=None, workers=None, batch_size=BATCH_SIZE):
+    """
+    Imports an export file into ``owner``'s entries. ``fmt`` is an importer name
+    (default: detected from the file). Everything is written in one transaction:
+    a file that turns out to be unreadable part-way raises StagingError and leaves
+    the vault unchanged. Returns (imported, skipped as already saved).
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    conn = db.conn
+    total = imported = 0
+    folder_tags = {}  # folder -> tag id
+    try:
+        importer = IMPORTERS[fmt] if fmt else detect_format(path)
+        with db.transaction():
+            # Ids are assigned here so folder tags and TOTP seeds can be written by executemany too.
+            next_id = conn.execute(NEXT_ENTRY_ID_SQL).fetchone()[0]
+            for batch in encrypted_batches(batched(importer.records(path), batch_size), workers, db.storage_format):
+                ids = range(next_id, next_id + len(batch))
+                next_id += len(batch)
+                total += len(batch)
+                now = int(time.time())
+                imported += conn.executemany(INSERT_ENTRY, (
+                    (entry_id, owner, platform, platform_username, email, password, now, owner, platform, platform_username)
+                    for entry_id, (platform, platform_username, email, password, _, _) in zip(ids, batch))).rowcount
+                # Skipped entries' ids were never inserted, so the SELECTs below find nothing for them.
+                conn.executemany("INSERT OR IGNORE INTO entry_tags (tag_id, entry_id) SELECT ?, id FROM passwords WHERE id = ?",
+                                 ((_folder_tag(conn, owner, record[4], folder_tags), entry_id)
+                                  for entry_id, record in zip(ids, batch) if record[4]))
+                conn.executemany("INSERT INTO totp_secrets (entry_id, secret, digits, period, algorithm) "
+                                 "SELECT id, ?, ?, ?, ? FROM passwords WHERE id = ?",
+                                 (record[5] + (entry_id,) for entry_id, record in zip(ids, batch) if record[5]))
+    except KeyError as e:
+        raise StagingError(f"Unknown format {e}." if fmt and fmt not in IMPORTERS else f"Missing column {e}.") from e
+    except StagingError:
+        raise
+    except (OSError, ValueError, csv.Error, ElementTree.ParseError) as e:
+        raise StagingError(f"Unreadable export file: {e}") from e
+    return imported, total - imported
+
+def _folder_tag(conn, owner, folder, folder_tags):
+    tag_id = folder_tags.get(folder)
+    if tag_id is None:
+        conn.execute("INSERT OR IGNORE INTO tags (username, name) VALUES (?, ?)", (owner, folder))
+        tag_id = folder_tags[folder] = conn.execute(
+            "SELECT id FROM tags WHERE username = ? AND name = ?", (owner, folder)).fetchone()[0]
+    return tag_id
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a browser or password-manager export into a user's passwords.")
+    parser.add_argument("db_file", nargs="?", default=DB_FILE)
+    parser.add_argument("owner", help="The user the entries are saved for.")
+    parser.add_argument("path", help="The export file.")
+    parser.add_argument("--format", choices=sorted(IMPORTERS), help="Skip detection and read the file as this format.")
+    parser.add_argument("--workers", type=int, help="Encryption processes (default: one per CPU).")
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db_file)
+    try:
+        if not db.conn.execute("SELECT 1 FROM users WHERE username = ?", (args.owner,)).fetchone():
+            parser.error(f"no such user: {args.owner}")
+        start = time.perf_counter()
+        imported, skipped = import_file(db, args.owner, args.path, args.format, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"Imported {imported} entries ({skipped} already saved) in {elapsed:.1f} s "
+              f"({(imported + skipped) / max(elapsed, 1e-9):,.0f} entries/s).")
+    except StagingError as e:
+        raise SystemExit(f"Import failed, nothing was changed: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Lightweight timing instrumentation for database, crypto, CSV and backup paths.
+
+Code is instrumented with the ``timed`` decorator or the ``measure`` context
+manager; both record into the process-wide ``stats`` registry, which keeps a
+call counter and a latency histogram per operation name, plus event counters
+added with ``stats.increment`` (rows written and fetched, bytes encrypted,
+decrypted and backed up). The registry can be rendered as a text table, JSON,
+or Prometheus text exposition format.
+
+    @timed("crypto.encrypt")
+    def encrypt_data(data): ...
+
+    with measure("csv.export"):
+        ...
+
+Nothing is recorded until ``stats.enabled`` is set (the CLI's ``--stats`` and
+``--stats-file``, the GUI's diagnostics screen): until then ``timed``,
+``measure``, ``increment`` and the statements of connections opened with
+``connect`` cost one attribute check. Connections are instrumented from the
+start, so enabling stats later needs no reconnect (which would drop temporary
+tables and functions registered on the connection).
+"""
+import functools
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf.
+BUCKET_BOUNDS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets", "errors")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.errors = 0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        for i, bound in enumerate(BUCKET_BOUNDS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """Estimates a quantile from the buckets (upper bound of the bucket holding it)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "min_seconds": self.min if self.count else 0.0,
+            "max_seconds": self.max,
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "p99_seconds": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in BUCKET_BOUNDS] + ["+Inf"], self.buckets)),
+        }
+
+class Stats:
+    """Registry of per-operation latency histograms and free-standing counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.enabled = False
+
+    def observe(self, name, seconds, error=False):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+            if error:
+                hist.errors += 1
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timings": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="password_manager"):
+        """Renders every histogram and counter in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = [f"# HELP {prefix}_operation_seconds Latency of instrumented operations.",
+                 f"# TYPE {prefix}_operation_seconds histogram"]
+        for name, h in snap["timings"].items():
+            cumulative = 0
+            for bound, n in h["buckets"].items():
+                cumulative += n
+                lines.append(f'{prefix}_operation_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_operation_seconds_sum{{operation="{name}"}} {h["total_seconds"]:.9f}')
+            lines.append(f'{prefix}_operation_seconds_count{{operation="{name}"}} {h["count"]}')
+        lines.append(f"# HELP {prefix}_operation_errors_total Instrumented operations that raised.")
+        lines.append(f"# TYPE {prefix}_operation_errors_total counter")
+        for name, h in snap["timings"].items():
+            lines.append(f'{prefix}_operation_errors_total{{operation="{name}"}} {h["errors"]}')
+        if snap["counters"]:
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            for name, value in snap["counters"].items():
+                lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def rows(self):
+        """(operation, count, mean ms, p95 ms, max ms, total ms) rows for tables and reports."""
+        return [(name, h["count"], h["mean_seconds"] * 1000, h["p95_seconds"] * 1000,
+                 h["max_seconds"] * 1000, h["total_seconds"] * 1000)
+                for name, h in self.snapshot()["timings"].items()]
+
+    def format_table(self):
+        rows = self.rows()
+        if not rows:
+            return "No operations recorded."
+        out = [f"{'operation':<24} {'count':>8} {'mean ms':>10} {'p95 ms':>10} {'max ms':>10} {'total ms':>11}"]
+        for name, count, mean, p95, peak, total in rows:
+            out.append(f"{name:<24} {count:>8} {mean:>10.3f} {p95:>10.3f} {peak:>10.3f} {total:>11.1f}")
+        for name, value in self.snapshot()["counters"].items():
+            out.append(f"{name:<24} {value:>8}")
+        return "\n".join(out)
+
+    def dump(self, path):
+        """Writes the stats to ``path``: Prometheus text for ``.prom``/``.txt`` files, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+stats = Stats()
+
+@contextmanager
+def measure(name, registry=None):
+    """Times the enclosed block under ``name``; exceptions are counted as errors and re-raised."""
+    registry = registry or stats
+    if not registry.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.observe(name, time.perf_counter() - start, error=True)
+        raise
+    registry.observe(name, time.perf_counter() - start)
+
+def timed(name):
+    """Decorator form of ``measure``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                stats.observe(name, time.perf_counter() - start, error=True)
+                raise
+            stats.observe(name, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorate
+
+# -----------------------------
+# SQLite
+# -----------------------------
+def statement_kind(sql):
+    """Names a statement by its leading keyword: db.select, db.insert, db.update, ..."""
+    head = sql.lstrip().split(None, 1)
+    return "db." + (head[0].lower() if head else "empty")
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with measure(statement_kind(sql)):
+            super().execute(sql, parameters)
+        if self.rowcount > 0:
+            stats.increment("db.rows_written", self.rowcount)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        with measure(statement_kind(sql) + "_many"):
+            super().executemany(sql, seq_of_parameters)
+        if self.rowcount > 0:
+            stats.increment("db.rows_written", self.rowcount)
+        return self
+
+    def fetchall(self):
+        with measure("db.fetch"):
+            rows = super().fetchall()
+        stats.increment("db.rows_fetched", len(rows))
+        return rows
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A connection whose statements, fetches and commits are recorded in ``stats``
+    while it is enabled; until then it runs them as a plain connection would.
+    """
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or (InstrumentedCursor if stats.enabled else sqlite3.Cursor))
+
+    def execute(self, sql, parameters=()):
+        if not stats.enabled:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not stats.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        with measure("db.commit"):
+            super().commit()
+
+def connect(path):
+    """Opens ``path`` as an InstrumentedConnection; its statements are timed whenever ``stats`` is enabled."""
+    return sqlite3.connect(path, factory=InstrumentedConnection)
@@ -0,0 +1,135 @@
+"""
+Merging another copy of the vault into this one.
+
+Imports and online restores normally replace the whole vault. A merge instead
+matches entries on (owner, platform, platform_username) and writes only what
+differs, so consolidating the vaults of several machines costs as much as the
+number of changed entries rather than the size of the vault.
+
+For each staged entry:
+  * no local entry with that key          -> inserted
+  * same email and password               -> unchanged
+  * different email or password (conflict) -> resolved by the policy:
+      newest  the side whose password was encrypted last wins (ties keep the local one)
+      ours    the local entry is kept
+      theirs  the imported entry is taken
+
+Accounts missing locally are added; existing accounts are never overwritten.
+
+The VAULT_EXTRAS an export or backup carries follow the entries they belong
+to: an inserted or updated entry gets the imported entry's tags, 2FA seed
+(replacing the local one) and earlier passwords (after the local ones, less
+those it already has). Account tags are added to the accounts.
+"""
+from vault_core import crypto
+from vault_core.instrumentation import timed
+from vault_core.storage import NEXT_ENTRY_ID_SQL, drop_staging, stage_import, staged_extras, validate_staging
+
+POLICIES = ("newest", "ours", "theirs")
+MERGE_BATCH = 500  # rows per write transaction
+
+# Staged entries joined to the local entry with the same key (the oldest one if
+# there are duplicates), through the passwords_entry_key index.
+JOIN_SQL = '''
+    SELECT s.id, s.username, s.platform, s.platform_username, s.email, s.password, p.id, p.email, p.password
+    FROM temp.passwords_import s
+    LEFT JOIN passwords p ON p.id = (
+        SELECT MIN(id) FROM passwords
+        WHERE username = s.username AND platform = s.platform AND platform_username = s.platform_username)
+    ORDER BY s.id
+'''
+
+def _same_secret(theirs, ours):
+    return theirs == ours or crypto.decrypt_data(theirs) == crypto.decrypt_data(ours)
+
+def _imported_wins(policy, theirs, ours):
+    if policy == "theirs":
+        return True
+    if policy == "ours":
+        return False
+    return crypto.encryption_timestamp(theirs) > crypto.encryption_timestamp(ours)
+
+def plan_merge(db, policy="newest"):
+    """
+    Compares the staged rows with the vault. Returns (new users, inserts, updates,
+    counts): rows ready for executemany, each led by the staged entry id, plus a
+    dict of how every entry was classified.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown merge policy '{policy}'. Choose from {', '.join(POLICIES)}.")
+    conn = db.conn
+    users = conn.execute('''
+        SELECT username, password, security_question, security_answer FROM temp.users_import s
+        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.username = s.username)
+    ''').fetchall()
+    inserts, updates, seen = [], [], set()
+    counts = {"users": len(users), "inserted": 0, "updated": 0, "unchanged": 0, "kept": 0}
+    for (staged_id, owner, platform, platform_username, email, password,
+         live_id, live_email, live_password) in conn.execute(JOIN_SQL):
+        key = (owner, platform, platform_username)
+        if key in seen:
+            continue  # the import itself holds this entry twice: the first one counts
+        seen.add(key)
+        if live_id is None:
+            inserts.append((staged_id, owner, platform, platform_username, email, password))
+            counts["inserted"] += 1
+        elif email == live_email and _same_secret(password, live_password):
+            counts["unchanged"] += 1
+        elif _imported_wins(policy, password, live_password):
+            updates.append((staged_id, email, password, live_id))
+            counts["updated"] += 1
+        else:
+            counts["kept"] += 1
+    return users, inserts, updates, counts
+
+def _apply(db, sql, rows, batch_size, extras=(), new_ids=False):
+    """
+    Writes rows of (staged entry id, *parameters) in batches, each in its own
+    transaction; the last parameter is the local entry id. With ``new_ids`` it
+    is assigned here, so the batch's entries can get the staged ``extras`` in
+    the same transaction and are never merged without them.
+    """
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        with db.transaction():
+            if new_ids:
+                next_id = db.conn.execute(NEXT_ENTRY_ID_SQL).fetchone()[0]
+                batch = [row + (next_id + i,) for i, row in enumerate(batch)]
+            db.conn.executemany(sql, (row[1:] for row in batch))
+            if extras:
+                db.conn.execute("DELETE FROM temp.merged_entries")
+                db.conn.executemany("INSERT INTO temp.merged_entries VALUES (?, ?)", ((row[0], row[-1]) for row in batch))
+                for extra in extras:
+                    for statement in extra.merge:
+                        db.conn.execute(statement)
+
+@timed("merge.apply")
+def merge_vault(db, users, passwords, policy="newest", batch_size=MERGE_BATCH, extras=None):
+    """
+    Merges accounts and entries (the row tuples taken by storage.stage_import),
+    and the VAULT_EXTRAS rows in ``extras``, into the vault. The rows are
+    validated first, so invalid data changes nothing. Each batch commits on its
+    own; running an interrupted merge again completes it. Returns the counts
+    from plan_merge.
+    """
+    stage_import(db, users, passwords, extras)
+    try:
+        validate_staging(db)
+        new_users, inserts, updates, counts = plan_merge(db, policy)
+        staged = staged_extras(db.conn)
+        db.conn.execute("CREATE TEMP TABLE merged_entries (staged_id INTEGER PRIMARY KEY, live_id INTEGER)")
+        with db.transaction():
+            db.conn.executemany("INSERT INTO users (username, password, security_question, security_answer) "
+                                "VALUES (?, ?, ?, ?)", new_users)
+            # Account tags: the staged accounts all exist now.
+            for extra in staged:
+                if extra.parent == "username":
+                    for sql in extra.merge:
+                        db.conn.execute(sql)
+        entry_extras = [extra for extra in staged if extra.parent == "entry_id"]
+        _apply(db, "INSERT INTO passwords (username, platform, platform_username, email, password, id) "
+                   "VALUES (?, ?, ?, ?, ?, ?)", inserts, batch_size, entry_extras, new_ids=True)
+        _apply(db, "UPDATE passwords SET email = ?, password = ? WHERE id = ?", updates, batch_size, entry_extras)
+    finally:
+        drop_staging(db)
+    return counts
@@ -0,0 +1,43 @@
+"""
+Platform-name completion.
+
+A PlatformIndex keeps each owner's platform names in a sorted list, so the
+names starting with a prefix are one contiguous slice found with two binary
+searches, however many platforms the owner has. The list is loaded on first
+use and reloaded only when a platform appeared or disappeared since (the
+owner's generation in ``platform_generations``, kept by triggers, moved on),
+which also covers writes made by other connections: imports, bulk moves, sync.
+
+    index = PlatformIndex(db)
+    index.complete("alice", "git")      # ['gitea', 'github', 'gitlab']
+"""
+import bisect
+
+# Sorts after any character a platform name contains: prefix + _END bounds every name starting with prefix.
+_END = "\U0010ffff"
+
+class PlatformIndex:
+    def __init__(self, db):
+        self.db = db
+        self._platforms = {}  # owner -> (generation, sorted platform names)
+
+    def platforms(self, owner):
+        """The owner's platform names, sorted."""
+        row = self.db.conn.execute("SELECT generation FROM platform_generations WHERE username = ?", (owner,)).fetchone()
+        generation = row[0] if row else 0
+        cached = self._platforms.get(owner)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        names = [row[0] for row in self.db.conn.execute(
+            "SELECT platform FROM platform_summary WHERE username = ? ORDER BY platform", (owner,))]
+        self._platforms[owner] = (generation, names)
+        return names
+
+    def complete(self, owner, prefix, limit=None):
+        """The owner's platforms starting with ``prefix``, sorted; at most ``limit`` of them."""
+        names = self.platforms(owner)
+        start = bisect.bisect_left(names, prefix)
+        end = bisect.bisect_left(names, prefix + _END, start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return names[start:end]
@@ -0,0 +1,670 @@
+"""
+Two-way, offline-first sync between several copies of a vault.
+
+Unlike the online backup (one document that each machine overwrites), every
+vault keeps working on its own and exchanges only the rows that changed:
+
+  * Each vault is a node with a random id; a copy of a vault file notices that
+    it is a copy (the file changed, or another node pushes under its id) and
+    takes a new one. Every account and entry it holds has a version: a hybrid
+    logical clock (HLC) stamp "milliseconds.counter.node", which sorts in
+    causal order across machines whose clocks disagree.
+  * An entry is known to every node by an id derived from its key (owner,
+    platform, platform username), so vaults that already hold the same entry
+    (restored, imported or copied) do not duplicate it. An incoming entry that
+    matches a local one under another id is merged into it.
+  * Local edits are picked up from the change log (vault_core.changes) and
+    stamped with a new HLC.
+  * An entry travels with its tags, 2FA seed and earlier passwords, and an
+    account with its list of tags; changing any of them versions the entry or
+    account again. Earlier passwords are added to the ones a vault already has,
+    so each vault's history retention (storage.prune_history) stays its own.
+    Older versions of this module cannot apply such batches: upgrade every
+    node together.
+  * A sync pushes this node's rows changed since its last push as
+    zlib-compressed JSON batches named "<node>-<stamp of the newest row>",
+    so names never collide and sort in push order. It then applies the batches
+    other nodes wrote since it last pulled. For each row the higher HLC wins.
+    Deletes travel as tombstones.
+  * After pulling, a node writes "<node>.acks": the newest batch of every other
+    node it has applied. A node deletes its own batches once every peer it
+    knows of has acknowledged them, so a vault that joins later should start
+    from a copy of a synced vault rather than from an empty one.
+  * Encrypted columns stay encrypted; all nodes must share the same secret.key.
+
+A transport only stores, fetches and lists named batches, so any shared
+medium works: a directory (network share, USB stick), a small HTTP server,
+or Firestore. Each transport counts its round trips and bytes.
+
+    python -m vault_core.replication sync database.db /mnt/share/vault-sync
+    python -m vault_core.replication serve /srv/vault-sync --port 8765
+    python -m vault_core.replication sync database.db http://server:8765
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+import zlib
+
+from vault_core import crypto, sync
+from vault_core.changes import ChangeLog
+from vault_core.instrumentation import timed
+from vault_core.storage import DB_FILE, DatabaseManager
+
+CONSUMER = "replication"  # change-log consumer name
+PUSH_BATCH = 500          # rows per batch (keeps Firestore documents well under 1 MiB)
+SYNC_COLLECTION = "vault_sync"
+
+# -----------------------------
+# Hybrid logical clock
+# -----------------------------
+class HybridClock:
+    """Stamps are '<ms>.<counter>.<node>' with fixed-width numbers, so string order is clock order."""
+
+    def __init__(self, node, last=None):
+        self.node = node
+        self.ms, self.counter = (0, 0) if not last else self.parse(last)[:2]
+
+    @staticmethod
+    def parse(stamp):
+        ms, counter, node = stamp.split(".")
+        return int(ms), int(counter), node
+
+    def format(self):
+        return f"{self.ms:013d}.{self.counter:06d}.{self.node}"
+
+    def tick(self):
+        """A new stamp, later than every stamp this clock has issued or observed."""
+        now = int(time.time() * 1000)
+        if now > self.ms:
+            self.ms, self.counter = now, 0
+        else:
+            self.counter += 1
+        return self.format()
+
+    def at(self, seconds, n):
+        """
+        The ``n``-th stamp for what this node wrote before it kept a clock, at
+        ``seconds`` (Unix time); ``n`` keeps stamps of the same second distinct.
+        """
+        ms, counter = divmod(int(seconds) * 1000 * 1000000 + n, 1000000)
+        stamp = f"{ms:013d}.{counter:06d}.{self.node}"
+        self.observe(stamp)
+        return stamp
+
+    def observe(self, stamp):
+        """Moves the clock past a stamp received from another node."""
+        ms, counter, _ = self.parse(stamp)
+        if (ms, counter) > (self.ms, self.counter):
+            self.ms, self.counter = ms, counter
+
+# -----------------------------
+# Transports
+# -----------------------------
+class Transport:
+    """Stores named batches. Subclasses implement _put, _get, _list and _delete; this class counts the traffic."""
+    name = None
+
+    def __init__(self):
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def put(self, name, data):
+        self.round_trips += 1
+        self.bytes_sent += len(data)
+        self._put(name, data)
+
+    def get(self, name):
+        self.round_trips += 1
+        data = self._get(name)
+        self.bytes_received += len(data)
+        return data
+
+    def list(self):
+        self.round_trips += 1
+        names = self._list()
+        self.bytes_received += sum(len(n) + 1 for n in names)
+        return names
+
+    def delete(self, name):
+        self.round_trips += 1
+        self._delete(name)
+
+class DirectoryTransport(Transport):
+    """Batches are files in a shared directory, written atomically."""
+
+    def __init__(self, directory):
+        super().__init__()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = "dir:" + os.path.abspath(directory)
+
+    def _put(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def _get(self, name):
+        with open(os.path.join(self.directory, name), "rb") as f:
+            return f.read()
+
+    def _list(self):
+        return [n for n in os.listdir(self.directory) if not n.endswith(".tmp")]
+
+    def _delete(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+class HTTPTransport(Transport):
+    """Batches on a server started with ``serve`` (GET / lists, GET/PUT/DELETE /<name> fetch, store, delete)."""
+
+    def __init__(self, url, timeout=10):
+        super().__init__()
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.name = self.url
+
+    def _request(self, path, data=None, method=None):
+        import urllib.request
+        method = method or ("PUT" if data is not None else "GET")
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    def _put(self, name, data):
+        self._request("/" + name, data)
+
+    def _get(self, name):
+        return self._request("/" + name)
+
+    def _list(self):
+        return self._request("/").decode().split()
+
+    def _delete(self, name):
+        self._request("/" + name, method="DELETE")
+
+class FirestoreTransport(Transport):
+    """One Firestore document per batch in the 'vault_sync' collection; needs sync.init_firebase()."""
+    name = "firestore"
+
+    def __init__(self, client=None):
+        super().__init__()
+        client = client or sync.db_online
+        if client is None:
+            raise sync.SyncError("Firebase not initialized.")
+        if not sync.internet_available():
+            raise sync.SyncError("No internet connection.")
+        self.collection = client.collection(SYNC_COLLECTION)
+
+    def _put(self, name, data):
+        self.collection.document(name).set({"data": data})
+
+    def _get(self, name):
+        return bytes(self.collection.document(name).get().to_dict()["data"])
+
+    def _list(self):
+        return [doc.id for doc in self.collection.list_documents()]
+
+    def _delete(self, name):
+        self.collection.document(name).delete()
+
+def serve(directory, host="127.0.0.1", port=8765):
+    """Returns an HTTP server exposing a DirectoryTransport's batches (call serve_forever() on it)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    store = DirectoryTransport(directory)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.strip("/")
+            if "/" in name or name.startswith("."):
+                self.send_error(400)
+                return
+            try:
+                body = store._get(name) if name else "\n".join(store._list()).encode()
+            except (FileNotFoundError, IsADirectoryError):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_PUT(self):
+            name = self.path.strip("/")
+            if not name or "/" in name or name.startswith("."):
+                self.send_error(400)
+                return
+            store._put(name, self.rfile.read(int(self.headers["Content-Length"])))
+            self.send_response(204)
+            self.end_headers()
+
+        def do_DELETE(self):
+            name = self.path.strip("/")
+            if not name or "/" in name or name.startswith("."):
+                self.send_error(400)
+                return
+            store._delete(name)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def open_transport(target):
+    """A transport for a directory path, an http(s):// URL, or 'firestore'."""
+    if target == "firestore":
+        return FirestoreTransport()
+    if target.startswith(("http://", "https://")):
+        return HTTPTransport(target)
+    return DirectoryTransport(target)
+
+# -----------------------------
+# Local changes
+# -----------------------------
+def _file_identity(db):
+    """Which file the vault is (device and inode): a copy of the file is another one."""
+    try:
+        st = os.stat(db.path)
+    except (OSError, TypeError):
+        return None
+    return f"{st.st_dev}:{st.st_ino}"
+
+def new_node_id(db, old=None):
+    """
+    Gives the vault a new node id. Rows it versioned under ``old`` move to the
+    new id, so they are pushed again under it; ``old``'s push positions become
+    how far this vault has that node, which it pulls as a peer from now on.
+    """
+    node = uuid.uuid4().hex
+    with db.transaction():
+        if old is not None:
+            db.conn.execute("UPDATE sync_rows SET origin = ? WHERE origin = ?", (node, old))
+            for transport, position in db.conn.execute("SELECT transport, position FROM sync_peers WHERE node = ?",
+                                                       (old,)).fetchall():
+                _set_position(db.conn, transport, old, batch_stamp(position))
+        db.set_meta("sync_node", node)
+        db.set_meta("sync_node_file", _file_identity(db))
+    return node
+
+def node_id(db):
+    """This vault's node id: a new one for a vault that never synced, or for a copy of a vault file that did."""
+    node = db.get_meta("sync_node")
+    identity = db.get_meta("sync_node_file")
+    if node is None:
+        return new_node_id(db)
+    if identity is not None and identity != _file_identity(db):
+        return new_node_id(db, node)
+    if identity is None:
+        db.set_meta("sync_node_file", _file_identity(db))
+        db.commit()
+    return node
+
+def _stamp(conn, table, key, uid, hlc, origin, deleted):
+    conn.execute('''
+        INSERT INTO sync_rows (uid, table_name, local_key, hlc, origin, deleted) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (uid) DO UPDATE SET local_key = excluded.local_key, hlc = excluded.hlc,
+                                        origin = excluded.origin, deleted = excluded.deleted
+    ''', (uid, table, key, hlc, origin, deleted))
+
+def _user_uid(username):
+    return "user:" + username
+
+def _entry_uid(owner, platform, platform_username):
+    """An entry's id on every node, derived from its key so separate copies of an entry agree on it."""
+    key = "\0".join((owner, platform, platform_username)).encode()
+    return "entry:" + hashlib.sha256(key).hexdigest()[:32]
+
+def _match_entry(conn, owner, platform, platform_username):
+    """(id, uid, hlc) of a local entry with this key, or None."""
+    return conn.execute('''
+        SELECT p.id, s.uid, s.hlc FROM passwords p
+        LEFT JOIN sync_rows s ON s.table_name = 'passwords' AND s.local_key = p.id
+        WHERE p.username = ? AND p.platform = ? AND p.platform_username = ? LIMIT 1
+    ''', (owner, platform, platform_username)).fetchone()
+
+def record_local_changes(db, node, clock):
+    """
+    Gives every row changed since the last call a new version. The first call
+    starts the change-log consumer and versions every existing row: an entry
+    as of when its password was set, so the same entry edited since in another
+    vault keeps that edit, and an account as of its oldest entry, so it still
+    sorts (and is applied) before them. Run inside db.transaction().
+    """
+    conn, log = db.conn, ChangeLog(db)
+    written_at, earlier = {}, 0
+    if not conn.execute("SELECT 1 FROM change_consumers WHERE name = ?", (CONSUMER,)).fetchone():
+        log.register(CONSUMER)
+        changed = [("users", u) for (u,) in conn.execute("SELECT username FROM users")]
+        changed += [("passwords", i) for (i,) in conn.execute("SELECT id FROM passwords")]
+        written_at = {("passwords", i): t for i, t in conn.execute(
+            "SELECT id, rotated_at FROM passwords WHERE rotated_at IS NOT NULL")}
+        written_at.update((("users", u), t) for u, t in conn.execute(
+            "SELECT username, MIN(rotated_at) FROM passwords WHERE rotated_at IS NOT NULL GROUP BY username"))
+        # Oldest first (an account before its entries), so the stamps handed out below follow that order.
+        changed.sort(key=lambda change: written_at.get(change, float("inf")))
+    else:
+        changed, last = {}, None
+        for seq, table, op, username, entry_id, changed_at in log.iter_changes(CONSUMER):
+            changed[(table, username if table == "users" else entry_id)] = None
+            last = seq
+        if last is not None:
+            log.ack(CONSUMER, last)
+    for table, key in changed:
+        row = conn.execute("SELECT uid, deleted FROM sync_rows WHERE table_name = ? AND local_key = ?",
+                           (table, key)).fetchone()
+        if table == "users":
+            exists = conn.execute("SELECT 1 FROM users WHERE username = ?", (key,)).fetchone()
+            uid = _user_uid(key)
+        else:
+            exists = conn.execute("SELECT username, platform, platform_username FROM passwords WHERE id = ?",
+                                  (key,)).fetchone()
+            uid = row[0] if row else None
+            if uid is None and exists:
+                uid = _entry_uid(*exists)
+                taken = conn.execute("SELECT local_key, deleted FROM sync_rows WHERE uid = ?", (uid,)).fetchone()
+                if taken and not taken[1] and taken[0] != key:
+                    uid = uuid.uuid4().hex  # another entry was first synced under this key and renamed since
+        if exists:
+            if (table, key) in written_at:
+                hlc = clock.at(written_at[table, key], earlier)
+                earlier += 1
+            else:
+                hlc = clock.tick()
+            _stamp(conn, table, key, uid, hlc, node, 0)
+        elif row and not row[1]:
+            _stamp(conn, table, key, row[0], clock.tick(), node, 1)
+
+# -----------------------------
+# Batches
+# -----------------------------
+# The last column is the local key; push_rows replaces it with the row's extras.
+PUSH_USERS_SQL = '''
+    SELECT s.uid, s.table_name, s.hlc, s.deleted, s.local_key, u.password, u.security_question, u.security_answer,
+           u.username
+    FROM sync_rows s LEFT JOIN users u ON u.username = s.local_key
+    WHERE s.origin = ? AND s.hlc > ? AND s.table_name = 'users'
+'''
+PUSH_PASSWORDS_SQL = '''
+    SELECT s.uid, s.table_name, s.hlc, s.deleted, p.username, p.platform, p.platform_username, p.email, p.password,
+           p.id
+    FROM sync_rows s LEFT JOIN passwords p ON p.id = s.local_key
+    WHERE s.origin = ? AND s.hlc > ? AND s.table_name = 'passwords'
+'''
+
+def account_extras(conn, username):
+    """What an account carries besides its own columns: its tag names."""
+    return {"tags": [name for (name,) in conn.execute("SELECT name FROM tags WHERE username = ? ORDER BY name",
+                                                      (username,))]}
+
+def entry_extras(conn, entry_id):
+    """What an entry carries besides its own columns: tag names, 2FA seed and earlier passwords (as text)."""
+    totp = conn.execute("SELECT secret, digits, period, algorithm FROM totp_secrets WHERE entry_id = ?",
+                        (entry_id,)).fetchone()
+    return {
+        "tags": [name for (name,) in conn.execute(
+            "SELECT t.name FROM entry_tags e JOIN tags t ON t.id = e.tag_id WHERE e.entry_id = ? ORDER BY t.name",
+            (entry_id,))],
+        "totp": None if totp is None else [crypto.text_encode(totp[0])] + list(totp[1:]),
+        "history": [[version, crypto.text_encode(password), replaced_at] for version, password, replaced_at in
+                    conn.execute("SELECT version, password, replaced_at FROM password_history WHERE entry_id = ? "
+                                 "ORDER BY version", (entry_id,))],
+    }
+
+def push_rows(conn, node, since):
+    """This node's accounts and entries versioned after ``since``, oldest first, each with its extras."""
+    rows = [row[:-1] + ((None if row[-1] is None else account_extras(conn, row[-1])),)
+            for row in conn.execute(PUSH_USERS_SQL, (node, since)).fetchall()]
+    rows += [row[:-1] + ((None if row[-1] is None else entry_extras(conn, row[-1])),)
+             for row in conn.execute(PUSH_PASSWORDS_SQL, (node, since)).fetchall()]
+    rows.sort(key=lambda row: row[2])
+    return rows
+
+def encode_batch(rows):
+    """Rows are (uid, table, hlc, deleted, *columns, extras); encrypted columns become text (see crypto.text_encode)."""
+    rows = [list(row[:4]) + [crypto.text_encode(value) for value in row[4:]] for row in rows]
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode())
+
+def decode_batch(data):
+    return [row[:4] + [crypto.text_decode(value) if isinstance(value, str) else value for value in row[4:]]
+            for row in json.loads(zlib.decompress(data))]
+
+def _apply_user(conn, uid, hlc, origin, deleted, username, password, question, answer, extras=None):
+    if deleted:
+        # The cascade removes this user's entries here too; version them with the delete.
+        conn.execute('''
+            UPDATE sync_rows SET origin = CASE WHEN hlc < ? THEN ? ELSE origin END, hlc = MAX(hlc, ?), deleted = 1
+            WHERE table_name = 'passwords' AND local_key IN (SELECT id FROM passwords WHERE username = ?)
+        ''', (hlc, origin, hlc, username))
+        conn.execute("DELETE FROM users WHERE username = ?", (username,))
+    else:
+        conn.execute('''
+            INSERT INTO users (username, password, security_question, security_answer) VALUES (?, ?, ?, ?)
+            ON CONFLICT (username) DO UPDATE SET password = excluded.password,
+                security_question = excluded.security_question, security_answer = excluded.security_answer
+        ''', (username, password, question, answer))
+        if extras is not None:
+            conn.executemany("INSERT OR IGNORE INTO tags (username, name) VALUES (?, ?)",
+                             ((username, name) for name in extras["tags"]))
+    _stamp(conn, "users", username, uid, hlc, origin, deleted)
+
+def _apply_entry_extras(conn, entry_id, owner, extras):
+    """Gives a local entry the tags and 2FA seed of the incoming version, and the earlier passwords it lacks."""
+    tags = json.dumps(extras["tags"])
+    conn.execute("INSERT OR IGNORE INTO tags (username, name) SELECT ?, value FROM json_each(?)", (owner, tags))
+    conn.execute("DELETE FROM entry_tags WHERE entry_id = ? AND tag_id NOT IN "
+                 "(SELECT id FROM tags WHERE username = ? AND name IN (SELECT value FROM json_each(?)))",
+                 (entry_id, owner, tags))
+    conn.execute("INSERT OR IGNORE INTO entry_tags (tag_id, entry_id) "
+                 "SELECT id, ? FROM tags WHERE username = ? AND name IN (SELECT value FROM json_each(?))",
+                 (entry_id, owner, tags))
+    if extras["totp"] is None:
+        conn.execute("DELETE FROM totp_secrets WHERE entry_id = ?", (entry_id,))
+    else:
+        secret, digits, period, algorithm = extras["totp"]
+        conn.execute("INSERT OR REPLACE INTO totp_secrets (entry_id, secret, digits, period, algorithm) "
+                     "VALUES (?, ?, ?, ?, ?)", (entry_id, crypto.text_decode(secret), digits, period, algorithm))
+    # A password is the same one when it was encrypted at the same time (re-encryption keeps that time).
+    def identity(password):
+        return crypto.encryption_timestamp(password), crypto.decrypt_data(password)
+    known = {identity(password) for (password,) in conn.execute(
+        "SELECT password FROM password_history WHERE entry_id = ?", (entry_id,))}
+    version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM password_history WHERE entry_id = ?",
+                           (entry_id,)).fetchone()[0]
+    for _, password, replaced_at in extras["history"]:
+        password = crypto.text_decode(password)
+        if identity(password) not in known:
+            version += 1
+            conn.execute("INSERT INTO password_history (entry_id, version, password, replaced_at) VALUES (?, ?, ?, ?)",
+                         (entry_id, version, password, replaced_at))
+
+def _apply_password(conn, uid, hlc, origin, deleted, local_id, owner, platform, platform_username, email, password,
+                    extras=None):
+    if deleted:
+        if local_id is not None:
+            conn.execute("DELETE FROM passwords WHERE id = ?", (local_id,))
+    elif local_id is not None and conn.execute("SELECT 1 FROM passwords WHERE id = ?", (local_id,)).fetchone():
+        conn.execute("UPDATE passwords SET platform = ?, platform_username = ?, email = ?, password = ? WHERE id = ?",
+                     (platform, platform_username, email, password, local_id))
+    elif conn.execute("SELECT 1 FROM users WHERE username = ?", (owner,)).fetchone():
+        local_id = conn.execute("INSERT INTO passwords (username, platform, platform_username, email, password) "
+                                "VALUES (?, ?, ?, ?, ?)", (owner, platform, platform_username, email, password)).lastrowid
+    else:
+        return False  # the account was deleted here later than this entry changed there
+    if not deleted and extras is not None:  # None: pushed by a node that did not send extras yet
+        _apply_entry_extras(conn, local_id, owner, extras)
+    _stamp(conn, "passwords", None if deleted else local_id, uid, hlc, origin, deleted)
+    return True
+
+def apply_batch(db, rows, clock):
+    """Applies the rows of a batch whose version is newer than ours. Returns how many were applied."""
+    conn, applied = db.conn, 0
+    account_tags = {}  # username -> tag names of the account version applied
+    for uid, table, hlc, deleted, *fields in sorted(rows, key=lambda row: row[2]):
+        clock.observe(hlc)
+        current = conn.execute("SELECT local_key, hlc FROM sync_rows WHERE uid = ?", (uid,)).fetchone()
+        if current and current[1] >= hlc:
+            continue
+        origin = HybridClock.parse(hlc)[2]
+        if table == "users":
+            _apply_user(conn, uid, hlc, origin, deleted, *fields)
+            if not deleted and len(fields) > 4:
+                account_tags[fields[0]] = fields[4]["tags"]
+            applied += 1
+            continue
+        if current is None and not deleted:
+            match = _match_entry(conn, *fields[:3])
+            if match:
+                # The same entry under another id (random ones came from older versions): both sides settle
+                # on the id derived from the key, and the newer of the two versions wins as usual.
+                local_id, local_uid, local_hlc = match
+                canonical = _entry_uid(*fields[:3])
+                taken = conn.execute("SELECT local_key, deleted FROM sync_rows WHERE uid = ?", (canonical,)).fetchone()
+                if not taken or taken[1] or taken[0] == local_id:
+                    uid = canonical
+                if local_uid != uid:
+                    conn.execute("DELETE FROM sync_rows WHERE uid = ?", (local_uid,))
+                if local_hlc is not None and local_hlc >= hlc:
+                    if local_uid != uid:
+                        _stamp(conn, "passwords", local_id, uid, clock.tick(), clock.node, 0)
+                    continue
+                current = (local_id, None)
+        if _apply_password(conn, uid, hlc, origin, deleted, current[0] if current else None, *fields):
+            applied += 1
+    # Tags the account no longer has (deleted or renamed there) go once the entries carrying them have moved on.
+    for username, tags in account_tags.items():
+        conn.execute("DELETE FROM tags WHERE username = ? AND entries = 0 "
+                     "AND name NOT IN (SELECT value FROM json_each(?))", (username, json.dumps(tags)))
+    return applied
+
+# -----------------------------
+# Sync
+# -----------------------------
+def _position(conn, transport, node):
+    row = conn.execute("SELECT position FROM sync_peers WHERE transport = ? AND node = ?", (transport, node)).fetchone()
+    return row[0] if row else ""
+
+def _set_position(conn, transport, node, position):
+    conn.execute("INSERT OR REPLACE INTO sync_peers (transport, node, position) VALUES (?, ?, ?)",
+                 (transport, node, position))
+
+def batch_stamp(hlc):
+    """'<ms><counter>' of an HLC stamp: the part of a batch name that orders one node's batches."""
+    ms, counter, _ = HybridClock.parse(hlc)
+    return f"{ms:013d}{counter:06d}"
+
+def batch_name(node, last_hlc):
+    """'<node>-<ms><counter>' of the batch's newest row: unique, and in push order for each node."""
+    return f"{node}-{batch_stamp(last_hlc)}"
+
+def acks_name(node):
+    """Where a node records the newest batch of each peer it has applied."""
+    return f"{node}.acks"
+
+@timed("sync.replicate")
+def sync_vault(db, transport):
+    """
+    Pushes this vault's changes to the transport and applies everyone else's.
+    Returns a report: rows pushed, rows pulled, rows applied, and the transport's
+    round trips and bytes.
+    """
+    conn, node = db.conn, node_id(db)
+    names = transport.list()
+    batches = []
+    for name in names:
+        other, _, stamp = name.rpartition("-")
+        if other and stamp.isdigit():
+            batches.append((other, stamp, name))
+    # Batches under our id that we never pushed: another copy of this vault file is using it.
+    pushed = _position(conn, transport.name, node)
+    pushed = batch_stamp(pushed) if pushed else ""
+    if any(other == node and stamp > pushed for other, stamp, _ in batches):
+        node = new_node_id(db, node)
+    clock = HybridClock(node, db.get_meta("sync_clock"))
+    with db.transaction():
+        record_local_changes(db, node, clock)
+
+    # Push: this node's rows versioned since the last push to this transport.
+    rows = push_rows(conn, node, _position(conn, transport.name, node))
+    for start in range(0, len(rows), PUSH_BATCH):
+        chunk = rows[start:start + PUSH_BATCH]
+        transport.put(batch_name(node, chunk[-1][2]), encode_batch(chunk))
+        with db.transaction():
+            _set_position(conn, transport.name, node, chunk[-1][2])
+
+    # Pull: every other node's batches after the last one applied, in order.
+    applied_up_to = dict(conn.execute("SELECT node, position FROM sync_peers WHERE transport = ?", (transport.name,)))
+    pending = sorted(batch for batch in batches if batch[0] != node and batch[1] > applied_up_to.get(batch[0], ""))
+    pulled = applied = 0
+    log = ChangeLog(db)
+    for other, stamp, name in pending:
+        batch = decode_batch(transport.get(name))
+        with db.transaction():
+            record_local_changes(db, node, clock)  # anything edited meanwhile keeps its own version
+            applied += apply_batch(db, batch, clock)
+            _set_position(conn, transport.name, other, stamp)
+            log.ack(CONSUMER, log.head())  # our own writes are not local changes
+        pulled += len(batch)
+
+    # Acknowledge what we applied, then delete our batches that every peer has applied.
+    peers = dict(conn.execute("SELECT node, position FROM sync_peers WHERE transport = ? AND node != ?",
+                              (transport.name, node)))
+    if pending or acks_name(node) not in names:
+        transport.put(acks_name(node), json.dumps(peers).encode())
+    ours = [(stamp, name) for other, stamp, name in batches if other == node]
+    if ours:
+        # Every node that pushed or acknowledged anything here counts; one that has not acknowledged holds all.
+        peers = set(peers) | {other for other, _, _ in batches} | {n[:-len(".acks")] for n in names if n.endswith(".acks")}
+        peers.discard(node)
+        acked = [json.loads(transport.get(acks_name(peer))).get(node, "") if acks_name(peer) in names else ""
+                 for peer in peers]
+        if acked:
+            for stamp, name in ours:
+                if stamp <= min(acked):
+                    transport.delete(name)
+
+    db.set_meta("sync_clock", clock.format())
+    db.commit()
+    return {"pushed": len(rows), "pulled": pulled, "applied": applied, "round_trips": transport.round_trips,
+            "bytes_sent": transport.bytes_sent, "bytes_received": transport.bytes_received}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Two-way sync between copies of a vault.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("sync", help="Exchange changes with the other vaults using a transport.")
+    cmd.add_argument("db_file", nargs="?", default=DB_FILE)
+    cmd.add_argument("target", help="A shared directory, an http:// URL of 'serve', or 'firestore'.")
+    cmd = sub.add_parser("serve", help="Serve a directory of batches over HTTP.")
+    cmd.add_argument("directory")
+    cmd.add_argument("--host", default="127.0.0.1")
+    cmd.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = serve(args.directory, args.host, args.port)
+        print(f"Serving {args.directory} on http://{args.host}:{server.server_port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+    if args.target == "firestore":
+        sync.init_firebase()
+    db = DatabaseManager(args.db_file)
+    try:
+        report = sync_vault(db, open_transport(args.target))
+    finally:
+        db.close()
+    print(f"Pushed {report['pushed']} rows, pulled {report['pulled']} ({report['applied']} applied); "
+          f"{report['round_trips']} round trips, {report['bytes_sent']} bytes sent, "
+          f"{report['bytes_received']} bytes received")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Optional sharded storage: one SQLite file per user, or per hash bucket of users.
+
+A sharded vault is a directory holding a small routing catalog
+(``catalog.db``: username -> shard file) and the shard files. Every shard is
+an ordinary vault (vault_core.storage schema) that holds only its users'
+accounts and entries. Writes for users on different shards therefore take
+different writer locks and can run in parallel. Backing up or restoring one
+user is a file-level copy with SQLite's online backup API.
+
+    python -m vault_core.shards split database.db vault_shards            # one file per user
+    python -m vault_core.shards split database.db vault_shards --buckets 16
+    python -m vault_core.shards backup vault_shards alice alice.db
+    python -m vault_core.shards restore vault_shards alice alice.db
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+
+from vault_core.instrumentation import stats
+from vault_core.storage import PAGE_SIZE, DatabaseManager, UserStore, users_page
+
+CATALOG_FILE = "catalog.db"
+
+def _map_ids(conn, table, keys, username):
+    """
+    Fills temp.<keys> (old, new) with the ids the user's rows of ``table`` in
+    the attached vault get here. A bucket holds other users too, and a file
+    from another vault may use their ids: those rows are given ids after every
+    id either side has used, as AUTOINCREMENT would. The others keep theirs.
+    """
+    conn.execute(f"CREATE TEMP TABLE {keys} (old INTEGER PRIMARY KEY, new INTEGER NOT NULL)")
+    conn.execute(f"INSERT INTO temp.{keys} SELECT id, id FROM incoming.{table} WHERE username = ?", (username,))
+    taken = [row[0] for row in conn.execute(f"SELECT k.old FROM temp.{keys} k JOIN main.{table} t ON t.id = k.old")]
+    if taken:
+        next_id = conn.execute(f"SELECT MAX(COALESCE((SELECT MAX(id) FROM main.{table}), 0), "
+                               f"COALESCE((SELECT seq FROM main.sqlite_sequence WHERE name = ?), 0), "
+                               f"(SELECT MAX(old) FROM temp.{keys})) + 1", (table,)).fetchone()[0]
+        conn.executemany(f"UPDATE temp.{keys} SET new = ? WHERE old = ?",
+                         ((next_id + i, old) for i, old in enumerate(taken)))
+
+class ShardedVault:
+    """
+    Routes each user to a shard. ``buckets=None`` gives every user a file of
+    their own; ``buckets=N`` spreads users over N files by a hash of the name.
+    The layout is recorded in the catalog and must match when it is reopened.
+    ``on_open(db)`` is called with each shard's DatabaseManager when it is
+    opened, for per-vault housekeeping such as history pruning.
+    """
+
+    def __init__(self, directory, buckets=None, on_open=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.catalog = sqlite3.connect(os.path.join(directory, CATALOG_FILE))
+        self.catalog.execute("CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, shard TEXT NOT NULL)")
+        self.catalog.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        layout = "user" if buckets is None else f"bucket:{buckets}"
+        row = self.catalog.execute("SELECT value FROM meta WHERE key = 'layout'").fetchone()
+        if row is None:
+            self.catalog.execute("INSERT INTO meta (key, value) VALUES ('layout', ?)", (layout,))
+            self.catalog.commit()
+        elif buckets is not None and row[0] != layout:
+            raise ValueError(f"{directory} is sharded as '{row[0]}', not '{layout}'.")
+        else:
+            layout = row[0]
+        self.buckets = None if layout == "user" else int(layout.split(":")[1])
+        self.on_open = on_open
+        self._open = {}
+
+    # -- Routing --
+    def shard_for(self, username):
+        """The shard file a new user is placed in."""
+        digest = hashlib.sha256(username.encode()).hexdigest()
+        if self.buckets is None:
+            return f"user-{digest[:16]}.db"
+        return f"bucket-{int(digest[:8], 16) % self.buckets:04d}.db"
+
+    def shard_of(self, username):
+        """The shard file holding an existing user, or None."""
+        row = self.catalog.execute("SELECT shard FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def shards(self):
+        """Every shard file that holds a user, sorted."""
+        return [row[0] for row in self.catalog.execute("SELECT DISTINCT shard FROM users ORDER BY shard")]
+
+    def open_shard(self, shard):
+        db = self._open.get(shard)
+        if db is None:
+            db = self._open[shard] = DatabaseManager(os.path.join(self.directory, shard))
+            if self.on_open is not None:
+                self.on_open(db)
+        return db
+
+    def open_user(self, username):
+        """The DatabaseManager for a user's shard; raises KeyError for an unknown user."""
+        shard = self.shard_of(username)
+        if shard is None:
+            raise KeyError(username)
+        return self.open_shard(shard)
+
+    def register(self, username, shard):
+        self.catalog.execute("INSERT OR REPLACE INTO users (username, shard) VALUES (?, ?)", (username, shard))
+        self.catalog.commit()
+
+    def unregister(self, username):
+        self.catalog.execute("DELETE FROM users WHERE username = ?", (username,))
+        self.catalog.commit()
+
+    def close_shard(self, shard):
+        db = self._open.pop(shard, None)
+        if db is not None:
+            db.close()
+
+    def close(self):
+        for shard in list(self._open):
+            self.close_shard(shard)
+        self.catalog.close()
+
+    # -- Moving data in and out --
+    def split(self, db_file):
+        """
+        Copies every user of a single-file vault into this sharded vault. Returns
+        the number of users. The source is migrated to the current schema first,
+        so vaults written by older versions can be split as well.
+        """
+        source = DatabaseManager(db_file)
+        try:
+            users = [row[0] for row in source.conn.execute("SELECT username FROM users")]
+            storage_format = source.storage_format
+        finally:
+            source.close()
+        for username in users:
+            shard = self.shard_for(username)
+            db = self.open_shard(shard)
+            self._copy_user(db, db_file, username)
+            if db.storage_format != storage_format:
+                db.set_meta("storage_format", storage_format)
+                db.storage_format = storage_format
+                db.commit()
+            self.register(username, shard)
+        return len(users)
+
+    @staticmethod
+    def _copy_user(db, source_file, username):
+        """
+        Replaces a user's rows in ``db`` with the rows of a vault file, in one
+        transaction: the account, its entries and what hangs off them (earlier
+        passwords, tags, 2FA seeds). Tables the source predates are skipped.
+        Entries and tags keep their ids unless another user of the shard has
+        them (see _map_ids).
+        """
+        db.flush()  # ATTACH cannot run inside an open transaction
+        db.conn.execute("ATTACH DATABASE ? AS incoming", (source_file,))
+        try:
+            tables = {row[0] for row in db.conn.execute("SELECT name FROM incoming.sqlite_master WHERE type = 'table'")}
+            columns = {row[1] for row in db.conn.execute("PRAGMA incoming.table_info(passwords)")}
+            created_at = "created_at" in columns
+            with db.transaction():
+                db.conn.execute("DELETE FROM users WHERE username = ?", (username,))
+                db.conn.execute("INSERT INTO users (username, password, security_question, security_answer) "
+                                "SELECT username, password, security_question, security_answer "
+                                "FROM incoming.users WHERE username = ?", (username,))
+                _map_ids(db.conn, "passwords", "entry_ids", username)
+                db.conn.execute("INSERT INTO passwords (id, username, platform, platform_username, email, password"
+                                f"{', created_at' if created_at else ''}) "
+                                "SELECT k.new, p.username, p.platform, p.platform_username, p.email, p.password"
+                                f"{', p.created_at' if created_at else ''} "
+                                "FROM incoming.passwords p JOIN temp.entry_ids k ON k.old = p.id")
+                if "password_history" in tables:
+                    db.conn.execute("INSERT INTO password_history (entry_id, version, password, replaced_at) "
+                                    "SELECT k.new, h.version, h.password, h.replaced_at "
+                                    "FROM incoming.password_history h JOIN temp.entry_ids k ON k.old = h.entry_id")
+                if "tags" in tables:
+                    # Tag counters start at zero and are counted up by the entry_tags triggers.
+                    _map_ids(db.conn, "tags", "tag_ids", username)
+                    db.conn.execute("INSERT INTO tags (id, username, name) SELECT k.new, t.username, t.name "
+                                    "FROM incoming.tags t JOIN temp.tag_ids k ON k.old = t.id")
+                    db.conn.execute("INSERT INTO entry_tags (tag_id, entry_id) SELECT t.new, e.new "
+                                    "FROM incoming.entry_tags x JOIN temp.tag_ids t ON t.old = x.tag_id "
+                                    "JOIN temp.entry_ids e ON e.old = x.entry_id")
+                if "totp_secrets" in tables:
+                    db.conn.execute("INSERT INTO totp_secrets (entry_id, secret, digits, period, algorithm) "
+                                    "SELECT k.new, s.secret, s.digits, s.period, s.algorithm "
+                                    "FROM incoming.totp_secrets s JOIN temp.entry_ids k ON k.old = s.entry_id")
+        finally:
+            db.conn.execute("DROP TABLE IF EXISTS temp.entry_ids")
+            db.conn.execute("DROP TABLE IF EXISTS temp.tag_ids")
+            db.conn.execute("DETACH DATABASE incoming")
+
+    def backup_user(self, username, dest):
+        """Writes a standalone vault file holding only this user (consistent even while the shard is in use)."""
+        db = self.open_user(username)
+        target = sqlite3.connect(dest)
+        try:
+            db.conn.backup(target)
+            if self.buckets is not None:
+                # A bucket holds other users as well: keep only this one.
+                target.execute("PRAGMA foreign_keys = 1")
+                target.execute("DELETE FROM users WHERE username != ?", (username,))
+                target.commit()
+                target.execute("VACUUM")
+        finally:
+            target.close()
+        stats.increment("backup.bytes", os.path.getsize(dest))
+
+    def restore_user(self, username, source):
+        """Replaces this user's data with a file written by backup_user (or any vault file holding the user)."""
+        check = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        try:
+            if check.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is None:
+                raise ValueError(f"{source} has no account named {username}.")
+        finally:
+            check.close()
+        shard = self.shard_of(username) or self.shard_for(username)
+        if self.buckets is None:
+            # The shard is this user's alone: replace the whole file, keeping only this user.
+            self.close_shard(shard)
+            src, dst = sqlite3.connect(source), sqlite3.connect(os.path.join(self.directory, shard))
+            try:
+                src.backup(dst)
+                dst.execute("PRAGMA foreign_keys = 1")
+                dst.execute("DELETE FROM users WHERE username != ?", (username,))
+                dst.commit()
+            finally:
+                src.close()
+                dst.close()
+        else:
+            self._copy_user(self.open_shard(shard), source, username)
+        self.register(username, shard)
+
+class ShardedUserStore:
+    """UserStore for a sharded vault: the catalog answers lookups, the user's shard holds the account."""
+
+    def __init__(self, vault):
+        self.vault = vault
+
+    def exists(self, username):
+        return self.vault.shard_of(username) is not None
+
+    def list_users(self):
+        return [row[0] for row in self.vault.catalog.execute("SELECT username FROM users")]
+
+    def users_page(self, after=None, limit=PAGE_SIZE):
+        return users_page(self.vault.catalog, after, limit)
+
+    def signup(self, username, password, question, answer):
+        if self.exists(username):
+            return False
+        shard = self.vault.shard_for(username)
+        if not UserStore(self.vault.open_shard(shard)).signup(username, password, question, answer):
+            return False
+        self.vault.register(username, shard)
+        return True
+
+    def _store(self, username):
+        shard = self.vault.shard_of(username)
+        return UserStore(self.vault.open_shard(shard)) if shard else None
+
+    def login(self, username, password):
+        store = self._store(username)
+        return store is not None and store.login(username, password)
+
+    def get_security(self, username):
+        store = self._store(username)
+        return store.get_security(username) if store else None
+
+    def reset_password(self, username, new_password):
+        store = self._store(username)
+        return store is not None and store.reset_password(username, new_password)
+
+    def delete_account(self, username):
+        shard = self.vault.shard_of(username)
+        if shard is None:
+            return False
+        UserStore(self.vault.open_shard(shard)).delete_account(username)
+        self.vault.unregister(username)
+        if self.vault.buckets is None:
+            self.vault.close_shard(shard)
+            os.remove(os.path.join(self.vault.directory, shard))
+        return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split a vault into per-user shards and back up or restore one user.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    split = sub.add_parser("split", help="Copy every user of a single-file vault into a sharded vault.")
+    split.add_argument("db_file")
+    split.add_argument("directory")
+    split.add_argument("--buckets", type=int, help="Spread users over N files instead of one file per user.")
+    for name, text in (("backup", "Write one user's data to a vault file."),
+                       ("restore", "Replace one user's data with a vault file.")):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument("directory")
+        cmd.add_argument("username")
+        cmd.add_argument("file")
+    args = parser.parse_args(argv)
+
+    vault = ShardedVault(args.directory, getattr(args, "buckets", None))
+    try:
+        if args.command == "split":
+            print(f"Moved {vault.split(args.db_file)} users into {args.directory}")
+        elif args.command == "backup":
+            vault.backup_user(args.username, args.file)
+            print(f"Backed up {args.username} to {args.file}")
+        else:
+            vault.restore_user(args.username, args.file)
+            print(f"Restored {args.username} from {args.file}")
+    finally:
+        vault.close()
+
+if __name__ == "__main__":
+    main()
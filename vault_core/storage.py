@@ -0,0 +1,1088 @@
+"""
+SQLite storage shared by both frontends.
+
+Schema (column names follow the original command line frontend):
+  users      username, password (SHA-256 hex), security_question, security_answer
+  passwords  id, username (owner), platform, platform_username, email, password,
+             email_norm, platform_username_norm (generated, indexed: reverse lookups)
+             created_at, rotated_at (UNIX times, kept by triggers)
+  password_history
+             entry_id, version, password, replaced_at: earlier passwords of each
+             entry, recorded by a trigger and trimmed by prune_history
+  tags, entry_tags
+             tag names (with entry counts) per owner and the entries carrying
+             them; folders are tags named like 'work/clients' (see vault_core.tags)
+  totp_secrets
+             entry_id, secret (encrypted base32 seed), digits, period, algorithm:
+             two-factor codes for an entry (see vault_core.totp)
+  meta       key, value (vault-wide settings such as the storage format)
+  platform_summary
+             username, platform, entries, modified_at: one row per platform of
+             each owner, kept up to date by triggers on passwords
+  change_log, change_consumers
+             sequenced insert/update/delete events on users and passwords, and
+             how far each consumer has read them (see vault_core.changes)
+  sync_rows, sync_peers
+             the version of every row and each transport's position, for
+             two-way sync between vaults (see vault_core.replication)
+
+Schema changes are applied by the numbered functions in ``MIGRATIONS``; the
+number of migrations applied is kept in ``PRAGMA user_version``. Security
+questions, answers and platform passwords are encrypted with vault_core.crypto.
+
+Every store method commits on its own. To make many writes cost a single
+commit (one fsync), run them inside ``DatabaseManager.transaction()``:
+
+    with db.transaction():
+        for entry in entries:
+            passwords.add_password(owner, *entry)
+
+Long-running batch jobs can instead open the vault with ``group_commit=seconds``:
+commits are then deferred and issued at most once per window (or every
+``max_pending`` writes), and ``flush()``/``close()`` commit whatever is left.
+There is no timer: the window is only checked when the next write commits, so
+the last writes of a batch stay uncommitted, and the vault's write lock stays
+held, until ``flush()`` or ``close()``. Other connections to the file (a second
+frontend, the background history pruner) wait for that lock and fail with
+"database is locked" after their timeout, so flush as soon as a batch is done.
+"""
+import hashlib
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from vault_core import crypto
+from vault_core.instrumentation import connect
+
+DB_FILE = "database.db"
+# Rows per page for the paged listings; each page is one keyset query, however deep.
+PAGE_SIZE = 50
+
+def hash_password(password):
+    # For login passwords, we use a one-way SHA256 hash.
+    return hashlib.sha256(password.encode()).hexdigest()
+
+# -----------------------------
+# Migrations
+# -----------------------------
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _rename_gui_columns(conn):
+    """Vaults created by the old GUI used their own column names; rename them to the shared ones."""
+    renames = {
+        "users": {"security_q": "security_question", "security_a": "security_answer"},
+        "passwords": {"owner": "username", "platform_user": "platform_username", "pwd": "password"},
+    }
+    for table, columns in renames.items():
+        existing = table_columns(conn, table)
+        for old, new in columns.items():
+            if old in existing:
+                conn.execute(f"ALTER TABLE {table} RENAME COLUMN {old} TO {new}")
+
+NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+def _create_platform_summary(conn):
+    """
+    Per-owner platform counts and last-modified times, maintained by triggers so
+    listing platforms reads one row per platform instead of scanning every entry.
+    """
+    conn.execute('''
+        CREATE TABLE platform_summary (
+            username TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            entries INTEGER NOT NULL,
+            modified_at INTEGER NOT NULL,
+            PRIMARY KEY (username, platform)
+        ) WITHOUT ROWID
+    ''')
+    add = f'''
+        INSERT INTO platform_summary (username, platform, entries, modified_at)
+        VALUES (NEW.username, NEW.platform, 1, {NOW})
+        ON CONFLICT (username, platform) DO UPDATE SET entries = entries + 1, modified_at = excluded.modified_at;
+    '''
+    remove = f'''
+        UPDATE platform_summary SET entries = entries - 1, modified_at = {NOW}
+        WHERE username = OLD.username AND platform = OLD.platform;
+        DELETE FROM platform_summary WHERE username = OLD.username AND platform = OLD.platform AND entries <= 0;
+    '''
+    conn.execute(f"CREATE TRIGGER platform_summary_insert AFTER INSERT ON passwords BEGIN {add} END")
+    conn.execute(f"CREATE TRIGGER platform_summary_delete AFTER DELETE ON passwords BEGIN {remove} END")
+    conn.execute(f'''
+        CREATE TRIGGER platform_summary_move AFTER UPDATE OF username, platform ON passwords
+        WHEN OLD.username IS NOT NEW.username OR OLD.platform IS NOT NEW.platform
+        BEGIN {remove} {add} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER platform_summary_touch AFTER UPDATE OF platform_username, email, password ON passwords
+        WHEN OLD.username IS NEW.username AND OLD.platform IS NEW.platform
+        BEGIN
+            UPDATE platform_summary SET modified_at = {NOW} WHERE username = NEW.username AND platform = NEW.platform;
+        END
+    ''')
+    conn.execute(f'''
+        INSERT INTO platform_summary (username, platform, entries, modified_at)
+        SELECT username, platform, COUNT(*), {NOW} FROM passwords GROUP BY username, platform
+    ''')
+
+def _index_entry_keys(conn):
+    """An entry is identified by owner, platform and platform username (merges and per-platform lookups)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS passwords_entry_key ON passwords (username, platform, platform_username)")
+
+def _create_change_log(conn):
+    """
+    A sequenced log of inserts, updates and deletes on users and passwords, read
+    through vault_core.changes. Nothing is logged while no consumer is registered.
+    """
+    conn.execute('''
+        CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,
+            username TEXT NOT NULL,
+            entry_id INTEGER,
+            changed_at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("CREATE TABLE change_consumers (name TEXT PRIMARY KEY, acked_seq INTEGER NOT NULL)")
+    for table, entry_id in (("users", "NULL"), ("passwords", "{row}.id")):
+        for op, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+            conn.execute(f'''
+                CREATE TRIGGER change_log_{table}_{op} AFTER {op.upper()} ON {table}
+                WHEN EXISTS (SELECT 1 FROM change_consumers)
+                BEGIN
+                    INSERT INTO change_log (table_name, op, username, entry_id, changed_at)
+                    VALUES ('{table}', '{op}', {row}.username, {entry_id.format(row=row)}, {NOW});
+                END
+            ''')
+
+def _create_sync_tables(conn):
+    """Row versions and per-transport positions for two-way sync (vault_core.replication)."""
+    conn.execute('''
+        CREATE TABLE sync_rows (
+            uid TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            local_key,
+            hlc TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (table_name, local_key)
+        )
+    ''')
+    conn.execute("CREATE INDEX sync_rows_origin ON sync_rows (origin, hlc)")
+    conn.execute('''
+        CREATE TABLE sync_peers (
+            transport TEXT NOT NULL,
+            node TEXT NOT NULL,
+            position TEXT NOT NULL,
+            PRIMARY KEY (transport, node)
+        )
+    ''')
+
+def normalized_email_sql(expr):
+    """
+    SQL for an email address compared loosely: trimmed, lower-cased, and with
+    any '+tag' in the local part dropped (User+shop@Mail.com -> user@mail.com).
+    """
+    e = f"lower(trim({expr}))"
+    at, plus = f"instr({e}, '@')", f"instr({e}, '+')"
+    return f"CASE WHEN {plus} > 1 AND {plus} < {at} THEN substr({e}, 1, {plus} - 1) || substr({e}, {at}) ELSE {e} END"
+
+def normalized_name_sql(expr):
+    return f"lower(trim({expr}))"
+
+def _add_identity_columns(conn):
+    """Normalised email and platform username as indexed generated columns, for reverse lookups."""
+    conn.execute(f"ALTER TABLE passwords ADD COLUMN email_norm TEXT GENERATED ALWAYS AS "
+                 f"({normalized_email_sql('email')}) VIRTUAL")
+    conn.execute(f"ALTER TABLE passwords ADD COLUMN platform_username_norm TEXT GENERATED ALWAYS AS "
+                 f"({normalized_name_sql('platform_username')}) VIRTUAL")
+    conn.execute("CREATE INDEX passwords_email_norm ON passwords (username, email_norm)")
+    conn.execute("CREATE INDEX passwords_platform_username_norm ON passwords (username, platform_username_norm)")
+
+def token_time(value):
+    """SQL function vault_token_time(): when a stored secret was encrypted, or NULL if it cannot be read."""
+    try:
+        return crypto.encryption_timestamp(value)
+    except Exception:
+        return None
+
+def _add_rotation_times(conn):
+    """
+    created_at and rotated_at for every entry. Both come from the timestamp every
+    encrypted value carries, so re-encryption, merges and sync keep an entry's
+    real rotation time; existing entries are backfilled the same way.
+    """
+    conn.execute("ALTER TABLE passwords ADD COLUMN created_at INTEGER")
+    conn.execute("ALTER TABLE passwords ADD COLUMN rotated_at INTEGER")
+    conn.execute(f"UPDATE passwords SET created_at = COALESCE(vault_token_time(password), {NOW})")
+    conn.execute("UPDATE passwords SET rotated_at = created_at")
+    conn.execute("CREATE INDEX passwords_rotated_at ON passwords (username, rotated_at)")
+    conn.execute(f'''
+        CREATE TRIGGER passwords_created AFTER INSERT ON passwords
+        BEGIN
+            UPDATE passwords SET created_at = COALESCE(NEW.created_at, vault_token_time(NEW.password), {NOW}),
+                                 rotated_at = COALESCE(vault_token_time(NEW.password), {NOW})
+            WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER passwords_rotated AFTER UPDATE OF password ON passwords
+        WHEN NEW.password IS NOT OLD.password
+        BEGIN
+            UPDATE passwords SET rotated_at = COALESCE(vault_token_time(NEW.password), {NOW}) WHERE id = NEW.id;
+        END
+    ''')
+    # Timestamp bookkeeping is not a change: log updates of the entry's content only.
+    conn.execute("DROP TRIGGER change_log_passwords_update")
+    conn.execute(f'''
+        CREATE TRIGGER change_log_passwords_update
+        AFTER UPDATE OF username, platform, platform_username, email, password ON passwords
+        WHEN EXISTS (SELECT 1 FROM change_consumers)
+        BEGIN
+            INSERT INTO change_log (table_name, op, username, entry_id, changed_at)
+            VALUES ('passwords', 'update', NEW.username, NEW.id, {NOW});
+        END
+    ''')
+
+def _create_password_history(conn):
+    """
+    Earlier passwords of each entry, numbered per entry. A password counts as
+    replaced when the new value was encrypted at a different time, so
+    re-encrypting into another storage format does not add history.
+    """
+    conn.execute('''
+        CREATE TABLE password_history (
+            entry_id INTEGER NOT NULL REFERENCES passwords(id) ON DELETE CASCADE,
+            version INTEGER NOT NULL,
+            password NOT NULL,
+            replaced_at INTEGER NOT NULL,
+            PRIMARY KEY (entry_id, version)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER password_history_record AFTER UPDATE OF password ON passwords
+        WHEN NEW.password IS NOT OLD.password AND vault_token_time(NEW.password) IS NOT vault_token_time(OLD.password)
+        BEGIN
+            INSERT INTO password_history (entry_id, version, password, replaced_at)
+            VALUES (OLD.id, COALESCE((SELECT MAX(version) FROM password_history WHERE entry_id = OLD.id), 0) + 1,
+                    OLD.password, {NOW});
+        END
+    ''')
+
+def _create_tags(conn):
+    """
+    Tags (and folders: tags named like 'work/clients') per owner, and which
+    entries carry them. Triggers keep each tag's entry count and bump its
+    generation on every change, so cached bitmaps (see vault_core.tags) know
+    when to reload. Tag ids are never reused, for the same reason.
+    """
+    conn.execute('''
+        CREATE TABLE tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            entries INTEGER NOT NULL DEFAULT 0,
+            generation INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (username, name)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE entry_tags (
+            tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+            entry_id INTEGER NOT NULL REFERENCES passwords(id) ON DELETE CASCADE,
+            PRIMARY KEY (tag_id, entry_id)
+        ) WITHOUT ROWID
+    ''')
+    # Lists an entry's tags, and keeps the cascade from a deleted entry a seek.
+    conn.execute("CREATE INDEX entry_tags_entry ON entry_tags (entry_id)")
+    for op, row, delta in (("insert", "NEW", "+ 1"), ("delete", "OLD", "- 1")):
+        conn.execute(f'''
+            CREATE TRIGGER entry_tags_{op} AFTER {op.upper()} ON entry_tags
+            BEGIN
+                UPDATE tags SET entries = entries {delta}, generation = generation + 1 WHERE id = {row}.tag_id;
+            END
+        ''')
+
+def _create_totp_secrets(conn):
+    """Encrypted TOTP (RFC 6238) seeds, at most one per entry, with the code parameters."""
+    conn.execute('''
+        CREATE TABLE totp_secrets (
+            entry_id INTEGER PRIMARY KEY REFERENCES passwords(id) ON DELETE CASCADE,
+            secret NOT NULL,
+            digits INTEGER NOT NULL DEFAULT 6,
+            period INTEGER NOT NULL DEFAULT 30,
+            algorithm TEXT NOT NULL DEFAULT 'SHA1'
+        )
+    ''')
+
+def _record_every_password_change(conn):
+    """
+    Records every replaced password. The first history trigger told an edit
+    from a re-encryption by the values' encryption times, which have one-second
+    resolution, so an edit in the same second as the previous write was lost;
+    re-encryption now switches recording off instead (see migrate_storage_format).
+    """
+    conn.execute("DROP TRIGGER password_history_record")
+    conn.execute(f'''
+        CREATE TRIGGER password_history_record AFTER UPDATE OF password ON passwords
+        WHEN NEW.password IS NOT OLD.password AND vault_recording_history()
+        BEGIN
+            INSERT INTO password_history (entry_id, version, password, replaced_at)
+            VALUES (OLD.id, COALESCE((SELECT MAX(version) FROM password_history WHERE entry_id = OLD.id), 0) + 1,
+                    OLD.password, {NOW});
+        END
+    ''')
+
+def _create_platform_generations(conn):
+    """
+    A per-owner counter that moves on whenever one of the owner's platforms
+    appears or disappears, so a cached platform list (vault_core.platforms) can
+    tell with one lookup whether it is stale, whichever connection wrote.
+    """
+    conn.execute('''
+        CREATE TABLE platform_generations (
+            username TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    bump = '''
+        INSERT INTO platform_generations (username, generation) VALUES ({row}.username, 1)
+        ON CONFLICT (username) DO UPDATE SET generation = generation + 1;
+    '''
+    # platform_summary only gains or loses a row when a platform appears or disappears.
+    conn.execute(f"CREATE TRIGGER platform_generations_insert AFTER INSERT ON platform_summary BEGIN {bump.format(row='NEW')} END")
+    conn.execute(f"CREATE TRIGGER platform_generations_delete AFTER DELETE ON platform_summary BEGIN {bump.format(row='OLD')} END")
+
+def _log_extra_changes(conn):
+    """
+    Logs a change to an entry's tags or TOTP seed as an update of the entry, and
+    a change to an owner's tags as an update of the account, so change-log
+    consumers (replication) pick them up. Rows removed along with their entry or
+    account are not logged: that delete already is.
+    """
+    log = f'''
+        INSERT INTO change_log (table_name, op, username, entry_id, changed_at)
+        SELECT '{{table}}', 'update', username, {{entry_id}}, {NOW} FROM {{table}} WHERE {{match}};
+    '''
+    entry = log.format(table="passwords", entry_id="id", match="id = {row}.entry_id")
+    account = log.format(table="users", entry_id="NULL", match="username = {row}.username")
+    triggers = [("totp_secrets", op, row, entry) for op, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD"))]
+    triggers += [("entry_tags", op, row, entry) for op, row in (("insert", "NEW"), ("delete", "OLD"))]
+    triggers += [("tags", op, row, account) for op, row in (("insert", "NEW"), ("delete", "OLD"))]
+    for table, op, row, body in triggers:
+        conn.execute(f'''
+            CREATE TRIGGER change_log_{table}_{op} AFTER {op.upper()} ON {table}
+            WHEN EXISTS (SELECT 1 FROM change_consumers)
+            BEGIN {body.format(row=row)} END
+        ''')
+    # A renamed tag changes the account's tag list and every entry carrying it.
+    conn.execute(f'''
+        CREATE TRIGGER change_log_tags_rename AFTER UPDATE OF name ON tags
+        WHEN EXISTS (SELECT 1 FROM change_consumers)
+        BEGIN
+            {account.format(row="NEW")}
+            INSERT INTO change_log (table_name, op, username, entry_id, changed_at)
+            SELECT 'passwords', 'update', p.username, p.id, {NOW}
+            FROM entry_tags e JOIN passwords p ON p.id = e.entry_id WHERE e.tag_id = NEW.id;
+        END
+    ''')
+
+# Migration i brings a vault from user_version i to i + 1. Append only.
+MIGRATIONS = [
+    _rename_gui_columns,
+    _create_platform_summary,
+    _index_entry_keys,
+    _create_change_log,
+    _create_sync_tables,
+    _add_identity_columns,
+    _add_rotation_times,
+    _create_password_history,
+    _create_tags,
+    _create_totp_secrets,
+    _create_platform_generations,
+    _record_every_password_change,
+    _log_extra_changes,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# -----------------------------
+# Database
+# -----------------------------
+class DatabaseManager:
+    def __init__(self, db_file=DB_FILE, group_commit=None, max_pending=1000):
+        self.path = db_file
+        self.group_commit = group_commit
+        self.max_pending = max_pending
+        self._depth = 0
+        self._pending = 0
+        self._pending_since = None
+        # Cleared while rewriting passwords that did not change (re-encryption), so they add no history.
+        self.recording_history = True
+        self.conn = self._connect()
+        self.create_tables()
+        self.migrate()
+        # A vault that has been migrated keeps writing in the format it was migrated to. Kept per vault:
+        # several vaults (shards, replicas) may be open at once, each in its own format.
+        self.storage_format = crypto.check_storage_format(
+            self.get_meta("storage_format", crypto.DEFAULT_STORAGE_FORMAT))
+
+    def _connect(self):
+        # Statements are timed whenever stats are enabled, even if that happens later (see vault_core.instrumentation).
+        conn = connect(self.path)
+        conn.execute("PRAGMA foreign_keys = 1")
+        # Used by the rotation-time triggers; registered before migrating, which may backfill with it.
+        conn.create_function("vault_token_time", 1, token_time, deterministic=True)
+        conn.create_function("vault_recording_history", 0, lambda: self.recording_history)
+        return conn
+
+    def create_tables(self):
+        c = self.conn.cursor()
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                security_question TEXT NOT NULL,
+                security_answer TEXT NOT NULL
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS passwords (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                platform_username TEXT NOT NULL,
+                email TEXT NOT NULL,
+                password TEXT NOT NULL,
+                FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def schema_version(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        """Applies the migrations this vault has not seen yet, each in its own transaction."""
+        version = self.schema_version()
+        for number in range(version, SCHEMA_VERSION):
+            try:
+                self.conn.execute("BEGIN")
+                MIGRATIONS[number](self.conn)
+                self.conn.execute(f"PRAGMA user_version = {number + 1}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    # -----------------------------
+    # Commits and transactions
+    # -----------------------------
+    def commit(self):
+        """
+        Commits the writes made so far. Inside a transaction() block this does
+        nothing (the outermost block commits); with group commit enabled the
+        commit is deferred until a later call finds the window elapsed or
+        ``max_pending`` writes waiting. Until then the write lock stays held:
+        call flush() when the batch is done.
+        """
+        if self._depth:
+            return
+        if self.group_commit is None:
+            self.conn.commit()
+            return
+        now = time.monotonic()
+        if self._pending_since is None:
+            self._pending_since = now
+        self._pending += 1
+        if now - self._pending_since >= self.group_commit or self._pending >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        """Commits any writes deferred by group commit."""
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self._pending = 0
+        self._pending_since = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the block as one unit of work: its writes are committed together when
+        the outermost block exits, or all rolled back if it raises. Nested blocks
+        are savepoints, so an inner block that raises only undoes its own writes.
+        """
+        if self._depth == 0:
+            self.flush()
+            self.conn.execute("BEGIN")
+        else:
+            self.conn.execute(f"SAVEPOINT unit_{self._depth}")
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.rollback()
+            else:
+                self.conn.execute(f"ROLLBACK TO unit_{self._depth}")
+                self.conn.execute(f"RELEASE unit_{self._depth}")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.commit()
+        else:
+            self.conn.execute(f"RELEASE unit_{self._depth}")
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def migrate_storage_format(self, target):
+        """
+        Re-encrypts every security question/answer, platform password and TOTP seed into the
+        target storage format in a single transaction, then vacuums the file so the
+        space saved by the binary format is returned to the OS.
+        Returns the number of values rewritten.
+        """
+        crypto.check_storage_format(target)
+        with self.transaction():
+            cur = self.conn.cursor()
+            cur.execute("SELECT username, security_question, security_answer FROM users")
+            users = [(crypto.reencrypt_data(q, target), crypto.reencrypt_data(a, target), username)
+                     for username, q, a in cur.fetchall()
+                     if crypto.storage_format_of(q) != target or crypto.storage_format_of(a) != target]
+            cur.execute("SELECT id, password FROM passwords")
+            passwords = [(crypto.reencrypt_data(pwd, target), pwd_id)
+                         for pwd_id, pwd in cur.fetchall() if crypto.storage_format_of(pwd) != target]
+            cur.execute("SELECT entry_id, version, password FROM password_history")
+            history = [(crypto.reencrypt_data(pwd, target), entry_id, version)
+                       for entry_id, version, pwd in cur.fetchall() if crypto.storage_format_of(pwd) != target]
+            cur.execute("SELECT entry_id, secret FROM totp_secrets")
+            seeds = [(crypto.reencrypt_data(secret, target), entry_id)
+                     for entry_id, secret in cur.fetchall() if crypto.storage_format_of(secret) != target]
+            cur.executemany("UPDATE users SET security_question = ?, security_answer = ? WHERE username = ?", users)
+            self.recording_history = False
+            try:
+                cur.executemany("UPDATE passwords SET password = ? WHERE id = ?", passwords)
+            finally:
+                self.recording_history = True
+            cur.executemany("UPDATE password_history SET password = ? WHERE entry_id = ? AND version = ?", history)
+            cur.executemany("UPDATE totp_secrets SET secret = ? WHERE entry_id = ?", seeds)
+            self.set_meta("storage_format", target)
+        self.storage_format = target
+        self.flush()
+        self.conn.execute("VACUUM")
+        return len(users) * 2 + len(passwords) + len(history) + len(seeds)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# -----------------------------
+# Password history retention
+# -----------------------------
+HISTORY_KEEP = 10         # earlier passwords kept per entry unless the vault sets 'history_keep'
+HISTORY_PRUNE_BATCH = 1000
+
+def history_keep(db):
+    return int(db.get_meta("history_keep", HISTORY_KEEP))
+
+def prune_history(db, keep=None, batch_size=HISTORY_PRUNE_BATCH):
+    """
+    Deletes all but the newest ``keep`` earlier passwords of every entry (default:
+    the vault's 'history_keep' setting). Works in batches, each its own short
+    transaction, so it can run in the background next to normal use. Returns the
+    number of versions deleted.
+    """
+    keep = history_keep(db) if keep is None else keep
+    deleted = 0
+    while True:
+        with db.transaction():
+            cur = db.conn.execute('''
+                DELETE FROM password_history WHERE (entry_id, version) IN (
+                    SELECT h.entry_id, h.version FROM password_history h
+                    WHERE h.version <= (SELECT MAX(version) FROM password_history WHERE entry_id = h.entry_id) - ?
+                    LIMIT ?)
+            ''', (keep, batch_size))
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            return deleted
+
+# -----------------------------
+# Shadow-table import
+# -----------------------------
+class StagingError(ValueError):
+    """Imported data failed validation; the vault was left unchanged."""
+
+def _decrypts(value):
+    try:
+        crypto.decrypt_data(value)
+        return 1
+    except Exception:
+        return 0
+
+class VaultExtra:
+    """
+    A table hanging off accounts or entries that exports and backups carry and
+    an import restores. Its rows travel as ``columns``, the first naming what
+    they hang off ('username' or 'entry_id'): ``source`` selects them from the
+    live tables and the ``copy`` statements write them back from
+    temp.<name>_import. The ``merge`` statements add them to an existing vault
+    instead (see vault_core.merge), with staged entry ids mapped to local ones
+    through temp.merged_entries. ``what`` names them in validation errors.
+    """
+
+    def __init__(self, name, columns, key, source, copy, merge, encrypted=None, what="rows"):
+        self.name = name
+        self.columns = columns
+        self.key = key
+        self.source = source
+        self.copy = copy
+        self.merge = merge
+        self.encrypted = encrypted
+        self.what = what
+
+    @property
+    def parent(self):
+        return self.columns[0]
+
+VAULT_EXTRAS = {extra.name: extra for extra in (
+    VaultExtra("password_history", ("entry_id", "version", "password", "replaced_at"), "entry_id, version",
+               "SELECT entry_id, version, password, replaced_at FROM password_history",
+               ["INSERT INTO password_history (entry_id, version, password, replaced_at) "
+                "SELECT entry_id, version, password, replaced_at FROM temp.password_history_import"],
+               # Numbered after the local versions; ones the local entry already holds (a shared past) are skipped.
+               ["INSERT INTO password_history (entry_id, version, password, replaced_at) "
+                "SELECT m.live_id, COALESCE((SELECT MAX(version) FROM password_history WHERE entry_id = m.live_id), 0) "
+                "+ x.version, x.password, x.replaced_at "
+                "FROM temp.password_history_import x JOIN temp.merged_entries m ON m.staged_id = x.entry_id "
+                "WHERE NOT EXISTS (SELECT 1 FROM password_history h "
+                "WHERE h.entry_id = m.live_id AND h.password = x.password)"],
+               encrypted="password", what="earlier passwords"),
+    VaultExtra("totp_secrets", ("entry_id", "secret", "digits", "period", "algorithm"), "entry_id",
+               "SELECT entry_id, secret, digits, period, algorithm FROM totp_secrets",
+               ["INSERT INTO totp_secrets (entry_id, secret, digits, period, algorithm) "
+                "SELECT entry_id, secret, digits, period, algorithm FROM temp.totp_secrets_import"],
+               ["INSERT OR REPLACE INTO totp_secrets (entry_id, secret, digits, period, algorithm) "
+                "SELECT m.live_id, x.secret, x.digits, x.period, x.algorithm "
+                "FROM temp.totp_secrets_import x JOIN temp.merged_entries m ON m.staged_id = x.entry_id"],
+               encrypted="secret", what="2FA seeds"),
+    # Tags travel by name: tag ids are never reused, so the swapped-in tags get new ones.
+    VaultExtra("tags", ("username", "name"), "username, name",
+               "SELECT username, name FROM tags",
+               ["INSERT INTO tags (username, name) SELECT username, name FROM temp.tags_import"],
+               ["INSERT OR IGNORE INTO tags (username, name) SELECT username, name FROM temp.tags_import"],
+               what="tags"),
+    VaultExtra("entry_tags", ("entry_id", "tag"), "entry_id, tag",
+               "SELECT e.entry_id, t.name AS tag FROM entry_tags e JOIN tags t ON t.id = e.tag_id",
+               ["INSERT OR IGNORE INTO tags (username, name) SELECT DISTINCT p.username, x.tag "
+                "FROM temp.entry_tags_import x JOIN passwords p ON p.id = x.entry_id",
+                "INSERT INTO entry_tags (tag_id, entry_id) SELECT t.id, x.entry_id FROM temp.entry_tags_import x "
+                "JOIN passwords p ON p.id = x.entry_id JOIN tags t ON t.username = p.username AND t.name = x.tag"],
+               ["INSERT OR IGNORE INTO tags (username, name) SELECT DISTINCT p.username, x.tag "
+                "FROM temp.entry_tags_import x JOIN temp.merged_entries m ON m.staged_id = x.entry_id "
+                "JOIN passwords p ON p.id = m.live_id",
+                "INSERT OR IGNORE INTO entry_tags (tag_id, entry_id) SELECT t.id, m.live_id "
+                "FROM temp.entry_tags_import x JOIN temp.merged_entries m ON m.staged_id = x.entry_id "
+                "JOIN passwords p ON p.id = m.live_id JOIN tags t ON t.username = p.username AND t.name = x.tag"],
+               what="entry tags"),
+)}
+
+# The id a new entry gets when ids are assigned up front (so rows hanging off it can be written
+# with executemany too): after the highest id ever used, as AUTOINCREMENT would.
+NEXT_ENTRY_ID_SQL = ("SELECT MAX(COALESCE((SELECT MAX(id) FROM passwords), 0), "
+                     "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'passwords'), 0)) + 1")
+
+def _stage_extra(conn, extra):
+    conn.execute(f"CREATE TEMP TABLE {extra.name}_import ({', '.join(extra.columns)}, PRIMARY KEY ({extra.key}))")
+
+def stage_import(db, users, passwords, extras=None):
+    """
+    Loads (username, password hash, question, answer) and (id, username, platform,
+    platform_username, email, password) rows into TEMP staging tables. They live in
+    the connection's temporary database, so loading takes no lock on the vault file.
+    ``extras`` maps names of VAULT_EXTRAS to their rows; one left out is not part
+    of the import. Returns the number of rows staged for accounts and entries.
+    """
+    conn = db.conn
+    drop_staging(db)
+    conn.execute("CREATE TEMP TABLE users_import (username TEXT PRIMARY KEY, password TEXT, "
+                 "security_question, security_answer)")
+    conn.execute("CREATE TEMP TABLE passwords_import (id INTEGER PRIMARY KEY, username TEXT, platform TEXT, "
+                 "platform_username TEXT, email TEXT, password)")
+    extras = {VAULT_EXTRAS[name]: rows for name, rows in (extras or {}).items() if rows is not None}
+    for extra in extras:
+        _stage_extra(conn, extra)
+    try:
+        with db.transaction():
+            conn.executemany("INSERT INTO temp.users_import VALUES (?, ?, ?, ?)", users)
+            conn.executemany("INSERT INTO temp.passwords_import VALUES (?, ?, ?, ?, ?, ?)", passwords)
+            for extra, rows in extras.items():
+                marks = ", ".join("?" * len(extra.columns))
+                conn.executemany(f"INSERT INTO temp.{extra.name}_import VALUES ({marks})", rows)
+    except sqlite3.IntegrityError as e:
+        raise StagingError(f"Duplicate row in import: {e}") from e
+    return (conn.execute("SELECT COUNT(*) FROM temp.users_import").fetchone()[0],
+            conn.execute("SELECT COUNT(*) FROM temp.passwords_import").fetchone()[0])
+
+def validate_staging(db):
+    """Checks the staged rows in bulk: required fields, account references and that every secret decrypts."""
+    conn = db.conn
+    conn.create_function("vault_decrypts", 1, _decrypts, deterministic=True)
+    checks = [
+        ("users without a username or password hash",
+         "SELECT COUNT(*) FROM temp.users_import WHERE username IS NULL OR username = '' OR password IS NULL"),
+        ("entries with a missing field",
+         "SELECT COUNT(*) FROM temp.passwords_import WHERE username IS NULL OR platform IS NULL "
+         "OR platform_username IS NULL OR email IS NULL OR password IS NULL"),
+        ("entries whose account is not in the import",
+         "SELECT COUNT(*) FROM temp.passwords_import p LEFT JOIN temp.users_import u USING (username) "
+         "WHERE u.username IS NULL"),
+        ("security questions or answers that do not decrypt with this vault's key",
+         "SELECT COUNT(*) FROM temp.users_import "
+         "WHERE NOT vault_decrypts(security_question) OR NOT vault_decrypts(security_answer)"),
+        ("passwords that do not decrypt with this vault's key",
+         "SELECT COUNT(*) FROM temp.passwords_import WHERE NOT vault_decrypts(password)"),
+    ]
+    for extra in staged_extras(conn):
+        staged = f"temp.{extra.name}_import"
+        parent = ("temp.passwords_import p ON p.id = x.entry_id" if extra.parent == "entry_id"
+                  else "temp.users_import p ON p.username = x.username")
+        checks += [
+            (f"{extra.what} with a missing field",
+             f"SELECT COUNT(*) FROM {staged} WHERE {' OR '.join(c + ' IS NULL' for c in extra.columns)}"),
+            (f"{extra.what} whose {'entry' if extra.parent == 'entry_id' else 'account'} is not in the import",
+             f"SELECT COUNT(*) FROM {staged} x LEFT JOIN {parent} WHERE p.{extra.parent.split('_')[-1]} IS NULL"),
+        ]
+        if extra.encrypted:
+            checks.append((f"{extra.what} that do not decrypt with this vault's key",
+                           f"SELECT COUNT(*) FROM {staged} WHERE NOT vault_decrypts({extra.encrypted})"))
+    for description, sql in checks:
+        bad = conn.execute(sql).fetchone()[0]
+        if bad:
+            raise StagingError(f"{bad} {description}.")
+
+def staged_extras(conn):
+    """The VAULT_EXTRAS that the current import includes."""
+    staged = {row[0] for row in conn.execute("SELECT name FROM sqlite_temp_master WHERE type = 'table'")}
+    return [extra for extra in VAULT_EXTRAS.values() if f"{extra.name}_import" in staged]
+
+def swap_in_staging(db, expected):
+    """
+    Replaces the live tables with the staged rows in one transaction. Other
+    connections keep reading the old data until it commits. ``expected`` is the
+    (users, passwords) count returned by stage_import. VAULT_EXTRAS the import
+    did not include (an older export or backup) are kept for each account in
+    the import and each entry that is still there afterwards: same id, owner,
+    platform and platform username.
+    """
+    conn = db.conn
+    try:
+        with db.transaction():
+            staged = staged_extras(conn)
+            for extra in VAULT_EXTRAS.values():
+                if extra not in staged:
+                    _stage_extra(conn, extra)
+                    if extra.parent == "entry_id":
+                        survivors = '''JOIN passwords p ON p.id = x.entry_id
+                            JOIN temp.passwords_import i ON i.id = p.id AND i.username IS p.username
+                                AND i.platform IS p.platform AND i.platform_username IS p.platform_username'''
+                    else:
+                        survivors = "JOIN temp.users_import i ON i.username = x.username"
+                    conn.execute(f"INSERT INTO temp.{extra.name}_import SELECT x.* FROM ({extra.source}) x {survivors}")
+            conn.execute("DELETE FROM passwords")
+            conn.execute("DELETE FROM users")
+            users = conn.execute("INSERT INTO users (username, password, security_question, security_answer) "
+                                 "SELECT username, password, security_question, security_answer "
+                                 "FROM temp.users_import").rowcount
+            passwords = conn.execute("INSERT INTO passwords (id, username, platform, platform_username, email, password) "
+                                     "SELECT id, username, platform, platform_username, email, password "
+                                     "FROM temp.passwords_import").rowcount
+            if (users, passwords) != tuple(expected):
+                raise StagingError(f"Expected {expected[0]} users and {expected[1]} entries, "
+                                   f"copied {users} and {passwords}.")
+            for extra in VAULT_EXTRAS.values():
+                for sql in extra.copy:
+                    conn.execute(sql)
+    finally:
+        drop_staging(db)
+
+def drop_staging(db):
+    db.conn.execute("DROP TABLE IF EXISTS temp.users_import")
+    db.conn.execute("DROP TABLE IF EXISTS temp.passwords_import")
+    for name in VAULT_EXTRAS:
+        db.conn.execute(f"DROP TABLE IF EXISTS temp.{name}_import")
+    db.conn.execute("DROP TABLE IF EXISTS temp.merged_entries")
+
+def vault_extras(db):
+    """Every row of the VAULT_EXTRAS, as {name: rows}: what exports and backups carry besides accounts and entries."""
+    return {name: db.conn.execute(f"SELECT * FROM ({extra.source}) ORDER BY {extra.key}").fetchall()
+            for name, extra in VAULT_EXTRAS.items()}
+
+def replace_vault(db, users, passwords, extras=None):
+    """
+    Stages, validates and swaps in a complete set of accounts and entries, with
+    the VAULT_EXTRAS rows in ``extras`` (see stage_import). Returns (users, passwords) counts.
+    """
+    counts = stage_import(db, users, passwords, extras)
+    try:
+        validate_staging(db)
+    except StagingError:
+        drop_staging(db)
+        raise
+    swap_in_staging(db, counts)
+    return counts
+
+# -----------------------------
+# Accounts and entries
+# -----------------------------
+def users_page(conn, after=None, limit=PAGE_SIZE):
+    """Keyset page of a users table (a vault's, or a shard catalog's): seeks the username index, never skips rows."""
+    if after is None:
+        return [row[0] for row in conn.execute("SELECT username FROM users ORDER BY username LIMIT ?", (limit,))]
+    return [row[0] for row in conn.execute("SELECT username FROM users WHERE username > ? ORDER BY username LIMIT ?",
+                                           (after, limit))]
+
+class UserStore:
+    """Vault accounts: signup, login and recovery through the security question."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def exists(self, username):
+        return self.db.conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+    def list_users(self):
+        return [row[0] for row in self.db.conn.execute("SELECT username FROM users")]
+
+    def users_page(self, after=None, limit=PAGE_SIZE):
+        """Up to ``limit`` usernames sorted after ``after`` (the last one of the previous page)."""
+        return users_page(self.db.conn, after, limit)
+
+    def signup(self, username, password, question, answer):
+        """Creates the account; returns False if the username is taken."""
+        if self.exists(username):
+            return False
+        self.db.conn.execute(
+            "INSERT INTO users (username, password, security_question, security_answer) VALUES (?, ?, ?, ?)",
+            (username, hash_password(password), crypto.encrypt_data(question, storage_format=self.db.storage_format),
+             crypto.encrypt_data(answer, storage_format=self.db.storage_format)))
+        self.db.commit()
+        return True
+
+    def login(self, username, password):
+        row = self.db.conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        return row is not None and row[0] == hash_password(password)
+
+    def get_security(self, username):
+        """Returns the decrypted (question, answer), or None for an unknown user."""
+        row = self.db.conn.execute(
+            "SELECT security_question, security_answer FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        return crypto.decrypt_data(row[0]), crypto.decrypt_data(row[1])
+
+    def reset_password(self, username, new_password):
+        cur = self.db.conn.execute("UPDATE users SET password = ? WHERE username = ?",
+                                   (hash_password(new_password), username))
+        self.db.commit()
+        return cur.rowcount > 0
+
+    def delete_account(self, username):
+        """Deletes the account; its saved passwords go with it (ON DELETE CASCADE)."""
+        cur = self.db.conn.execute("DELETE FROM users WHERE username = ?", (username,))
+        self.db.commit()
+        return cur.rowcount > 0
+
+class PasswordStore:
+    """Saved platform credentials. Passwords are encrypted on the way in and decrypted on the way out."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def add_password(self, owner, platform, platform_username, email, password):
+        cur = self.db.conn.execute(
+            "INSERT INTO passwords (username, platform, platform_username, email, password) VALUES (?, ?, ?, ?, ?)",
+            (owner, platform, platform_username, email,
+             crypto.encrypt_data(password, storage_format=self.db.storage_format)))
+        self.db.commit()
+        return cur.lastrowid
+
+    def list_platforms(self, owner):
+        """Returns the owner's platforms, sorted."""
+        return [row[0] for row in self.db.conn.execute(
+            "SELECT platform FROM platform_summary WHERE username = ? ORDER BY platform", (owner,))]
+
+    def platform_summary(self, owner):
+        """Returns [(platform, entry count, last modified UNIX time)] sorted by platform."""
+        # The primary key order, so sorting costs nothing; callers bisect over the result.
+        return self.db.conn.execute(
+            "SELECT platform, entries, modified_at FROM platform_summary WHERE username = ? ORDER BY platform",
+            (owner,)).fetchall()
+
+    def get_passwords(self, owner, platform):
+        """Returns [(id, platform_username, email, password)] for every entry saved for the platform."""
+        rows = self.db.conn.execute(
+            "SELECT id, platform_username, email, password FROM passwords WHERE username = ? AND platform = ?",
+            (owner, platform)).fetchall()
+        return [(r[0], r[1], r[2], crypto.decrypt_data(r[3])) for r in rows]
+
+    def passwords_page(self, owner, platform, after=("", 0), limit=PAGE_SIZE):
+        """
+        One page of get_passwords(), ordered by (platform_username, id): pass the last
+        row's (platform_username, id) as ``after`` for the next page. Only this page is decrypted.
+        """
+        rows = self.db.conn.execute(
+            "SELECT id, platform_username, email, password FROM passwords WHERE username = ? AND platform = ? "
+            "AND (platform_username, id) > (?, ?) ORDER BY platform_username, id LIMIT ?",
+            (owner, platform, after[0], after[1], limit)).fetchall()
+        return [(r[0], r[1], r[2], crypto.decrypt_data(r[3])) for r in rows]
+
+    def lookup_identity(self, owner, value):
+        """
+        Every entry whose email or platform username matches ``value``, ignoring case,
+        surrounding spaces and email '+tags'. Returns [(id, platform, platform_username, email)].
+        """
+        rows = self.db.conn.execute(f'''
+            SELECT id, platform, platform_username, email FROM passwords
+            WHERE username = :owner AND email_norm = {normalized_email_sql(":value")}
+            UNION
+            SELECT id, platform, platform_username, email FROM passwords
+            WHERE username = :owner AND platform_username_norm = {normalized_name_sql(":value")}
+        ''', {"owner": owner, "value": value}).fetchall()
+        # Sorted here: an ORDER BY would tempt SQLite into walking the (owner, platform) index instead.
+        return sorted(rows, key=lambda row: (row[1], row[2]))
+
+    def rotation_due(self, owner, max_age_days):
+        """
+        Entries whose password was last set more than ``max_age_days`` ago, oldest first,
+        as [(id, platform, platform_username, rotated_at)]. Reads the rotated_at index only.
+        """
+        cutoff = int(time.time()) - max_age_days * 86400
+        return self.db.conn.execute(
+            "SELECT id, platform, platform_username, rotated_at FROM passwords "
+            "WHERE username = ? AND rotated_at < ? ORDER BY rotated_at", (owner, cutoff)).fetchall()
+
+    def entry_ids(self, owner, platform):
+        """The ids of every entry saved for the platform."""
+        return [row[0] for row in self.db.conn.execute("SELECT id FROM passwords WHERE username = ? AND platform = ?",
+                                                       (owner, platform))]
+
+    def find_entry(self, owner, platform):
+        """Returns the id of the first entry saved for the platform, or None."""
+        row = self.db.conn.execute("SELECT id FROM passwords WHERE username = ? AND platform = ? LIMIT 1",
+                                   (owner, platform)).fetchone()
+        return row[0] if row else None
+
+    def get_entry(self, entry_id):
+        """Returns (platform, platform_username, email, password) for an entry id, or None."""
+        row = self.db.conn.execute("SELECT platform, platform_username, email, password FROM passwords WHERE id = ?",
+                                   (entry_id,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2], crypto.decrypt_data(row[3])
+
+    def iter_encrypted(self, owner):
+        """Yields (id, platform, encrypted password) for every entry of the owner, without decrypting."""
+        return self.db.conn.execute("SELECT id, platform, password FROM passwords WHERE username = ?", (owner,))
+
+    def delete_password(self, entry_id):
+        cur = self.db.conn.execute("DELETE FROM passwords WHERE id = ?", (entry_id,))
+        self.db.commit()
+        return cur.rowcount > 0
+
+    def update_username(self, entry_id, platform_username):
+        """Changes only the platform username; the password (and its history) is left alone."""
+        cur = self.db.conn.execute("UPDATE passwords SET platform_username = ? WHERE id = ?", (platform_username, entry_id))
+        self.db.commit()
+        return cur.rowcount > 0
+
+    def update_password(self, entry_id, platform_username, password):
+        cur = self.db.conn.execute("UPDATE passwords SET platform_username = ?, password = ? WHERE id = ?",
+                                   (platform_username,
+                                    crypto.encrypt_data(password, storage_format=self.db.storage_format), entry_id))
+        self.db.commit()
+        return cur.rowcount > 0
+
+    def history(self, entry_id):
+        """Earlier passwords of an entry, newest first, as [(version, password, replaced_at)]."""
+        rows = self.db.conn.execute(
+            "SELECT version, password, replaced_at FROM password_history WHERE entry_id = ? ORDER BY version DESC",
+            (entry_id,)).fetchall()
+        return [(version, crypto.decrypt_data(pwd), replaced_at) for version, pwd, replaced_at in rows]
+
+    def restore_version(self, entry_id, version):
+        """
+        Makes an earlier password current again. The password it replaces goes into
+        the history in turn, so a restore can itself be undone. Returns False if
+        there is no such version.
+        """
+        with self.db.transaction():
+            row = self.db.conn.execute("SELECT password FROM password_history WHERE entry_id = ? AND version = ?",
+                                       (entry_id, version)).fetchone()
+            if row is None:
+                return False
+            self.db.conn.execute("UPDATE passwords SET password = ? WHERE id = ?", (row[0], entry_id))
+        return True
+
+    def set_totp(self, entry_id, secret, digits=6, period=30, algorithm="SHA1"):
+        """Stores (or replaces) an entry's TOTP seed, encrypted. ``secret`` is the base32 seed."""
+        self.db.conn.execute(
+            "INSERT OR REPLACE INTO totp_secrets (entry_id, secret, digits, period, algorithm) VALUES (?, ?, ?, ?, ?)",
+            (entry_id, crypto.encrypt_data(secret, storage_format=self.db.storage_format), digits, period, algorithm))
+        self.db.commit()
+
+    def remove_totp(self, entry_id):
+        cur = self.db.conn.execute("DELETE FROM totp_secrets WHERE entry_id = ?", (entry_id,))
+        self.db.commit()
+        return cur.rowcount > 0
+
+    def totp_entries(self, owner):
+        """
+        Every entry of the owner with a TOTP seed, sorted by platform, as
+        [(id, platform, platform_username, encrypted seed, digits, period, algorithm)].
+        Seeds stay encrypted: vault_core.totp.CodeBoard decrypts each one once.
+        """
+        rows = self.db.conn.execute('''
+            SELECT p.id, p.platform, p.platform_username, t.secret, t.digits, t.period, t.algorithm
+            FROM totp_secrets t JOIN passwords p ON p.id = t.entry_id WHERE p.username = ?
+        ''', (owner,)).fetchall()
+        return sorted(rows, key=lambda row: (row[1], row[2]))
+
+    # Bulk operations: each runs as one unit of work, so it commits once whatever the number of entries.
+    def delete_passwords(self, entry_ids):
+        with self.db.transaction():
+            cur = self.db.conn.executemany("DELETE FROM passwords WHERE id = ?", ((i,) for i in entry_ids))
+        return cur.rowcount
+
+    def move_passwords(self, entry_ids, platform):
+        with self.db.transaction():
+            cur = self.db.conn.executemany("UPDATE passwords SET platform = ? WHERE id = ?",
+                                           ((platform, i) for i in entry_ids))
+        return cur.rowcount
+
+    def regenerate_passwords(self, entry_ids, generate):
+        """
+        Replaces each entry's password with ``generate(platform)``.
+        Returns {entry id: new password} for the entries that exist.
+        """
+        with self.db.transaction():
+            new_passwords = {}
+            for entry_id in entry_ids:
+                row = self.db.conn.execute("SELECT platform FROM passwords WHERE id = ?", (entry_id,)).fetchone()
+                if row is not None:
+                    new_passwords[entry_id] = generate(row[0])
+            self.db.conn.executemany("UPDATE passwords SET password = ? WHERE id = ?",
+                                     ((crypto.encrypt_data(pwd, storage_format=self.db.storage_format), i)
+                                      for i, pwd in new_passwords.items()))
+        return new_passwords
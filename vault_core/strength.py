@@ -0,0 +1,436 @@
+"""
+Guess-based password strength estimation in the spirit of zxcvbn.
+
+A password is split into the cheapest sequence of recognisable patterns
+(common passwords and English words, keyboard walks, character sequences,
+repeats and years) with brute force filling the gaps, and the estimate is the
+number of guesses an attacker trying those patterns first would need.
+
+The ranked word lists in ``data/`` (``common_passwords.txt`` and
+``english_words.txt``, taken from the zxcvbn frequency lists, MIT licence) are
+merged once into a sorted array searched with ``bisect``: every word starting
+at a position is found with a single binary search and a walk up a chain of
+prefix words, so scoring a password costs one binary search per position that
+begins any word.
+"""
+import itertools
+import math
+import operator
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DICTIONARY_FILES = (
+    os.path.join(DATA_DIR, "common_passwords.txt"),
+    os.path.join(DATA_DIR, "english_words.txt"),
+)
+
+BRUTEFORCE_CARDINALITY = 10
+MIN_GUESSES_SINGLE_CHAR = 10
+MIN_GUESSES_MULTI_CHAR = 50
+REFERENCE_YEAR = 2025
+MIN_YEAR_SPACE = 20
+
+# Guess thresholds for scores 1..4 (anything below the first is score 0).
+SCORE_THRESHOLDS = (1e3 + 5, 1e6 + 5, 1e8 + 5, 1e10 + 5)
+LOG10_SCORE_THRESHOLDS = tuple(math.log10(t) for t in SCORE_THRESHOLDS)
+RATINGS = ("Weak", "Weak", "Medium", "Strong", "Very Strong")
+# Estimates are kept as log10(guesses): a long random password needs more guesses than a float can hold.
+MAX_FLOAT_LOG10 = math.log10(sys.float_info.max)
+
+L33T_TABLE = str.maketrans({"4": "a", "@": "a", "8": "b", "(": "c", "3": "e", "6": "g", "1": "i",
+                            "!": "i", "|": "l", "0": "o", "$": "s", "5": "s", "7": "t", "+": "t", "2": "z"})
+
+# -----------------------------
+# Ranked dictionary
+# -----------------------------
+class RankedDictionary:
+    """
+    Every bundled list merged into one sorted array of words with parallel
+    arrays of ranks (a word's best position in any list, 1 = most common) and
+    parents (the index of the longest word that is a proper prefix of this one,
+    or -1). All dictionary words starting at a position are then found with one
+    binary search: the last word sorting at or before the rest of the text, and
+    the chain of its parents that the text starts with.
+    """
+
+    def __init__(self, paths=DICTIONARY_FILES, min_length=3):
+        best = {}
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for rank, word in enumerate((line.strip() for line in f), 1):
+                    if len(word) >= min_length and rank < best.get(word, rank + 1):
+                        best[word] = rank
+        self.min_length = min_length
+        self.words = sorted(best)
+        self.ranks = array("I", (best[w] for w in self.words))
+        # A word's longest proper prefix in the list is on the parent chain of the word sorted just
+        # before it, so each parent is found by walking that chain.
+        self.parents = array("i")
+        for index, word in enumerate(self.words):
+            parent = index - 1
+            while parent >= 0 and not word.startswith(self.words[parent]):
+                parent = self.parents[parent]
+            self.parents.append(parent)
+        # [lo, hi) slice of the sorted array for every leading min_length-character prefix, so a
+        # start position whose prefix begins no word is skipped without a binary search.
+        self.prefix_ranges = {}
+        for index, word in enumerate(self.words):
+            key = word[:min_length]
+            lo, _ = self.prefix_ranges.get(key, (index, index))
+            self.prefix_ranges[key] = (lo, index + 1)
+
+    def __len__(self):
+        return len(self.words)
+
+    def rank(self, word):
+        i = bisect_left(self.words, word)
+        if i < len(self.words) and self.words[i] == word:
+            return self.ranks[i]
+        return None
+
+    def find(self, text, last_start=None):
+        """
+        Returns [(start, end, rank)] for every dictionary word found in ``text``
+        (end inclusive), optionally only those starting at or before ``last_start``.
+        """
+        words, ranks, parents, ranges, m = self.words, self.ranks, self.parents, self.prefix_ranges, self.min_length
+        n = len(text)
+        stop = n - m + 1 if last_start is None else min(n - m, last_start) + 1
+        found = []
+        for i in range(stop):
+            span = ranges.get(text[i:i + m])
+            if span is None:
+                continue
+            rest = text[i:]
+            # Words that are prefixes of rest sort at or before it, on the chain of the last word that does.
+            word = bisect_right(words, rest, span[0], span[1]) - 1
+            while word >= 0 and not rest.startswith(words[word]):
+                word = parents[word]
+            while word >= 0:
+                found.append((i, i + len(words[word]) - 1, ranks[word]))
+                word = parents[word]
+        return found
+
+_dictionary = None
+
+def get_dictionary():
+    """Loads the ranked dictionary on first use and keeps it for the life of the process."""
+    global _dictionary
+    if _dictionary is None:
+        _dictionary = RankedDictionary()
+    return _dictionary
+
+# -----------------------------
+# Keyboard layouts
+# -----------------------------
+QWERTY = r"""
+`~ 1! 2@ 3# 4$ 5% 6^ 7& 8* 9( 0) -_ =+
+    qQ wW eE rR tT yY uU iI oO pP [{ ]} \|
+     aA sS dD fF gG hH jJ kK lL ;: '"
+      zZ xX cC vV bB nN mM ,< .> /?
+"""
+
+KEYPAD = """
+  / * -
+7 8 9 +
+4 5 6
+1 2 3
+  0 .
+"""
+
+def build_adjacency(layout, slanted):
+    """
+    Maps every key character to its neighbours, one slot per direction so that
+    changes of direction (turns) can be counted. Shifted characters map to the
+    same neighbours as their unshifted key.
+    """
+    positions = {}
+    for y, line in enumerate(layout.strip("\n").split("\n"), 1):
+        slant = y - 1 if slanted else 0
+        for token in line.split():
+            positions[((line.index(token) - slant) // (len(token) + 1), y)] = token
+    if slanted:
+        directions = ((-1, 0), (0, -1), (1, -1), (1, 0), (0, 1), (-1, 1))
+    else:
+        directions = ((-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1))
+    graph = {}
+    for (x, y), token in positions.items():
+        neighbours = tuple(positions.get((x + dx, y + dy), "") for dx, dy in directions)
+        for char in token:
+            graph[char] = neighbours
+    return graph
+
+class KeyboardGraph:
+    def __init__(self, layout, slanted):
+        self.adjacency = build_adjacency(layout, slanted)
+        self.starting_positions = len(layout.split())
+        degrees = [sum(1 for n in nbrs if n) for nbrs in self.adjacency.values()]
+        self.average_degree = sum(degrees) / len(degrees)
+        self.shifted = frozenset(token[1] for token in layout.split() if len(token) == 2)
+        # Three keys of this layout in a row, the least any walk needs.
+        self.key_run = re.compile(f"[{re.escape(''.join(self.adjacency))}]{{3}}")
+        # (key, next key) -> direction of the step, for every pair of adjacent keys.
+        self.steps = {}
+        for char, neighbours in self.adjacency.items():
+            for direction, key in enumerate(neighbours):
+                for other in key:
+                    self.steps.setdefault((char, other), direction)
+
+KEYBOARDS = {
+    "qwerty": KeyboardGraph(QWERTY, slanted=True),
+    "keypad": KeyboardGraph(KEYPAD, slanted=False),
+}
+
+# -----------------------------
+# Matches
+# -----------------------------
+class Match:
+    __slots__ = ("pattern", "i", "j", "token", "guesses", "detail")
+
+    def __init__(self, pattern, i, j, token, guesses, detail=""):
+        self.pattern = pattern
+        self.i = i
+        self.j = j
+        self.token = token
+        floor = MIN_GUESSES_SINGLE_CHAR if i == j else MIN_GUESSES_MULTI_CHAR
+        self.guesses = guesses if guesses >= floor else floor
+        self.detail = detail
+
+    def __repr__(self):
+        return f"Match({self.pattern!r}, {self.token!r}, guesses={self.guesses:.0f})"
+
+def n_choose_k(n, k):
+    return math.comb(n, k) if 0 <= k <= n else 0
+
+def uppercase_variations(token):
+    if token.islower() or not any(c.isalpha() for c in token):
+        return 1
+    if token.isupper() or (token[0].isupper() and token[1:].islower()) or (token[:-1].islower() and token[-1].isupper()):
+        return 2
+    upper = sum(1 for c in token if c.isupper())
+    lower = sum(1 for c in token if c.islower())
+    return sum(n_choose_k(upper + lower, i) for i in range(1, min(upper, lower) + 1))
+
+def dictionary_matches(password, lowered):
+    dictionary = get_dictionary()
+    # Without capitals every token has a single case variation.
+    variations = uppercase_variations if password != lowered else lambda token: 1
+    matches = []
+    for i, j, rank in dictionary.find(lowered):
+        token = password[i:j + 1]
+        matches.append(Match("dictionary", i, j, token, rank * variations(token), "common word"))
+    # Reversed words ("drowssap")
+    n = len(lowered)
+    for i, j, rank in dictionary.find(lowered[::-1]):
+        si, sj = n - 1 - j, n - 1 - i
+        token = password[si:sj + 1]
+        matches.append(Match("dictionary", si, sj, token, rank * variations(token) * 2, "reversed word"))
+    # Common substitutions ("p@ssw0rd")
+    unleeted = lowered.translate(L33T_TABLE)
+    if unleeted != lowered:
+        # substituted[k]: how many of the first k characters were substituted.
+        substituted = list(itertools.accumulate(map(operator.ne, lowered, unleeted), initial=0))
+        # A word with substitutions starts at or before the last substituted character.
+        last = substituted.index(substituted[-1]) - 1
+        for i, j, rank in dictionary.find(unleeted, last):
+            subs = substituted[j + 1] - substituted[i]
+            if subs:
+                token = password[i:j + 1]
+                matches.append(Match("dictionary", i, j, token,
+                                     rank * variations(token) * 2 ** subs, "common word with substitutions"))
+    return matches
+
+def spatial_matches(password):
+    matches = []
+    n = len(password)
+    for name, graph in KEYBOARDS.items():
+        if not graph.key_run.search(password):
+            continue
+        shifted_keys = graph.shifted
+        # directions[k]: the step from password[k] to password[k + 1], or None if the keys are not adjacent.
+        directions = list(map(graph.steps.get, zip(password, password[1:])))
+        # A walk of three or more keys starts where two steps in a row are adjacent.
+        starts = [k for k in range(n - 2) if directions[k] is not None and directions[k + 1] is not None]
+        end = 0
+        for i in starts:
+            if i < end:
+                continue
+            j = i + 1
+            turns, last_direction, shifted = 0, None, 1 if password[i] in shifted_keys else 0
+            while j < n:
+                direction = directions[j - 1]
+                if direction is None:
+                    break
+                if direction != last_direction:
+                    turns += 1
+                    last_direction = direction
+                if password[j] in shifted_keys:
+                    shifted += 1
+                j += 1
+            token = password[i:j]
+            matches.append(Match("spatial", i, j - 1, token,
+                                 spatial_guesses(graph, len(token), turns, shifted), f"{name} keyboard pattern"))
+            end = j - 1
+    return matches
+
+def spatial_guesses(graph, length, turns, shifted):
+    s, d = graph.starting_positions, graph.average_degree
+    guesses = 0
+    for i in range(2, length + 1):
+        for j in range(1, min(turns, i - 1) + 1):
+            guesses += n_choose_k(i - 1, j - 1) * s * d ** j
+    if shifted:
+        unshifted = length - shifted
+        if unshifted == 0:
+            guesses *= 2
+        else:
+            guesses *= sum(n_choose_k(shifted + unshifted, i) for i in range(1, min(shifted, unshifted) + 1))
+    return guesses
+
+def sequence_matches(password):
+    matches = []
+    n = len(password)
+    codes = list(map(ord, password))
+    deltas = [b - a for a, b in zip(codes, codes[1:])]
+    i = 0
+    while i < n - 2:
+        delta = deltas[i]
+        if delta in (-1, 1, -2, 2) and deltas[i + 1] == delta:
+            j = i + 1
+            while j + 1 < n and deltas[j] == delta:
+                j += 1
+            if j - i >= 2:
+                token = password[i:j + 1]
+                first = token[0]
+                if first in "aAzZ019":
+                    base = 4
+                elif first.isdigit():
+                    base = 10
+                else:
+                    base = 26
+                if delta < 0:
+                    base *= 2
+                matches.append(Match("sequence", i, j, token, base * len(token), "character sequence"))
+                i = j
+                continue
+        i += 1
+    return matches
+
+REPEAT_RE = re.compile(r"(.+?)\1+")
+YEAR_RE = re.compile(r"19\d\d|20\d\d")
+
+def repeat_matches(password):
+    matches = []
+    if len(set(password)) == len(password):
+        return matches  # a repeat needs some character twice
+    for m in REPEAT_RE.finditer(password):
+        base = m.group(1)
+        count = len(m.group(0)) // len(base)
+        base_guesses = estimate_guesses(base) if len(base) > 1 else MIN_GUESSES_SINGLE_CHAR
+        matches.append(Match("repeat", m.start(), m.end() - 1, m.group(0), base_guesses * count, "repeated characters"))
+    return matches
+
+def year_matches(password):
+    return [Match("year", m.start(), m.end() - 1, m.group(0),
+                  max(abs(int(m.group(0)) - REFERENCE_YEAR), MIN_YEAR_SPACE), "year")
+            for m in YEAR_RE.finditer(password)]
+
+def find_matches(password):
+    lowered = password.lower()
+    return (dictionary_matches(password, lowered) + spatial_matches(password) + sequence_matches(password)
+            + repeat_matches(password) + year_matches(password))
+
+# -----------------------------
+# Scoring
+# -----------------------------
+LOG10_BRUTEFORCE = math.log10(BRUTEFORCE_CARDINALITY)
+_log10_factorials = [0.0]
+
+def log10_factorials(n):
+    """The table of log10(k!) for k = 0..n (at least), grown on demand and shared by every call."""
+    while len(_log10_factorials) <= n:
+        _log10_factorials.append(math.log10(math.factorial(len(_log10_factorials))))
+    return _log10_factorials
+
+def most_guessable_sequence(password, matches):
+    """
+    Picks the cheapest way to cover the password with matches and brute-forced
+    characters. The product of the pieces is multiplied by the number of
+    orderings of the patterns used (l!), as zxcvbn does, so splitting a
+    password into many tiny patterns is not rewarded.
+    Returns (log10 of the guesses, sequence of matches).
+    """
+    n = len(password)
+    by_end = [[] for _ in range(n)]
+    for m in matches:
+        by_end[m.j].append(m)
+    log_factorial = log10_factorials(n + 1)
+    # best[k] = (log10 guesses for password[:k], patterns used, previous k, match or None for brute force)
+    best = [(0.0, 0, -1, None)] + [None] * n
+    for k in range(1, n + 1):
+        score, patterns, _, match = best[k - 1]
+        # Brute force one more character; consecutive brute-forced characters form a single pattern.
+        if match is not None or k == 1:
+            patterns += 1
+        candidate = (score + LOG10_BRUTEFORCE, patterns, k - 1, None)
+        ends = by_end[k - 1]
+        if ends:
+            total = candidate[0] + log_factorial[patterns]
+            for m in ends:
+                before = best[m.i]
+                score = before[0] + math.log10(m.guesses)
+                if score + log_factorial[before[1] + 1] < total:
+                    candidate = (score, before[1] + 1, m.i, m)
+                    total = score + log_factorial[before[1] + 1]
+        best[k] = candidate
+    sequence = []
+    k = n
+    while k > 0:
+        entry = best[k]
+        if entry[3] is not None:
+            sequence.append(entry[3])
+        k = entry[2]
+    sequence.reverse()
+    return best[n][0] + log_factorial[best[n][1]], sequence
+
+def guesses_from_log10(log_guesses):
+    """10 ** log_guesses, or inf where that is beyond a float."""
+    return 10 ** log_guesses if log_guesses < MAX_FLOAT_LOG10 else math.inf
+
+def estimate_guesses(password):
+    if not password:
+        return 1
+    return guesses_from_log10(most_guessable_sequence(password, find_matches(password))[0])
+
+class StrengthResult:
+    __slots__ = ("log10_guesses", "guesses", "entropy_bits", "score", "rating", "sequence")
+
+    def __init__(self, log10_guesses, sequence):
+        self.log10_guesses = max(log10_guesses, 0.0)
+        self.guesses = guesses_from_log10(self.log10_guesses)
+        self.entropy_bits = self.log10_guesses * math.log2(10)
+        self.score = bisect_right(LOG10_SCORE_THRESHOLDS, self.log10_guesses)
+        self.rating = RATINGS[self.score]
+        self.sequence = sequence
+
+    @property
+    def feedback(self):
+        """Short description of the weakest patterns found, e.g. 'common word, year'."""
+        return ", ".join(dict.fromkeys(m.detail for m in self.sequence))
+
+    def __repr__(self):
+        return f"StrengthResult(rating={self.rating!r}, entropy_bits={self.entropy_bits:.1f})"
+
+def estimate(password):
+    """Estimates how many guesses an informed attacker needs for ``password``."""
+    if not password:
+        return StrengthResult(0.0, [])
+    return StrengthResult(*most_guessable_sequence(password, find_matches(password)))
+
+def rating(password):
+    """Returns Weak, Medium, Strong or Very Strong for ``password``."""
+    return estimate(password).rating
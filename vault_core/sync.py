@@ -0,0 +1,122 @@
+"""
+Online backup and restore of the whole vault through Firebase Firestore.
+
+The backup is a single document (collection 'db_backup', document 'backup')
+holding every account and saved password, with their tags and each entry's
+2FA seed and earlier passwords; encrypted columns stay encrypted. Restoring a
+backup written before any of these were included keeps them for the accounts
+and entries it leaves in place.
+firebase_admin is imported by ``init_firebase`` rather than at module import,
+because loading it takes longer than the rest of the application together.
+"""
+import socket
+
+from vault_core import merge
+from vault_core.instrumentation import stats, timed
+from vault_core.storage import VAULT_EXTRAS, replace_vault, vault_extras
+
+SERVICE_ACCOUNT_FILE = "serviceAccountKey.json"
+BACKUP_COLLECTION = "db_backup"
+BACKUP_DOCUMENT = "backup"
+
+db_online = None  # This will hold our Firestore client
+
+# Keys written by older GUI backups.
+LEGACY_KEYS = {
+    "security_q": "security_question",
+    "security_a": "security_answer",
+    "owner": "username",
+    "platform_user": "platform_username",
+    "pwd": "password",
+}
+
+class SyncError(Exception):
+    """An online backup or restore could not run; the message is meant for the user."""
+
+def init_firebase(service_account=SERVICE_ACCOUNT_FILE):
+    """
+    Initialize Firebase using your private serviceAccountKey.json file.
+    Raises if initialization fails, in which case db_online remains None.
+    """
+    global db_online
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    db_online = None
+    firebase_admin.initialize_app(credentials.Certificate(service_account))
+    db_online = firestore.client()
+    return db_online
+
+def internet_available(host="8.8.8.8", port=53, timeout=3):
+    """
+    Check if there is an internet connection by trying to connect to a known host.
+    Default is Google's public DNS.
+    """
+    try:
+        socket.setdefaulttimeout(timeout)
+        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
+        return True
+    except OSError:
+        return False
+
+def _backup_document():
+    if db_online is None:
+        raise SyncError("Firebase not initialized.")
+    if not internet_available():
+        raise SyncError("No internet connection.")
+    return db_online.collection(BACKUP_COLLECTION).document(BACKUP_DOCUMENT)
+
+def _normalise(record):
+    return {LEGACY_KEYS.get(key, key): value for key, value in record.items()}
+
+@timed("backup.online")
+def backup_online(db):
+    """Uploads every account and saved password, and what hangs off them. Returns (users, passwords) counts."""
+    document = _backup_document()
+    cur = db.conn.cursor()
+    cur.execute("SELECT username, password, security_question, security_answer FROM users")
+    columns = [desc[0] for desc in cur.description]
+    users = [dict(zip(columns, row)) for row in cur.fetchall()]
+    cur.execute("SELECT id, username, platform, platform_username, email, password FROM passwords")
+    columns = [desc[0] for desc in cur.description]
+    passwords = [dict(zip(columns, row)) for row in cur.fetchall()]
+    extras = {name: [dict(zip(VAULT_EXTRAS[name].columns, row)) for row in rows]
+              for name, rows in vault_extras(db).items()}
+    document.set({"users": users, "passwords": passwords, **extras})
+    if stats.enabled:
+        stats.increment("backup.bytes", _payload_bytes(users, passwords, *extras.values()))
+    return len(users), len(passwords)
+
+def _payload_bytes(*tables):
+    """Size of the text and blob values in backup records (what makes up most of the uploaded document)."""
+    return sum(len(value.encode()) if isinstance(value, str) else len(value)
+               for records in tables for record in records for value in record.values()
+               if isinstance(value, (str, bytes)))
+
+def _fetch_backup():
+    """The online backup as the (users, passwords, extras) taken by storage.stage_import."""
+    snapshot = _backup_document().get()
+    if not snapshot.exists:
+        raise SyncError("No online backup found.")
+    data = snapshot.to_dict()
+    users = [_normalise(u) for u in data.get("users", [])]
+    passwords = [_normalise(p) for p in data.get("passwords", [])]
+    extras = {name: [tuple(row[c] for c in extra.columns) for row in data[name]]
+              for name, extra in VAULT_EXTRAS.items() if name in data}
+    return ([(u["username"], u["password"], u["security_question"], u["security_answer"]) for u in users],
+            [(p["id"], p["username"], p["platform"], p["platform_username"], p["email"], p["password"])
+             for p in passwords], extras)
+
+@timed("restore.online")
+def restore_online(db):
+    """
+    Replaces the local vault with the online backup. The backup is staged and
+    validated before the swap, so a damaged backup leaves the vault unchanged.
+    Returns (users, passwords) counts.
+    """
+    return replace_vault(db, *_fetch_backup())
+
+@timed("merge.online")
+def merge_online(db, policy="newest"):
+    """Merges the online backup into the local vault (see vault_core.merge). Returns the merge counts."""
+    users, passwords, extras = _fetch_backup()
+    return merge.merge_vault(db, users, passwords, policy=policy, extras=extras)
@@ -0,0 +1,144 @@
+"""
+Tags and folders for saved passwords.
+
+A tag is a short name an owner attaches to any number of entries; an entry can
+carry any number of tags. Folders are tags whose name is a path: an entry
+tagged 'work/clients' is found by both 'work/clients' and 'work'.
+
+Filters combine tags: spaces mean AND, '|' means OR, so 'work 2fa|otp' finds
+entries tagged 'work' (or a folder below it) that are also tagged '2fa' or
+'otp'. Filtering uses an in-memory bitmap of entry ids per tag, loaded on first
+use and reloaded only when the tag changed (its generation, kept by triggers,
+moved on), so combining tags on a large vault costs a few big-integer ANDs:
+
+    tags = TagStore(db)
+    tags.add_tag("alice", entry_ids, "work/clients")
+    for entry_id, platform, platform_username, email in tags.filter("alice", "work 2fa|otp"):
+        ...
+"""
+import json
+
+def normalize_tag(name):
+    """
+    A tag as stored: lower-case, with surrounding spaces and empty folder levels
+    removed and inner spaces turned into '-'. Raises ValueError if nothing is left.
+    """
+    parts = ["-".join(part.replace("|", " ").split()) for part in name.lower().split("/")]
+    tag = "/".join(part for part in parts if part)
+    if not tag:
+        raise ValueError(f"Not a valid tag: {name!r}")
+    return tag
+
+def parse_tag_filter(text):
+    """'work 2fa|otp' -> [['work'], ['2fa', 'otp']]: a list of OR groups that must all match."""
+    return [[normalize_tag(tag) for tag in term.split("|") if tag.strip("/ ")]
+            for term in text.split() if term.strip("|/")]
+
+# -----------------------------
+# Bitmaps
+# -----------------------------
+# Bit positions set in each byte value, for turning a bitmap back into entry ids.
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+def ids_to_bitmap(ids):
+    """An int with bit i set for every id i."""
+    if not ids:
+        return 0
+    bits = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+def bitmap_to_ids(bitmap):
+    """The ids whose bits are set, in ascending order."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, "little")
+    return [index << 3 | bit for index, byte in enumerate(data) if byte for bit in _BITS[byte]]
+
+class TagStore:
+    def __init__(self, db):
+        self.db = db
+        self._bitmaps = {}  # tag id -> (generation, bitmap of entry ids)
+
+    # -- Listing --
+    def tags(self, owner):
+        """Returns [(tag, entry count)] sorted by tag."""
+        return self.db.conn.execute("SELECT name, entries FROM tags WHERE username = ? ORDER BY name",
+                                    (owner,)).fetchall()
+
+    def entry_tags(self, entry_id):
+        """The tags of an entry, sorted."""
+        return [row[0] for row in self.db.conn.execute(
+            "SELECT name FROM tags WHERE id IN (SELECT tag_id FROM entry_tags WHERE entry_id = ?) ORDER BY name",
+            (entry_id,))]
+
+    # -- Tagging --
+    def add_tag(self, owner, entry_ids, tag):
+        """Tags the owner's entries among ``entry_ids``, creating the tag if needed. Returns the number newly tagged."""
+        tag = normalize_tag(tag)
+        with self.db.transaction():
+            self.db.conn.execute("INSERT OR IGNORE INTO tags (username, name) VALUES (?, ?)", (owner, tag))
+            tag_id = self._tag_id(owner, tag)
+            cur = self.db.conn.executemany(
+                "INSERT OR IGNORE INTO entry_tags (tag_id, entry_id) SELECT ?, id FROM passwords WHERE id = ? AND username = ?",
+                ((tag_id, entry_id, owner) for entry_id in entry_ids))
+        return cur.rowcount
+
+    def remove_tag(self, owner, entry_ids, tag):
+        """Takes a tag off entries. Returns the number of entries it was removed from."""
+        tag_id = self._tag_id(owner, normalize_tag(tag))
+        if tag_id is None:
+            return 0
+        with self.db.transaction():
+            cur = self.db.conn.executemany("DELETE FROM entry_tags WHERE tag_id = ? AND entry_id = ?",
+                                           ((tag_id, entry_id) for entry_id in entry_ids))
+        return cur.rowcount
+
+    def delete_tag(self, owner, tag):
+        """Deletes a tag (not its sub-folders) from every entry. Returns False if there was no such tag."""
+        with self.db.transaction():
+            cur = self.db.conn.execute("DELETE FROM tags WHERE username = ? AND name = ?", (owner, normalize_tag(tag)))
+        return cur.rowcount > 0
+
+    def _tag_id(self, owner, tag):
+        row = self.db.conn.execute("SELECT id FROM tags WHERE username = ? AND name = ?", (owner, tag)).fetchone()
+        return row[0] if row else None
+
+    # -- Filtering --
+    def filter(self, owner, expression):
+        """
+        Entries matching a tag filter, either text ('work 2fa|otp') or parsed OR
+        groups, sorted by platform, as [(id, platform, platform_username, email)].
+        """
+        groups = parse_tag_filter(expression) if isinstance(expression, str) else expression
+        if not groups:
+            return []
+        matched = None
+        for group in groups:
+            bitmap = 0
+            for tag in group:
+                for tag_id, generation in self._tag_and_folder(owner, tag):
+                    bitmap |= self._bitmap(tag_id, generation)
+            matched = bitmap if matched is None else matched & bitmap
+            if not matched:
+                return []
+        # CROSS JOIN keeps the matched ids as the outer loop: one rowid seek each, never a walk of the owner's entries.
+        rows = self.db.conn.execute(
+            "SELECT p.id, p.platform, p.platform_username, p.email FROM json_each(?) AS m "
+            "CROSS JOIN passwords AS p ON p.id = m.value WHERE p.username = ?",
+            (json.dumps(bitmap_to_ids(matched)), owner)).fetchall()
+        return sorted(rows, key=lambda row: (row[1], row[2]))
+
+    def _tag_and_folder(self, owner, tag):
+        """(id, generation) of the tag and of every tag below it: 'work/...' sorts between 'work/' and 'work0'."""
+        return self.db.conn.execute(
+            "SELECT id, generation FROM tags WHERE username = ? AND (name = ? OR (name >= ? AND name < ?))",
+            (owner, tag, tag + "/", tag + "0")).fetchall()
+
+    def _bitmap(self, tag_id, generation):
+        cached = self._bitmaps.get(tag_id)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        ids = [row[0] for row in self.db.conn.execute("SELECT entry_id FROM entry_tags WHERE tag_id = ?", (tag_id,))]
+        bitmap = ids_to_bitmap(ids)
+        self._bitmaps[tag_id] = (generation, bitmap)
+        return bitmap
@@ -0,0 +1,102 @@
+"""
+Time-based one-time passwords (RFC 6238) for entries with a stored 2FA seed.
+
+Seeds are kept encrypted in ``totp_secrets`` (see PasswordStore.set_totp). A
+CodeBoard decrypts each seed once and keeps a keyed HMAC object for it; every
+refresh then only copies that object and hashes an 8-byte counter, so showing
+hundreds of current codes every second costs no decryption at all. A seed that
+was changed (its stored ciphertext differs) or removed is noticed on the next
+refresh.
+
+    board = CodeBoard(PasswordStore(db))
+    for entry_id, platform, platform_username, code, seconds_left in board.codes("alice"):
+        ...
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import time
+from urllib.parse import parse_qs, unquote, urlparse
+
+from vault_core import crypto
+
+ALGORITHMS = {"SHA1": hashlib.sha1, "SHA256": hashlib.sha256, "SHA512": hashlib.sha512}
+
+def normalize_secret(secret):
+    """A base32 seed as stored: upper-case, without spaces or padding. Raises ValueError if it is not base32."""
+    secret = "".join(secret.split()).replace("-", "").upper().rstrip("=")
+    try:
+        if not secret or not decode_secret(secret):
+            raise ValueError
+    except (ValueError, binascii.Error):
+        raise ValueError("Not a valid base32 TOTP secret.") from None
+    return secret
+
+def decode_secret(secret):
+    return base64.b32decode(secret + "=" * (-len(secret) % 8))
+
+def parse_secret(text):
+    """
+    Reads a seed as shown by a site's 2FA setup page: the base32 text, or the
+    otpauth://totp/... URI behind its QR code. Returns (secret, digits, period, algorithm).
+    """
+    text = text.strip()
+    if not text.lower().startswith("otpauth://"):
+        return normalize_secret(text), 6, 30, "SHA1"
+    uri = urlparse(text)
+    if uri.netloc.lower() != "totp":
+        raise ValueError("Only time-based (totp) codes are supported.")
+    params = {key.lower(): unquote(values[0]) for key, values in parse_qs(uri.query).items()}
+    algorithm = params.get("algorithm", "SHA1").upper()
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    try:
+        digits, period = int(params.get("digits", 6)), int(params.get("period", 30))
+    except ValueError:
+        raise ValueError("digits and period must be numbers.") from None
+    if not 6 <= digits <= 10 or period <= 0:
+        raise ValueError("digits must be 6 to 10 and period positive.")
+    return normalize_secret(params.get("secret", "")), digits, period, algorithm
+
+def hotp(mac, counter, digits):
+    """RFC 4226 code for ``counter`` from a keyed HMAC object, which is left untouched."""
+    mac = mac.copy()
+    mac.update(struct.pack(">Q", counter))
+    digest = mac.digest()
+    offset = digest[-1] & 0x0F
+    value = struct.unpack_from(">I", digest, offset)[0] & 0x7FFFFFFF
+    return str(value % 10 ** digits).zfill(digits)
+
+def totp(secret, at=None, digits=6, period=30, algorithm="SHA1"):
+    """The code for a base32 seed at UNIX time ``at`` (default: now)."""
+    mac = hmac.new(decode_secret(secret), digestmod=ALGORITHMS[algorithm])
+    return hotp(mac, int(time.time() if at is None else at) // period, digits)
+
+class CodeBoard:
+    """Current codes for every entry of an owner that has a seed, decrypting each seed only once."""
+
+    def __init__(self, store):
+        self.store = store
+        self._macs = {}  # entry id -> (encrypted seed, keyed HMAC object)
+
+    def codes(self, owner, at=None):
+        """[(id, platform, platform_username, code, seconds until it changes)], sorted by platform."""
+        now = time.time() if at is None else at
+        macs, codes = {}, []
+        for entry_id, platform, platform_username, secret, digits, period, algorithm in self.store.totp_entries(owner):
+            cached = self._macs.get(entry_id)
+            if cached is None or cached[0] != secret:
+                key = decode_secret(crypto.decrypt_data(secret))
+                cached = (secret, hmac.new(key, digestmod=ALGORITHMS.get(algorithm, hashlib.sha1)))
+            macs[entry_id] = cached
+            counter, elapsed = divmod(int(now), period)
+            codes.append((entry_id, platform, platform_username, hotp(cached[1], counter, digits), period - elapsed))
+        # Seeds that were removed (or belong to another owner) are dropped from the cache.
+        self._macs = macs
+        return codes
+
+    def clear(self):
+        """Forgets every decrypted seed, e.g. when their owner logs out."""
+        self._macs = {}
@@ -0,0 +1,363 @@
+"""
+Full-screen terminal interface on curses.
+
+One event loop reads keys and redraws only what changed: each pane is its own
+curses window, marked dirty by the keys that affect it, and a redraw stages
+the dirty windows with noutrefresh() and sends them in one doupdate(), which
+writes only the cells that differ from what the terminal already shows. Lists
+draw just their visible rows; a platform's entries are fetched a page at a
+time (PasswordStore.passwords_page) as the cursor reaches the end of what was
+loaded, and only the entry being shown is decrypted.
+
+    python passwords.py --tui
+    python -m vault_core.tui database.db
+
+Keys on the vault screen: arrows, PgUp/PgDn, Home/End to move; Tab to switch
+between platforms and entries; Enter to show or hide a password; a add, e edit,
+d delete, / jump to a platform, q log out. Esc cancels any form.
+"""
+import argparse
+import bisect
+
+try:
+    import curses
+except ImportError:  # Windows ships without curses (pip install windows-curses)
+    curses = None
+
+from vault_core import strength
+from vault_core.generator import PasswordGenerator
+from vault_core.storage import DB_FILE, PAGE_SIZE, DatabaseManager, PasswordStore, UserStore
+
+ESC = "\x1b"
+ENTER_KEYS = ("\n", "\r")
+BACKSPACE_KEYS = ("\x7f", "\b")
+
+class ListPane:
+    """A scrollable list drawn in its own window: only the rows in view are drawn."""
+
+    def __init__(self, title):
+        self.title = title
+        self.rows = []
+        self.cursor = 0
+        self.top = 0
+        self.focused = False
+        self.win = None
+        self.dirty = True
+
+    def resize(self, height, width, y, x):
+        self.win = curses.newwin(height, width, y, x)
+        self.dirty = True
+
+    def set_rows(self, rows, cursor=0):
+        self.rows = rows
+        self.cursor = min(cursor, max(len(rows) - 1, 0))
+        self.top = min(self.top, self.cursor)
+        self.dirty = True
+
+    def move(self, delta):
+        """Moves the cursor; returns True if it moved."""
+        cursor = max(0, min(len(self.rows) - 1, self.cursor + delta))
+        if cursor == self.cursor or not self.rows:
+            return False
+        self.cursor = cursor
+        self.dirty = True
+        return True
+
+    def visible(self):
+        return max(self.win.getmaxyx()[0] - 2, 1)
+
+    def draw(self, render):
+        height, width = self.win.getmaxyx()
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + self.visible():
+            self.top = self.cursor - self.visible() + 1
+        self.win.erase()
+        self.win.box()
+        title = f" {self.title} ({len(self.rows)}) "
+        self.win.addnstr(0, 2, title, width - 4, curses.A_BOLD if self.focused else curses.A_NORMAL)
+        for line, index in enumerate(range(self.top, min(self.top + self.visible(), len(self.rows))), 1):
+            attr = curses.A_REVERSE if index == self.cursor and self.focused else curses.A_NORMAL
+            if index == self.cursor and not self.focused:
+                attr = curses.A_BOLD
+            self.win.addnstr(line, 1, render(self.rows[index]).ljust(width - 2), width - 2, attr)
+        self.win.noutrefresh()
+        self.dirty = False
+
+class Tui:
+    def __init__(self, stdscr, users, vault_for, generator=None):
+        """``vault_for(username)`` returns the DatabaseManager holding that user's entries."""
+        self.stdscr = stdscr
+        self.users = users
+        self.vault_for = vault_for
+        self.generator = generator or PasswordGenerator.from_file()
+        self.status = ""
+        curses.curs_set(0)
+        stdscr.keypad(True)
+
+    # -- Low-level drawing and input --
+    def key(self):
+        """The next key: a str for characters, an int (curses.KEY_*) for special keys."""
+        try:
+            return self.stdscr.get_wch()
+        except KeyboardInterrupt:
+            return ESC
+
+    def set_status(self, text):
+        self.status = text
+        height, width = self.stdscr.getmaxyx()
+        self.stdscr.move(height - 1, 0)
+        self.stdscr.clrtoeol()
+        self.stdscr.addnstr(height - 1, 0, text, width - 1, curses.A_REVERSE)
+        self.stdscr.noutrefresh()
+
+    def form(self, title, fields, values=None):
+        """
+        Edits a form of (label, secret) fields in a centered box. Tab/arrows move
+        between fields, Enter on the last field submits, Esc cancels (returns None).
+        """
+        values = list(values or [""] * len(fields))
+        height, width = self.stdscr.getmaxyx()
+        box_w = min(width - 2, 70)
+        label_w = max(len(label) for label, _ in fields) + 2
+        win = curses.newwin(len(fields) + 4, box_w, max((height - len(fields) - 4) // 2, 0), max((width - box_w) // 2, 0))
+        win.keypad(True)
+        current = 0
+        curses.curs_set(1)
+        try:
+            while True:
+                win.erase()
+                win.box()
+                win.addnstr(0, 2, f" {title} ", box_w - 4, curses.A_BOLD)
+                for i, (label, secret) in enumerate(fields):
+                    shown = "*" * len(values[i]) if secret else values[i]
+                    field_w = box_w - label_w - 4
+                    win.addnstr(i + 2, 2, label.ljust(label_w), label_w)
+                    win.addnstr(i + 2, 2 + label_w, shown[-field_w:].ljust(field_w), field_w, curses.A_UNDERLINE)
+                win.move(current + 2, 2 + label_w + min(len(values[current]), box_w - label_w - 5))
+                win.refresh()
+                key = win.get_wch()
+                if key == ESC:
+                    return None
+                if key in ENTER_KEYS or key in ("\t", curses.KEY_DOWN):
+                    if key in ENTER_KEYS and current == len(fields) - 1:
+                        return values
+                    current = (current + 1) % len(fields)
+                elif key in (curses.KEY_UP, curses.KEY_BTAB):
+                    current = (current - 1) % len(fields)
+                elif key in BACKSPACE_KEYS or key == curses.KEY_BACKSPACE:
+                    values[current] = values[current][:-1]
+                elif isinstance(key, str) and key.isprintable():
+                    values[current] += key
+        finally:
+            curses.curs_set(0)
+            del win
+            self.stdscr.touchwin()
+
+    def confirm(self, question):
+        self.set_status(f"{question} (y/n)")
+        curses.doupdate()
+        return self.key() in ("y", "Y")
+
+    # -- Screens --
+    def run(self):
+        start = ListPane("Secure Password Manager")
+        start.set_rows(["Log in", "Sign up", "Quit"])
+        start.focused = True
+        while True:
+            self.stdscr.erase()
+            self.stdscr.noutrefresh()
+            height, width = self.stdscr.getmaxyx()
+            start.resize(min(7, height - 1), min(40, width), max((height - 7) // 2, 0), max((width - 40) // 2, 0))
+            self.set_status(self.status or "Enter select  q quit")
+            while True:
+                if start.dirty:
+                    start.draw(str)
+                curses.doupdate()
+                key = self.key()
+                if key == curses.KEY_RESIZE:
+                    break
+                if key in (curses.KEY_UP, "k"):
+                    start.move(-1)
+                elif key in (curses.KEY_DOWN, "j"):
+                    start.move(1)
+                elif key in ("q", ESC) or (key in ENTER_KEYS and start.cursor == 2):
+                    return
+                elif key in ENTER_KEYS:
+                    if start.cursor == 0:
+                        username = self.login()
+                        if username:
+                            self.vault_screen(username)
+                    else:
+                        self.signup()
+                    break
+
+    def login(self):
+        values = self.form("Log in", [("Username", False), ("Password", True)])
+        if values is None:
+            self.status = ""
+            return None
+        if self.users.login(values[0], values[1]):
+            self.status = ""
+            return values[0]
+        self.status = "Invalid username or password."
+        return None
+
+    def signup(self):
+        values = ["", "", "", ""]
+        while True:
+            values = self.form("Sign up", [("Username", False), ("Password", True), ("Security question", False),
+                                           ("Answer", False)], values)
+            if values is None:
+                self.status = ""
+                return
+            username, password, question, answer = values
+            if not username.isalnum():
+                problem = "Usernames are letters and digits only."
+            elif not all(values):
+                problem = "All fields are required."
+            elif strength.rating(password) == "Weak":
+                problem = "That password is weak; choose a stronger one."
+            elif not self.users.signup(username, password, question, answer.lower()):
+                problem = "Username already exists."
+            else:
+                self.status = "Account created. Log in to continue."
+                return
+            self.set_status(problem + " Press any key.")
+            curses.doupdate()
+            self.key()
+
+    def vault_screen(self, username):
+        store = PasswordStore(self.vault_for(username))
+        platforms, entries = ListPane("Platforms"), ListPane("Entries")
+        platforms.focused = True
+        revealed = {}  # entry id -> decrypted password, for the entries being shown
+        entries_after = [None]  # keyset position of the next page of entries; None once all are loaded
+
+        def load_platforms(select=None):
+            rows = store.platform_summary(username)
+            names = [row[0] for row in rows]
+            cursor = bisect.bisect_left(names, select) if select else platforms.cursor
+            platforms.set_rows(rows, cursor)
+            load_entries()
+
+        def load_entries():
+            revealed.clear()
+            entries.set_rows([])
+            entries.top = 0
+            entries_after[0] = ("", 0)
+            load_more_entries()
+
+        def load_more_entries():
+            if entries_after[0] is None or not platforms.rows:
+                return
+            page = store.passwords_page(username, platforms.rows[platforms.cursor][0], entries_after[0], PAGE_SIZE)
+            # Rows keep their encrypted-on-disk password out of memory: only the id, name and email are kept.
+            entries.set_rows(entries.rows + [(entry_id, user, email) for entry_id, user, email, _ in page], entries.cursor)
+            entries_after[0] = (page[-1][1], page[-1][0]) if len(page) == PAGE_SIZE else None
+
+        def render_entry(row):
+            entry_id, user, email = row
+            return f"{user:<24} {email:<30} {revealed.get(entry_id, '********')}"
+
+        def layout():
+            height, width = self.stdscr.getmaxyx()
+            self.stdscr.erase()
+            self.stdscr.noutrefresh()
+            left = max(min(width // 3, 40), 10)
+            platforms.resize(height - 1, left, 0, 0)
+            entries.resize(height - 1, max(width - left, 10), 0, left)
+
+        layout()
+        load_platforms()
+        hint = "Tab pane  Enter show  a add  e edit  d delete  / find  q logout"
+        self.set_status(hint)
+        while True:
+            if platforms.dirty:
+                platforms.draw(lambda row: f"{row[0]} ({row[1]})")
+            if entries.dirty:
+                entries.draw(render_entry)
+            curses.doupdate()
+            key = self.key()
+            pane = platforms if platforms.focused else entries
+            step = {curses.KEY_UP: -1, "k": -1, curses.KEY_DOWN: 1, "j": 1,
+                    curses.KEY_PPAGE: -pane.visible(), curses.KEY_NPAGE: pane.visible(),
+                    curses.KEY_HOME: -len(pane.rows), curses.KEY_END: len(pane.rows)}.get(key)
+            if key == curses.KEY_RESIZE:
+                layout()
+                self.set_status(hint)
+            elif step is not None:
+                if pane is platforms:
+                    if platforms.move(step):
+                        load_entries()
+                else:
+                    if entries.cursor + step >= len(entries.rows) - 1:
+                        load_more_entries()
+                    entries.move(step)
+            elif key == "\t":
+                platforms.focused, entries.focused = not platforms.focused, platforms.focused
+                platforms.dirty = entries.dirty = True
+            elif key in ENTER_KEYS and entries.focused and entries.rows:
+                entry_id = entries.rows[entries.cursor][0]
+                if revealed.pop(entry_id, None) is None:
+                    revealed[entry_id] = store.get_entry(entry_id)[3]
+                entries.dirty = True
+            elif key == "a":
+                platform = platforms.rows[platforms.cursor][0] if platforms.rows else ""
+                values = self.form("Add password (empty password = generate)",
+                                   [("Platform", False), ("Username", False), ("Email", False), ("Password", True)],
+                                   [platform, "", "", ""])
+                layout()
+                if values and values[0].strip():
+                    platform = values[0].strip().lower()
+                    password = values[3] or self.generator.generate(platform)
+                    store.add_password(username, platform, values[1], values[2], password)
+                    load_platforms(select=platform)
+                    self.set_status(f"Saved. Password strength: {strength.rating(password)}")
+                else:
+                    self.set_status(hint)
+            elif key == "e" and entries.focused and entries.rows:
+                entry_id, user, _ = entries.rows[entries.cursor]
+                values = self.form("Edit (empty password = keep)", [("Username", False), ("Password", True)], [user, ""])
+                layout()
+                if values:
+                    if values[1]:
+                        store.update_password(entry_id, values[0], values[1])
+                    else:
+                        store.update_username(entry_id, values[0])
+                    load_entries()
+                self.set_status("Entry updated." if values else hint)
+            elif key == "d" and entries.focused and entries.rows:
+                if self.confirm("Delete this entry?"):
+                    store.delete_password(entries.rows[entries.cursor][0])
+                    load_platforms()
+                self.set_status(hint)
+            elif key == "/":
+                values = self.form("Jump to platform", [("Platform starts with", False)])
+                layout()
+                if values and values[0]:
+                    names = [row[0] for row in platforms.rows]
+                    platforms.set_rows(platforms.rows, bisect.bisect_left(names, values[0].lower()))
+                    load_entries()
+                self.set_status(hint)
+            elif key in ("q", ESC):
+                return
+
+def run(users, vault_for):
+    """Runs the interface until the user quits, restoring the terminal afterwards."""
+    if curses is None:
+        raise RuntimeError("The terminal interface needs curses (on Windows: pip install windows-curses).")
+    curses.wrapper(lambda stdscr: Tui(stdscr, users, vault_for).run())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-screen terminal interface for the vault.")
+    parser.add_argument("db_file", nargs="?", default=DB_FILE)
+    args = parser.parse_args(argv)
+    db = DatabaseManager(args.db_file)
+    try:
+        run(UserStore(db), lambda username: db)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()